@@ -41,7 +41,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'screening.tracing.TracingMiddleware',
+    'screening.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,11 +70,18 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
+# Route upload/analysis/chat to the coroutine views (screening.async_views); backend/asgi.py turns this on.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'false').lower() == 'true'
+# Under ASGI the ORM runs on per-request executor threads, each with its own connection, and persistent ones
+# are never reused or closed there: with several uvicorn workers they pile up until Postgres refuses new
+# clients. Close connections after each request instead (Django's pool needs psycopg 3; this ships psycopg2).
+CONN_MAX_AGE = 0 if ASYNC_VIEWS else 600
 
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
     DATABASES = {
-        'default': dj_database_url.config(default=DATABASE_URL, conn_max_age=600)
+        'default': dj_database_url.config(default=DATABASE_URL, conn_max_age=CONN_MAX_AGE)
     }
 else:
     # Local fallback configuration for development (adjust credentials as needed)
@@ -85,7 +93,7 @@ else:
     DATABASES = {
         'default': dj_database_url.config(
             default=f'postgresql://{LOCAL_DB_USER}:{LOCAL_DB_PASSWORD}@{LOCAL_DB_HOST}:{LOCAL_DB_PORT}/{LOCAL_DB_NAME}',
-            conn_max_age=600
+            conn_max_age=CONN_MAX_AGE
         )
     }
 
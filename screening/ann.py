@@ -0,0 +1,290 @@
+"""Cross-session approximate nearest-neighbour index over resume chunk embeddings.
+
+An IVF (inverted file) index in plain NumPy: vectors are bucketed by their nearest
+k-means centroid and a query only scans the ``nprobe`` closest buckets. On disk it is
+
+    manifest.json          generation, dim, nlist, trained row count, committed row count
+    vectors.f32            append-only packed float32 rows (shared by all generations)
+    rows-<gen>.bin         append-only (document, chunk id, bucket) records
+    centroids-<gen>.npy    k-means centroids of that generation
+
+Appends happen under an exclusive file lock, so every gunicorn worker can add rows and
+pick up the others' rows by memory-mapping the grown files. An append writes vectors, then
+records, then the manifest's row count; readers never look past that count, and the next
+writer cuts off whatever an interrupted append left beyond it. Retraining writes a new
+generation; readers notice the bumped manifest and reopen.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from django.conf import settings
+from .storage import atomic_write_text, file_lock
+
+logger = logging.getLogger(__name__)
+
+ANN_INDEX_ENABLED = os.environ.get('ANN_INDEX_ENABLED', 'true').lower() == 'true'
+ANN_INDEX_DIR = os.environ.get('ANN_INDEX_DIR', str(Path(settings.BASE_DIR) / 'var' / 'ann_index'))
+ANN_NPROBE = int(os.environ.get('ANN_NPROBE', '8'))
+# Below this many rows a flat scan is as fast as IVF, so the index stays untrained.
+ANN_TRAIN_MIN_ROWS = int(os.environ.get('ANN_TRAIN_MIN_ROWS', '4096'))
+# Retrain once the index has grown by this factor since the last training.
+ANN_RETRAIN_GROWTH = float(os.environ.get('ANN_RETRAIN_GROWTH', '2.0'))
+
+# 'session' holds the resume Document id; the field name is kept so existing rows files still read.
+ROW_DTYPE = np.dtype([('session', 'S16'), ('chunk_id', '<i8'), ('list', '<i4')])
+
+
+def default_nlist(n: int) -> int:
+    return int(np.clip(4 * np.sqrt(n), 16, 4096))
+
+
+def spherical_kmeans(x: np.ndarray, k: int, iterations: int = 10, seed: int = 0, block: int = 8192) -> np.ndarray:
+    """Centroids (k, dim) of L2-normalized rows, maximizing cosine similarity."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = assign_lists(x, centroids, block)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+    return centroids
+
+
+def assign_lists(x: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+    out = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), block):
+        out[start:start + block] = np.argmax(np.asarray(x[start:start + block]) @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    def __init__(self, directory: str = ANN_INDEX_DIR):
+        self.dir = Path(directory)
+        self._lock = threading.Lock()
+        self.generation = -1
+        self.dim = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_rows = 0
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.rows = np.zeros(0, dtype=ROW_DTYPE)
+
+    # -- files -------------------------------------------------------------------------
+    def _path(self, name: str) -> Path:
+        return self.dir / name
+
+    def _read_manifest(self) -> Dict:
+        try:
+            return json.loads(self._path('manifest.json').read_text())
+        except (FileNotFoundError, ValueError):
+            return {'generation': 0, 'dim': 0, 'nlist': 0, 'trained_rows': 0, 'rows': 0}
+
+    def _write_manifest(self, manifest: Dict):
+        atomic_write_text(self._path('manifest.json'), json.dumps(manifest))
+
+    def refresh(self):
+        """Map whatever other processes have appended (or retrained) since the last look."""
+        manifest = self._read_manifest()
+        gen, dim = manifest['generation'], manifest['dim']
+        remap = gen != self.generation or dim != self.dim
+        if remap:
+            self.generation, self.dim = gen, dim
+            self.trained_rows = manifest.get('trained_rows', 0)
+            centroids_path = self._path(f'centroids-{gen}.npy')
+            self.centroids = np.load(centroids_path) if manifest['nlist'] and centroids_path.exists() else None
+        rows_path, vec_path = self._path(f'rows-{gen}.bin'), self._path('vectors.f32')
+        if not dim or not rows_path.exists() or not vec_path.exists():
+            self.vectors = np.zeros((0, dim), dtype=np.float32)
+            self.rows = np.zeros(0, dtype=ROW_DTYPE)
+            return
+        # Only committed rows (manifests written before the count existed: complete ones).
+        n = min(rows_path.stat().st_size // ROW_DTYPE.itemsize, vec_path.stat().st_size // (4 * dim))
+        n = min(n, manifest.get('rows', n))
+        if remap or n != len(self.rows):
+            self.rows = np.memmap(rows_path, dtype=ROW_DTYPE, mode='r', shape=(n,)) if n else np.zeros(0, dtype=ROW_DTYPE)
+            self.vectors = np.memmap(vec_path, dtype='<f4', mode='r', shape=(n, dim)) if n else np.zeros((0, dim), dtype=np.float32)
+
+    # -- writes ------------------------------------------------------------------------
+    def _truncate_uncommitted_locked(self):
+        """Cut records and vectors past the committed row count, left by an append that died before
+        writing its manifest, so the next append lines up with them again. Caller holds the file lock."""
+        committed = self._read_manifest().get('rows')
+        if committed is not None and committed > len(self.rows):
+            logger.warning('ANN index manifest counts %d rows but only %d are on disk', committed, len(self.rows))
+        if not self.dim:
+            return
+        n = len(self.rows)
+        for path, size in ((self._path(f'rows-{self.generation}.bin'), n * ROW_DTYPE.itemsize),
+                           (self._path('vectors.f32'), n * 4 * self.dim)):
+            if path.exists() and path.stat().st_size > size:
+                logger.warning('Truncating %s to %d committed rows', path.name, n)
+                os.truncate(path, size)
+
+    def add(self, document_ids: Sequence, chunk_ids: Sequence[Optional[int]], vectors: np.ndarray, auto_train: bool = True):
+        """Append normalized ``vectors`` belonging to ``document_ids`` (UUIDs); retrain when grown enough.
+
+        Chunks already in the index are skipped, so a retried job doesn't add its rows twice.
+        """
+        if len(vectors) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype='<f4')
+        with self._lock, file_lock(self.dir):
+            self.refresh()
+            self._truncate_uncommitted_locked()
+            dim = self.dim or vectors.shape[1]
+            if vectors.shape[1] != dim:
+                raise ValueError(f'Index holds {dim}-d vectors, got {vectors.shape[1]}-d.')
+            ids = np.array([c if c is not None else -1 for c in chunk_ids], dtype='<i8')
+            first = np.zeros(len(ids), dtype=bool)
+            first[np.unique(ids, return_index=True)[1]] = True
+            keep = (ids < 0) | (first & ~np.isin(ids, np.asarray(self.rows['chunk_id'])))
+            if not keep.any():
+                return
+            records = np.zeros(int(keep.sum()), dtype=ROW_DTYPE)
+            records['session'] = [uuid.UUID(str(d)).bytes for d, k in zip(document_ids, keep) if k]
+            records['chunk_id'] = ids[keep]
+            vectors = vectors[keep]
+            records['list'] = assign_lists(vectors, self.centroids) if self.centroids is not None else 0
+            with open(self._path('vectors.f32'), 'ab') as fh:
+                fh.write(vectors.tobytes())
+            with open(self._path(f'rows-{self.generation}.bin'), 'ab') as fh:
+                fh.write(records.tobytes())
+            # The new row count goes last: until it is written, readers don't see the appended rows.
+            manifest = self._read_manifest()
+            manifest.update(generation=self.generation, dim=dim, rows=len(self.rows) + len(records))
+            self._write_manifest(manifest)
+            self.refresh()
+            n = len(self.rows)
+            if auto_train and n >= ANN_TRAIN_MIN_ROWS and n >= self.trained_rows * ANN_RETRAIN_GROWTH:
+                self._train_locked()
+
+    def train(self, nlist: Optional[int] = None):
+        with self._lock, file_lock(self.dir):
+            self.refresh()
+            self._truncate_uncommitted_locked()
+            self._train_locked(nlist)
+
+    def _train_locked(self, nlist: Optional[int] = None):
+        n = len(self.rows)
+        if n == 0:
+            return
+        nlist = min(nlist or default_nlist(n), n)
+        rng = np.random.default_rng(0)
+        sample_idx = np.sort(rng.choice(n, size=min(n, nlist * 64), replace=False))
+        centroids = spherical_kmeans(np.asarray(self.vectors[sample_idx]), nlist)
+        records = np.array(self.rows)
+        records['list'] = assign_lists(self.vectors, centroids)
+        gen = self.generation + 1
+        np.save(self._path(f'centroids-{gen}.npy'), centroids)
+        records.tofile(self._path(f'rows-{gen}.bin'))
+        self._write_manifest({'generation': gen, 'dim': self.dim, 'nlist': nlist, 'trained_rows': n, 'rows': n})
+        for old in (f'centroids-{self.generation}.npy', f'rows-{self.generation}.bin'):
+            try:
+                self._path(old).unlink()
+            except FileNotFoundError:
+                pass
+        logger.info('ANN index retrained: %d rows, %d lists, generation %d', n, nlist, gen)
+        self.refresh()
+
+    def reset(self):
+        with self._lock, file_lock(self.dir):
+            for path in self.dir.glob('*'):
+                if path.name != '.lock':
+                    path.unlink()
+            self.generation = -1
+            self.refresh()
+
+    # -- reads -------------------------------------------------------------------------
+    def search(self, query: np.ndarray, k: int = 50, nprobe: int = ANN_NPROBE) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, row indices) of the ~k nearest rows, best first."""
+        with self._lock:
+            self.refresh()
+            rows, vectors, centroids = self.rows, self.vectors, self.centroids
+        n = len(rows)
+        if n == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        if centroids is None or nprobe >= len(centroids):
+            candidates = np.arange(n)
+            scores = np.asarray(vectors) @ query
+        else:
+            probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+            selected = np.zeros(len(centroids), dtype=bool)
+            selected[probe] = True
+            candidates = np.flatnonzero(selected[rows['list']])
+            scores = vectors[candidates] @ query
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return scores[top], candidates[top]
+
+    def document_of(self, row_indices: np.ndarray) -> List[str]:
+        return [str(uuid.UUID(bytes=bytes(b))) for b in self.rows['session'][row_indices]]
+
+    def chunk_of(self, row_indices: np.ndarray) -> List[int]:
+        return self.rows['chunk_id'][row_indices].tolist()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self.refresh()
+            return {
+                'rows': len(self.rows),
+                'dim': self.dim,
+                'nlist': 0 if self.centroids is None else len(self.centroids),
+                'generation': self.generation,
+                'trained_rows': self.trained_rows,
+            }
+
+
+ann_index = IVFIndex()
+
+
+def search_candidates(query_vectors: np.ndarray, top_n: int = 20, chunk_k: int = 200, nprobe: int = ANN_NPROBE) -> List[Dict]:
+    """Rank resume documents for a multi-vector query (e.g. every chunk of a JD).
+
+    A document's score is the mean, over query vectors, of its best-matching chunk
+    (0 when none of its chunks made that query's top ``chunk_k``).
+    """
+    best: Dict[str, np.ndarray] = {}
+    best_chunk: Dict[str, Tuple[float, int]] = {}
+    nq = len(query_vectors)
+    for qi, q in enumerate(query_vectors):
+        scores, rows = ann_index.search(q, k=chunk_k, nprobe=nprobe)
+        for score, document, chunk_id in zip(scores.tolist(), ann_index.document_of(rows), ann_index.chunk_of(rows)):
+            per_query = best.setdefault(document, np.zeros(nq, dtype=np.float32))
+            if score > per_query[qi]:
+                per_query[qi] = score
+            if score > best_chunk.get(document, (-2.0, -1))[0]:
+                best_chunk[document] = (score, chunk_id)
+    ranked = sorted(best.items(), key=lambda item: float(item[1].mean()), reverse=True)[:top_n]
+    return [
+        {'document': document, 'score': round(float(per_query.mean()), 4),
+         'best_chunk_id': best_chunk[document][1], 'best_chunk_score': round(best_chunk[document][0], 4)}
+        for document, per_query in ranked
+    ]
+
+
+def index_chunks(chunks: Sequence) -> int:
+    """Add the resume rows among freshly stored ResumeChunks; never raises into the caller."""
+    if not ANN_INDEX_ENABLED:
+        return 0
+    resume_chunks = [c for c in chunks if c.doc_type == 'resume']
+    if not resume_chunks:
+        return 0
+    try:
+        vectors = np.frombuffer(b''.join(bytes(c.embedding) for c in resume_chunks), dtype='<f4').reshape(len(resume_chunks), -1)
+        ann_index.add([c.document_id for c in resume_chunks], [c.pk for c in resume_chunks], vectors)
+    except Exception:
+        logger.exception('Failed to add %d chunks to the ANN index', len(resume_chunks))
+        return 0
+    return len(resume_chunks)
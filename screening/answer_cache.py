@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from django.db.models import F
+from django.utils import timezone
+from .models import AnswerCacheEntry, Session
+
+ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+ANSWER_CACHE_THRESHOLD = float(os.environ.get('ANSWER_CACHE_THRESHOLD', '0.95'))
+ANSWER_CACHE_TTL = int(os.environ.get('ANSWER_CACHE_TTL', str(7 * 24 * 3600)))  # seconds
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', '20000'))
+# Candidates compared per lookup; the newest entries for a content hash win.
+ANSWER_CACHE_SCAN_LIMIT = int(os.environ.get('ANSWER_CACHE_SCAN_LIMIT', '200'))
+
+
+class AnswerCacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def record(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+answer_cache_stats = AnswerCacheStats()
+
+
+def content_hash(session: Session, model: str, dim: int, retrieval: str) -> str:
+    """Identity of everything besides history that shapes an answer: both documents, the analysis and
+    the retrieval mode that picked the context, plus the embedding model and dimension the question
+    vectors must share to be compared.
+
+    Documents are content-addressed (see screening.documents), so their ids stand in for the texts.
+    """
+    h = hashlib.sha256()
+    for part in (*session.document_ids, repr(session.match_score), retrieval, model, dim):
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def has_history(session: Session) -> bool:
+    """Whether earlier turns (verbatim or summarized) go into this session's prompts, so its answers
+    can't be taken from or shared with other conversations."""
+    # The current question's own 'user' row is already stored, so look for an earlier answer.
+    return session.messages.filter(role='assistant').exists()
+
+
+def lookup(session: Session, q_vec: np.ndarray, model: str, retrieval: str) -> Optional[AnswerCacheEntry]:
+    """Best cached answer with cosine >= ANSWER_CACHE_THRESHOLD, or None (also on bypass)."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if has_history(session):
+        answer_cache_stats.record('bypassed')
+        return None
+    cutoff = timezone.now() - timedelta(seconds=ANSWER_CACHE_TTL)
+    dim = len(q_vec)
+    candidates = list(
+        AnswerCacheEntry.objects.filter(content_hash=content_hash(session, model, dim, retrieval), embed_model=model, dim=dim,
+                                        created_at__gte=cutoff)
+        .order_by('-created_at')[:ANSWER_CACHE_SCAN_LIMIT]
+    )
+    best, best_score = None, ANSWER_CACHE_THRESHOLD
+    if candidates:
+        matrix = np.frombuffer(b''.join(bytes(c.question_embedding) for c in candidates), dtype='<f4').reshape(len(candidates), dim)
+        scores = matrix @ q_vec
+        i = int(np.argmax(scores))
+        if scores[i] >= best_score:
+            best = candidates[i]
+    if best is None:
+        answer_cache_stats.record('misses')
+        return None
+    answer_cache_stats.record('hits')
+    AnswerCacheEntry.objects.filter(id=best.id).update(hits=F('hits') + 1)
+    return best
+
+
+def store(session: Session, question: str, q_vec: np.ndarray, model: str, retrieval: str, answer: str,
+          retrieved: List[Dict]):
+    if not ANSWER_CACHE_ENABLED or not answer or has_history(session):
+        return
+    AnswerCacheEntry.objects.create(
+        content_hash=content_hash(session, model, len(q_vec), retrieval),
+        embed_model=model,
+        dim=len(q_vec),
+        question=question,
+        question_embedding=np.asarray(q_vec, dtype='<f4').tobytes(),
+        answer=answer,
+        retrieved_chunks=retrieved,
+    )
+    prune()
+
+
+def prune() -> Tuple[int, int]:
+    """Delete expired entries and the oldest ones beyond ANSWER_CACHE_MAX_ENTRIES."""
+    cutoff = timezone.now() - timedelta(seconds=ANSWER_CACHE_TTL)
+    expired, _ = AnswerCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+    excess = AnswerCacheEntry.objects.count() - ANSWER_CACHE_MAX_ENTRIES
+    evicted = 0
+    if excess > 0:
+        oldest = list(AnswerCacheEntry.objects.order_by('created_at', 'id').values_list('id', flat=True)[:excess])
+        evicted, _ = AnswerCacheEntry.objects.filter(id__in=oldest).delete()
+    return expired, evicted
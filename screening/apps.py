@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class ScreeningConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'screening'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import tracing  # noqa: F401  (installs the DB query counter before any connection opens)
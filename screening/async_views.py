@@ -0,0 +1,133 @@
+"""Coroutine versions of the LLM-bound views, routed instead of the sync ones when ASYNC_VIEWS is on.
+
+Under ASGI (backend/asgi.py) a worker then keeps many uploads and chats in flight on one
+event loop while they wait on OpenAI; parsing, ranking and the remaining ORM work run on
+worker threads. Validation and responses are shared with views.py.
+"""
+import asyncio
+import logging
+import time
+from asgiref.sync import sync_to_async
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework import status
+from . import views
+from .documents import aupload_documents
+from .jobs import enqueue_upload
+from .models import Session
+from .parsing import DocumentError
+from .pipeline import EmbeddingFailed, amatch_and_embed, build_chunks
+from .rag import aanswer_question, astream_answer
+from .serializers import ChatRequestSerializer, SessionSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers are coroutines.
+
+    Authentication, permission and throttle checks may query the database, so they run on a
+    worker thread; the handler itself is awaited on the event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed) \
+                if request.method.lower() in self.http_method_names else self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+async def _get_session(session_id):
+    try:
+        return await Session.objects.aget(id=session_id)
+    except Session.DoesNotExist:
+        return None
+
+
+class AsyncUploadView(AsyncAPIView, views.UploadView):
+    async def post(self, request):
+        error, params = await sync_to_async(views.upload_params)(request)
+        if error:
+            return error
+        if params['queue']:
+            job = await sync_to_async(enqueue_upload)(params['resume_file'], params['jd_file'],
+                                                      force_reanalyze=params['reanalyze'], mode=params['mode'])
+            return Response({'job': str(job.id), 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+        start = time.perf_counter()
+        try:
+            files = await sync_to_async(views.upload_files, thread_sensitive=False)(params)
+            resume, jd, warnings = await aupload_documents(*files)
+        except DocumentError as e:
+            return Response({'error': str(e)}, status=400)
+        documents = build_chunks(resume.text, jd.text)
+        session = await Session.objects.acreate(resume_document=resume, jd_document=jd)
+        prepare_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        try:
+            match_data, timings = await amatch_and_embed(session, documents, force_match=params['reanalyze'], mode=params['mode'])
+        except EmbeddingFailed as e:
+            return views.embedding_failed_response(e)
+        timings['prepare_ms'] = prepare_ms
+        return views.upload_response(session, match_data, timings, warnings)
+
+
+class AsyncAnalysisView(AsyncAPIView, views.AnalysisView):
+    async def get(self, request, session_id):
+        session = await _get_session(session_id)
+        if session is None:
+            return Response({'error': 'Session not found'}, status=404)
+        return Response(SessionSerializer(session).data)
+
+
+class AsyncChatView(AsyncAPIView, views.ChatView):
+    async def post(self, request, session_id):
+        session = await _get_session(session_id)
+        if session is None:
+            return Response({'error': 'Session not found'}, status=404)
+        serializer = ChatRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        question = serializer.validated_data['question']
+        result = await aanswer_question(session, question, retrieval=serializer.validated_data['retrieval'])
+        return Response(result)
+
+    async def get(self, request, session_id):
+        session = await _get_session(session_id)
+        if session is None:
+            return Response({'error': 'Session not found'}, status=404)
+        return await sync_to_async(views.chat_history_response)(request, self, session)
+
+
+class AsyncChatStreamView(AsyncAPIView, views.ChatStreamView):
+    async def post(self, request, session_id):
+        session = await _get_session(session_id)
+        if session is None:
+            return Response({'error': 'Session not found'}, status=404)
+        serializer = ChatRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        question = serializer.validated_data['question']
+        retrieval = serializer.validated_data['retrieval']
+
+        async def events():
+            try:
+                async for event, data in astream_answer(session, question, retrieval=retrieval):
+                    yield views._sse(event, data)
+            except Exception as e:
+                logger.exception('Chat stream failed for session %s', session.id)
+                yield views._sse('error', {'error': str(e)})
+
+        return views.sse_response(events())
@@ -0,0 +1,144 @@
+import io
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from django.db import connection
+from .parsing import DocumentError, iter_chunks
+from .lexical import LexicalScorer
+from .pipeline import analyze_match, save_match
+from .rag import embed_packed, store_documents
+from .models import Session
+from .documents import read_upload_document
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_RESUMES = int(os.environ.get('BATCH_MAX_RESUMES', '100'))
+BATCH_MAX_ZIP_BYTES = int(os.environ.get('BATCH_MAX_ZIP_BYTES', str(50 * 1024 * 1024)))  # uncompressed
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '4'))
+# With mode='prescreen', only this many top fast-scored resumes get the LLM analysis.
+BATCH_LLM_TOP = int(os.environ.get('BATCH_LLM_TOP', '10'))
+# Most LLM analyses one synchronous /api/batch/ request may run (mode=llm: every resume; prescreen: llm_top),
+# so a request finishes well within proxy and worker timeouts.
+BATCH_SYNC_LLM_MAX = int(os.environ.get('BATCH_SYNC_LLM_MAX', '10'))
+BATCH_MODES = ('llm', 'fast', 'prescreen')
+BATCH_DEFAULT_MODE = 'prescreen'
+RESUME_EXTENSIONS = ('.pdf', '.txt')
+
+
+def collect_resumes(files, zip_file=None) -> List[Tuple[str, bytes]]:
+    """(filename, bytes) for every uploaded resume, including .pdf/.txt members of an optional zip."""
+    resumes = [(f.name, f.read()) for f in files]
+    if zip_file is not None:
+        total = 0
+        with zipfile.ZipFile(io.BytesIO(zip_file.read())) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                if info.is_dir() or name.startswith('__MACOSX/') or not name.lower().endswith(RESUME_EXTENSIONS):
+                    continue
+                total += info.file_size
+                if total > BATCH_MAX_ZIP_BYTES:
+                    raise ValueError(f'Zip archive expands beyond {BATCH_MAX_ZIP_BYTES} bytes.')
+                resumes.append((os.path.basename(name), archive.read(info)))
+    return resumes
+
+
+def screen_batch(jd_name: str, jd_data: bytes, resumes: List[Tuple[str, bytes]], force: bool = False,
+                 concurrency: int = BATCH_CONCURRENCY, mode: str = BATCH_DEFAULT_MODE, llm_top: int = BATCH_LLM_TOP) -> Dict:
+    """Screen many resumes against one JD and return candidates ranked by match score.
+
+    The JD is parsed, chunked and embedded once (not at all if an earlier upload stored it);
+    each resume then gets its own Session (reusing the JD vectors) with parsing, embedding
+    and compute_match fanned out over ``concurrency`` threads. Upstream calls go through
+    ``llm.gateway``, whose LLM_RPM/LLM_TPM buckets pace them.
+
+    mode='fast' scores every resume with the local lexical engine and makes no API calls;
+    mode='prescreen' does the same, then embeds and runs the LLM analysis for only the
+    ``llm_top`` best. Candidates that skip the LLM keep the fast analysis and, unless their
+    resume and the JD were stored by an earlier upload, have no chunks, so they can't be
+    chatted with until re-uploaded.
+    """
+    start = time.perf_counter()
+    jd = read_upload_document('job_description', jd_name, jd_data)
+    jd_text = jd.text
+    jd_chunks = list(iter_chunks(jd_text)) if jd.chunk_count is None else []
+
+    def parse_one(name: str, data: bytes) -> Dict:
+        try:
+            resume = read_upload_document('resume', name, data)
+        except DocumentError as e:
+            return {'filename': name, 'error': str(e)}
+        finally:
+            connection.close()
+        if not resume.text:
+            return {'filename': name, 'error': 'No text could be extracted.'}
+        return {'filename': name, 'text': resume.text, 'document': resume,
+                'warnings': [resume.warning] if resume.warning else []}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch') as pool:
+        parsed = list(pool.map(lambda r: parse_one(*r), resumes))
+    readable = [p for p in parsed if 'text' in p]
+
+    if mode != 'llm' and readable:
+        for p, result in zip(readable, LexicalScorer(jd_text).score_many([p['text'] for p in readable])):
+            p['fast'] = result
+    if mode == 'llm':
+        full = readable
+    elif mode == 'prescreen':
+        full = sorted(readable, key=lambda p: -p['fast']['match_score'])[:max(0, llm_top)]
+    else:
+        full = []
+    for p in full:
+        p['full'] = True
+    jd_embedded = embed_packed([c.text for c in jd_chunks]) if full and jd_chunks else None
+
+    def screen_one(p: Dict) -> Dict:
+        name = p['filename']
+        if 'error' in p:
+            return {'filename': name, 'session': None, 'match_score': None, 'error': p['error']}
+        try:
+            session = Session.objects.create(resume_document=p['document'], jd_document=jd)
+            if p.get('full'):
+                documents = {'resume': iter_chunks(p['text']), 'job_description': jd_chunks}
+                store_documents(session, documents, embedded={'job_description': jd_embedded} if jd_embedded else None)
+                match_data = analyze_match(p['text'], jd_text, force)
+            else:
+                match_data = p['fast']
+            save_match(session, match_data)
+            candidate = {
+                'filename': name,
+                'session': str(session.id),
+                'match_score': session.match_score,
+                'strengths': session.strengths,
+                'gaps': session.gaps,
+                'analysis_mode': session.analysis_mode,
+                'chat_ready': bool(p.get('full')) or (p['document'].chunk_count is not None and jd.chunk_count is not None),
+                'warnings': p['warnings'],
+            }
+            if 'fast' in p:
+                candidate.update(fast_score=p['fast']['match_score'], missing_terms=p['fast']['missing_terms'][:10])
+            return candidate
+        except Exception as e:
+            logger.exception('Batch screening failed for %s', name)
+            return {'filename': name, 'session': None, 'match_score': None, 'error': str(e)}
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch') as pool:
+        candidates = list(pool.map(screen_one, parsed))
+
+    candidates.sort(key=lambda c: (c['match_score'] is None, not c.get('chat_ready'), -(c['match_score'] or 0)))
+    for rank, c in enumerate(candidates, 1):
+        c['rank'] = rank
+    elapsed = time.perf_counter() - start
+    return {
+        'mode': mode,
+        'warnings': [jd.warning] if jd.warning else [],
+        'job_description_chunks': len(jd_chunks) if jd.chunk_count is None else jd.chunk_count,
+        'llm_analyzed': len(full),
+        'candidates': candidates,
+        'elapsed_ms': round(elapsed * 1000, 1),
+        'resumes_per_minute': round(len(resumes) / elapsed * 60, 1) if elapsed else None,
+    }
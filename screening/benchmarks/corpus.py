@@ -0,0 +1,81 @@
+"""Deterministic synthetic resumes and job descriptions for benchmarks."""
+import random
+from typing import List
+
+SKILLS = [
+    'Python', 'Django', 'FastAPI', 'Flask', 'PostgreSQL', 'MySQL', 'Redis', 'Kafka', 'Docker', 'Kubernetes',
+    'Terraform', 'AWS', 'GCP', 'Azure', 'React', 'TypeScript', 'Go', 'Rust', 'Java', 'Spark', 'Airflow',
+    'LangChain', 'PyTorch', 'TensorFlow', 'scikit-learn', 'Pandas', 'NumPy', 'GraphQL', 'gRPC', 'CI/CD',
+]
+COMPANIES = ['Acme Corp', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises']
+VERBS = ['Built', 'Designed', 'Led', 'Migrated', 'Optimized', 'Maintained', 'Automated', 'Scaled']
+OBJECTS = ['a data pipeline', 'the billing service', 'an internal API', 'search infrastructure',
+           'a recommendation engine', 'the deployment platform', 'monitoring dashboards', 'an ML training workflow']
+
+
+def _sentence(rng: random.Random) -> str:
+    skills = ', '.join(rng.sample(SKILLS, 2))
+    return f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} using {skills}, improving throughput by {rng.randint(10, 90)}%."
+
+
+def make_resume(seed: int, jobs: int = 3, bullets: int = 5) -> str:
+    rng = random.Random(seed)
+    lines = ['Summary', f"Software engineer with {rng.randint(2, 15)} years of experience. " + _sentence(rng), 'Experience']
+    for _ in range(jobs):
+        lines.append(f"Senior Engineer, {rng.choice(COMPANIES)} ({rng.randint(2010, 2020)} - {rng.randint(2021, 2025)})")
+        lines.extend(_sentence(rng) for _ in range(bullets))
+    lines += ['Education', f"B.Sc. in Computer Science, University {rng.randint(1, 50)}"]
+    lines += ['Skills', ', '.join(rng.sample(SKILLS, 10))]
+    lines += ['Projects'] + [_sentence(rng) for _ in range(3)]
+    return '\n'.join(lines)
+
+
+def make_job_description(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    required = rng.sample(SKILLS, 8)
+    return '\n'.join([
+        'Summary',
+        'We are hiring a backend engineer to build reliable services for our hiring platform.',
+        'Experience',
+        f"5+ years of professional experience with {', '.join(required[:4])}.",
+        f"Hands-on experience with {', '.join(required[4:])} in production.",
+        'Skills',
+        ', '.join(required),
+        'Nice to have: mentoring, system design, on-call experience.',
+    ])
+
+
+def make_resumes(count: int, seed: int = 1) -> List[str]:
+    return [make_resume(seed + i) for i in range(count)]
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(pages: int, seed: int = 0, lines_per_page: int = 45) -> bytes:
+    """A plain multi-page PDF (Helvetica text only) filled with resume-like lines."""
+    rng = random.Random(seed)
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for _ in range(pages):
+        body = ['BT /F1 10 Tf 12 TL 50 780 Td']
+        body += [f"({_pdf_escape(_sentence(rng))}) '" for _ in range(lines_per_page)]
+        body.append('ET')
+        stream = '\n'.join(body).encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (' '.join(f'{k} 0 R' for k in kids).encode(), pages)
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, obj)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
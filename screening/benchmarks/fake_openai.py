@@ -0,0 +1,217 @@
+"""A tiny OpenAI-compatible HTTP server for offline benchmarks.
+
+Implements ``POST /v1/embeddings`` and ``POST /v1/chat/completions`` (including
+``stream=true``) with configurable latency, deterministic embeddings and canned
+answers, so the real client code paths can be exercised without network access.
+"""
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+import numpy as np
+
+
+def fake_embedding(text: str, dim: int) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32).tolist()
+
+
+def _rough_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAIConfig:
+    def __init__(self, embed_latency_ms: float = 50.0, chat_latency_ms: float = 400.0, tokens_per_second: float = 0.0,
+                 answer_tokens: int = 60, dim: int = 1536, prefill_ms_per_1k_tokens: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 429, retry_after_ms: int = 0, seed: int = 0):
+        self.embed_latency_ms = embed_latency_ms
+        self.chat_latency_ms = chat_latency_ms  # time to first token
+        self.prefill_ms_per_1k_tokens = prefill_ms_per_1k_tokens  # extra time to first token per 1k prompt tokens
+        self.tokens_per_second = tokens_per_second  # 0 = emit the whole completion at once
+        self.answer_tokens = answer_tokens
+        self.dim = dim
+        self.error_rate = error_rate  # fraction of requests failed with error_status (seeded, so repeatable)
+        self.error_status = error_status
+        self.retry_after_ms = retry_after_ms  # sent as retry-after-ms on injected errors when > 0
+        self.seed = seed
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: '_Server'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.record('connections')
+
+    def _json(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_error(self) -> bool:
+        cfg = self.server.config
+        if cfg.error_rate <= 0 or not self.server.roll(cfg.error_rate):
+            return False
+        self.server.record('errors')
+        body = json.dumps({'error': {'message': 'Injected failure', 'type': 'fake_error'}}).encode('utf-8')
+        self.send_response(cfg.error_status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if cfg.retry_after_ms > 0:
+            self.send_header('retry-after-ms', str(cfg.retry_after_ms))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        self.server.record('requests')
+        if self._inject_error():
+            return
+        if self.path.endswith('/embeddings'):
+            self.server.record('embeddings')
+            self._embeddings(payload)
+        elif self.path.endswith('/chat/completions'):
+            self.server.record('chat')
+            self._chat(payload)
+        else:
+            self._json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+    def _embeddings(self, payload: Dict):
+        cfg = self.server.config
+        inputs = payload.get('input')
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        time.sleep(cfg.embed_latency_ms / 1000)
+        tokens = sum(_rough_tokens(t) for t in inputs)
+        self.server.record('embedded_inputs', len(inputs))
+        self._json(200, {
+            'object': 'list',
+            'model': payload.get('model'),
+            'data': [{'object': 'embedding', 'index': i, 'embedding': fake_embedding(t, cfg.dim)} for i, t in enumerate(inputs)],
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+        })
+
+    def _completion_text(self, payload: Dict) -> str:
+        prompt = json.dumps(payload.get('messages', []))
+        digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+        if (payload.get('response_format') or {}).get('type') == 'json_object':
+            return json.dumps({
+                'matchScore': 40 + digest[0] % 60,
+                'strengths': ['Relevant backend experience with the requested stack.', 'Has shipped production services.'],
+                'gaps': ['No explicit evidence of the required cloud certification.'],
+                'insights': 'Synthetic analysis produced by the local fake OpenAI server.',
+            })
+        words = ['The', 'candidate', 'matches', 'several', 'requirements', 'but', 'lacks', 'some', 'evidence.']
+        n = min(self.server.config.answer_tokens, payload.get('max_tokens') or self.server.config.answer_tokens)
+        return ' '.join(words[i % len(words)] for i in range(n))
+
+    def _chat(self, payload: Dict):
+        cfg = self.server.config
+        text = self._completion_text(payload)
+        prompt_tokens = _rough_tokens(json.dumps(payload.get('messages', [])))
+        self.server.record('prompt_tokens', prompt_tokens)
+        time.sleep((cfg.chat_latency_ms + cfg.prefill_ms_per_1k_tokens * prompt_tokens / 1000) / 1000)
+        pieces = [w + ' ' for w in text.split(' ')]
+        base = {'id': 'chatcmpl-fake', 'created': int(time.time()), 'model': payload.get('model')}
+        if not payload.get('stream'):
+            if cfg.tokens_per_second > 0:
+                time.sleep(len(pieces) / cfg.tokens_per_second)
+            self._json(200, {
+                **base,
+                'object': 'chat.completion',
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': text}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(pieces), 'total_tokens': prompt_tokens + len(pieces)},
+            })
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for piece in pieces:
+            if cfg.tokens_per_second > 0:
+                time.sleep(1 / cfg.tokens_per_second)
+            chunk = {**base, 'object': 'chat.completion.chunk',
+                     'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            chunk = {**base, 'object': 'chat.completion.chunk', 'choices': [],
+                     'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(pieces),
+                               'total_tokens': prompt_tokens + len(pieces)}}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._write_chunk('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, text: str):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # load tests open many connections at once
+
+    def __init__(self, address, config: FakeOpenAIConfig):
+        super().__init__(address, _Handler)
+        self.config = config
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(config.seed)
+
+    def handle_error(self, request, client_address):
+        # Pooled client connections that are closed mid-read are expected; anything else is printed.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def roll(self, p: float) -> bool:
+        with self._lock:
+            return self._rng.random() < p
+
+    def record(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+
+class FakeOpenAIServer:
+    """Run the fake API on a background thread: ``with FakeOpenAIServer() as srv: srv.base_url``."""
+
+    def __init__(self, config: FakeOpenAIConfig = None, host: str = '127.0.0.1', port: int = 0):
+        self.config = config or FakeOpenAIConfig()
+        self._server = _Server((host, port), self.config)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-openai', daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        with self._server._lock:
+            return dict(self._server.counters)
+
+    def start(self) -> 'FakeOpenAIServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
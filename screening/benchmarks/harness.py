@@ -0,0 +1,22 @@
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def point_clients_at(base_url: str):
+    """Route the shared LLM gateway (and so rag.get_client()) to ``base_url`` for the duration."""
+    from screening.llm import gateway
+    saved_env = {k: os.environ.get(k) for k in ('OPENAI_BASE_URL', 'OPENAI_API_KEY')}
+    saved_target = (gateway.base_url, gateway.api_key)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ['OPENAI_API_KEY'] = saved_env['OPENAI_API_KEY'] or 'sk-fake'
+    gateway.configure(base_url, os.environ['OPENAI_API_KEY'])
+    try:
+        yield
+    finally:
+        gateway.configure(*saved_target)
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
@@ -0,0 +1,104 @@
+"""End-to-end benchmark scenarios that drive the real Django endpoints (see ``manage.py bench_e2e``).
+
+Each scenario is a callable taking a request number and returning per-stage timings in ms;
+``run_scenario`` calls it concurrently and reports throughput and latency percentiles, and
+``compare`` checks a run against a stored baseline.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from django.db import connection
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+# Latency differences below this are noise for sub-millisecond in-process scenarios.
+COMPARE_SLACK_MS = 0.5
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2), 'p99_ms': round(float(p99), 2),
+            'mean_ms': round(float(np.mean(samples)), 2)}
+
+
+def run_scenario(fn: Callable[[int], Optional[Dict[str, float]]], requests: int, concurrency: int = 1) -> Dict:
+    """Call ``fn(i)`` for i in range(requests) on ``concurrency`` threads.
+
+    Returns throughput, latency percentiles, the p50 of every stage ``fn`` reported, and errors.
+    """
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def one(i: int):
+        start = time.perf_counter()
+        try:
+            timings = fn(i) or {}
+        except Exception as e:
+            with lock:
+                errors.append(f'{type(e).__name__}: {e}')
+            return
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            for stage, ms in timings.items():
+                stages.setdefault(stage, []).append(ms)
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for i in range(requests):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench') as pool:
+            list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else '',
+        'rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        **percentiles(latencies),
+        'stages_p50_ms': {stage: round(float(np.percentile(ms, 50)), 2) for stage, ms in stages.items()},
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Human-readable regressions: p95 latency up or throughput down by more than ``tolerance``."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        limit = max(base['p95_ms'] * (1 + tolerance), base['p95_ms'] + COMPARE_SLACK_MS)
+        if result['p95_ms'] > limit:
+            regressions.append(f"{name}: p95 {result['p95_ms']:.2f}ms vs baseline {base['p95_ms']:.2f}ms")
+        slower_ms = 1000 / result['rps'] - 1000 / base['rps'] if result['rps'] and base['rps'] else 0.0
+        if base['rps'] and result['rps'] < base['rps'] * (1 - tolerance) and slower_ms > COMPARE_SLACK_MS:
+            regressions.append(f"{name}: {result['rps']:.2f} req/s vs baseline {base['rps']:.2f} req/s")
+        if result['errors'] > base.get('errors', 0):
+            regressions.append(f"{name}: {result['errors']} errors ({result['first_error']})")
+    return regressions
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(data: Dict, path: Path = BASELINE_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,111 @@
+"""Content-addressed store of parsed resumes and job descriptions.
+
+A Document is keyed by (doc_type, sha256 of its normalized text) and owns that text plus its
+chunks and embeddings; a Session references one resume and one job description. The sha256
+of the first uploaded file is kept too, so uploading the same file again skips reading it
+(PDF extraction included), and a document whose chunks are stored (``chunk_count`` set) is
+never chunked or embedded again, see rag.store_documents.
+"""
+import asyncio
+import hashlib
+from typing import List, Optional, Set, Tuple
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from .models import Document, Session
+from .parsing import normalize_whitespace, read_document
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def get_or_create_document(doc_type: str, text: str, file_hash: str = '', warning: str = '') -> Document:
+    """The document with exactly this (already normalized) text, created if new."""
+    text_hash = content_hash(text.encode('utf-8'))
+    document = Document.objects.filter(doc_type=doc_type, text_hash=text_hash).first()
+    if document is None:
+        try:
+            with transaction.atomic():
+                return Document.objects.create(doc_type=doc_type, text_hash=text_hash, file_hash=file_hash,
+                                               text=text, warning=warning)
+        except IntegrityError:  # the same text was uploaded concurrently
+            document = Document.objects.get(doc_type=doc_type, text_hash=text_hash)
+    if file_hash and not document.file_hash:
+        Document.objects.filter(id=document.id, file_hash='').update(file_hash=file_hash)
+        document.file_hash = file_hash
+    return document
+
+
+def find_by_file(doc_type: str, file_hash: str) -> Optional[Document]:
+    return Document.objects.filter(doc_type=doc_type, file_hash=file_hash).first()
+
+
+def read_upload_document(doc_type: str, name: str, data: bytes) -> Document:
+    """Document for an uploaded file; a file seen before is not read again. Raises DocumentError."""
+    file_hash = content_hash(data)
+    document = find_by_file(doc_type, file_hash)
+    if document is not None:
+        return document
+    parsed = read_document(name, data)
+    return get_or_create_document(doc_type, normalize_whitespace(parsed.text), file_hash, parsed.warning or '')
+
+
+async def aread_upload_document(doc_type: str, name: str, data: bytes) -> Document:
+    """read_upload_document for the async views; extraction runs off the thread used for the ORM."""
+    file_hash = content_hash(data)
+    document = await Document.objects.filter(doc_type=doc_type, file_hash=file_hash).afirst()
+    if document is not None:
+        return document
+    parsed = await sync_to_async(read_document, thread_sensitive=False)(name, data)
+    return await sync_to_async(get_or_create_document)(doc_type, normalize_whitespace(parsed.text), file_hash,
+                                                       parsed.warning or '')
+
+
+def upload_documents(resume_name: str, resume_data: bytes, jd_name: str, jd_data: bytes) -> Tuple[Document, Document, List[str]]:
+    """(resume, job description, extraction warnings); raises DocumentError for unreadable files."""
+    resume = read_upload_document('resume', resume_name, resume_data)
+    jd = read_upload_document('job_description', jd_name, jd_data)
+    return resume, jd, [d.warning for d in (resume, jd) if d.warning]
+
+
+async def aupload_documents(resume_name: str, resume_data: bytes, jd_name: str, jd_data: bytes) -> Tuple[Document, Document, List[str]]:
+    resume, jd = await asyncio.gather(aread_upload_document('resume', resume_name, resume_data),
+                                      aread_upload_document('job_description', jd_name, jd_data))
+    return resume, jd, [d.warning for d in (resume, jd) if d.warning]
+
+
+def create_session(resume_text: str, jd_text: str, **fields) -> Session:
+    """Session over already-normalized texts, e.g. synthetic ones in the benchmarks."""
+    return Session.objects.create(resume_document=get_or_create_document('resume', resume_text),
+                                  jd_document=get_or_create_document('job_description', jd_text), **fields)
+
+
+def prune_documents(document_ids=None) -> int:
+    """Delete documents no session references any more (optionally only among ``document_ids``)
+    together with their chunks; returns how many."""
+    unused = Document.objects.filter(resume_sessions__isnull=True, jd_sessions__isnull=True)
+    if document_ids is not None:
+        unused = unused.filter(id__in=document_ids)
+    ids = list(unused.values_list('id', flat=True).distinct())
+    return Document.objects.filter(id__in=ids).delete()[1].get(Document._meta.label, 0)
+
+
+def delete_sessions(sessions) -> int:
+    """Delete a queryset of sessions, then those of their documents nothing else uses."""
+    document_ids = {d for pair in sessions.values_list('resume_document_id', 'jd_document_id') for d in pair}
+    deleted, _ = sessions.delete()
+    prune_documents(document_ids)
+    return deleted
+
+
+def unchunked_types(session: Session) -> Set[str]:
+    """doc_types of the session's documents whose chunks are not stored yet."""
+    return set(Document.objects.filter(id__in=session.document_ids, chunk_count__isnull=True)
+               .values_list('doc_type', flat=True))
+
+
+def sessions_using(document_ids) -> List:
+    """Ids of the sessions that reference any of ``document_ids`` (for cache invalidation)."""
+    return list(Session.objects.filter(Q(resume_document__in=document_ids) | Q(jd_document__in=document_ids))
+                .values_list('id', flat=True))
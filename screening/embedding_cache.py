@@ -0,0 +1,100 @@
+import hashlib
+import os
+from typing import Awaitable, Callable, Dict, List, Tuple
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import EmbeddingCacheEntry, EmbeddingCacheStat
+from .tokens import count_tokens
+
+EMBED_CACHE_MAX_ENTRIES = int(os.environ.get('EMBED_CACHE_MAX_ENTRIES', '50000'))
+
+
+def normalize_for_cache(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_for_cache(text).encode('utf-8')).hexdigest()
+
+
+def _lookup(model: str, texts: List[str]) -> Tuple[List[str], Dict[str, EmbeddingCacheEntry], Dict[str, str]]:
+    """(key per text, cached entries by key, normalized text of each missing key)."""
+    keys = [text_hash(t) for t in texts]
+    found: Dict[str, EmbeddingCacheEntry] = {
+        e.text_hash: e
+        for e in EmbeddingCacheEntry.objects.filter(model=model, text_hash__in=set(keys)).only('id', 'text_hash', 'embedding', 'token_count')
+    }
+
+    # First occurrence of each missing key; duplicates inside one batch are embedded once.
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = normalize_for_cache(text)
+    return keys, found, missing
+
+
+def _record(model: str, keys: List[str], found: Dict[str, EmbeddingCacheEntry], missing: Dict[str, str],
+            vectors: List[bytes]) -> List[bytes]:
+    """Store the new vectors, count hits/misses and return the packed embedding per key."""
+    packed: Dict[str, bytes] = {key: bytes(e.embedding) for key, e in found.items()}
+    new_entries = []
+    for (key, text), blob in zip(missing.items(), vectors):
+        packed[key] = blob
+        new_entries.append(EmbeddingCacheEntry(
+            model=model, text_hash=key, embedding=blob, token_count=count_tokens(text, model),
+        ))
+
+    hit_count = sum(1 for k in keys if k in found)
+    tokens_saved = sum(found[k].token_count for k in keys if k in found)
+    with transaction.atomic():
+        if new_entries:
+            EmbeddingCacheEntry.objects.bulk_create(new_entries, ignore_conflicts=True)
+        if found:
+            EmbeddingCacheEntry.objects.filter(id__in=[e.id for e in found.values()]).update(
+                hits=F('hits') + 1, last_used_at=timezone.now()
+            )
+        EmbeddingCacheStat.objects.get_or_create(model=model)
+        EmbeddingCacheStat.objects.filter(model=model).update(
+            hits=F('hits') + hit_count,
+            misses=F('misses') + len(keys) - hit_count,
+            tokens_saved=F('tokens_saved') + tokens_saved,
+            tokens_embedded=F('tokens_embedded') + sum(e.token_count for e in new_entries),
+        )
+    if new_entries:
+        evict(model)
+    return [packed[k] for k in keys]
+
+
+def cached_embeddings(model: str, texts: List[str], embed_many: Callable[[List[str]], List[bytes]]) -> List[bytes]:
+    """Return packed embeddings for ``texts``, calling ``embed_many`` only for cache misses.
+
+    Keys are (model, sha256 of whitespace-normalized text), so identical JD chunks uploaded
+    against different resumes, and repeated chat questions, are embedded once.
+    """
+    if not texts:
+        return []
+    keys, found, missing = _lookup(model, texts)
+    vectors = embed_many(list(missing.values())) if missing else []
+    return _record(model, keys, found, missing, vectors)
+
+
+async def acached_embeddings(model: str, texts: List[str], embed_many: Callable[[List[str]], Awaitable[List[bytes]]]) -> List[bytes]:
+    """cached_embeddings with a coroutine ``embed_many``; the cache queries run in a worker thread."""
+    if not texts:
+        return []
+    keys, found, missing = await sync_to_async(_lookup)(model, texts)
+    vectors = await embed_many(list(missing.values())) if missing else []
+    return await sync_to_async(_record)(model, keys, found, missing, vectors)
+
+
+def evict(model: str, max_entries: int = EMBED_CACHE_MAX_ENTRIES) -> int:
+    """Drop least-recently-used entries of ``model`` beyond ``max_entries``."""
+    qs = EmbeddingCacheEntry.objects.filter(model=model)
+    excess = qs.count() - max_entries
+    if excess <= 0:
+        return 0
+    stale = list(qs.order_by('last_used_at', 'id').values_list('id', flat=True)[:excess])
+    deleted, _ = EmbeddingCacheEntry.objects.filter(id__in=stale).delete()
+    return deleted
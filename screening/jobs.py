@@ -0,0 +1,193 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Session, UploadJob
+from .parsing import DocumentError
+from .pipeline import build_chunks, analyze_match, save_match, embed_documents
+from .documents import unchunked_types, upload_documents
+
+logger = logging.getLogger(__name__)
+
+# Embedding runs before match so chat is usable while the slow analysis is still in flight.
+STAGES = ['parse', 'chunk', 'embed', 'match']
+
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BACKOFF = float(os.environ.get('JOB_RETRY_BACKOFF', '5'))  # seconds, doubled per attempt
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', '600'))  # reclaim jobs of crashed workers
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '2'))
+# 'thread': drain the queue in a daemon thread of the web process; 'external': rely on run_upload_worker.
+UPLOAD_WORKER_MODE = os.environ.get('UPLOAD_WORKER_MODE', 'thread')
+
+
+class LeaseLost(Exception):
+    """The job was reclaimed by another worker (its lock went stale), so this one must stop writing to it."""
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def enqueue_upload(resume_file, jd_file, force_reanalyze: bool = False, mode: str = 'llm') -> UploadJob:
+    job = UploadJob.objects.create(
+        force_reanalyze=force_reanalyze,
+        analysis_mode=mode,
+        resume_name=resume_file.name,
+        resume_data=resume_file.read(),
+        jd_name=jd_file.name,
+        jd_data=jd_file.read(),
+        max_attempts=JOB_MAX_ATTEMPTS,
+        progress={stage: {'status': 'pending'} for stage in STAGES},
+    )
+    if UPLOAD_WORKER_MODE == 'thread':
+        start_thread_worker()
+    return job
+
+
+def claim_next_job(owner: str) -> Optional[UploadJob]:
+    """Atomically move one runnable job to 'running' under a new lease. Works without SELECT ... SKIP LOCKED."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    runnable = Q(status=UploadJob.STATUS_QUEUED, available_at__lte=now) | Q(status=UploadJob.STATUS_RUNNING, locked_at__lt=stale)
+    for job_id in UploadJob.objects.filter(runnable).order_by('available_at').values_list('id', flat=True)[:5]:
+        claimed = UploadJob.objects.filter(runnable, id=job_id).update(
+            status=UploadJob.STATUS_RUNNING, locked_at=now, locked_by=owner, updated_at=now, lease=F('lease') + 1,
+        )
+        if claimed:
+            return UploadJob.objects.get(id=job_id)
+    return None
+
+
+def _save(job: UploadJob, *fields: str):
+    """job.save() (of ``fields``, default all) that only lands while the job still holds the lease it was
+    claimed with; raises LeaseLost once a stale-lock reclaim has handed the job to another worker."""
+    job.updated_at = timezone.now()
+    names = fields + ('updated_at',) if fields else [
+        f.attname for f in UploadJob._meta.concrete_fields if f.name not in ('id', 'lease', 'created_at')]
+    if not UploadJob.objects.filter(id=job.id, lease=job.lease).update(**{n: getattr(job, n) for n in names}):
+        raise LeaseLost(f'Upload job {job.id} was reclaimed by another worker.')
+
+
+def _run_stage(job: UploadJob, stage: str):
+    if stage == 'parse':
+        resume, jd, warnings = upload_documents(job.resume_name, bytes(job.resume_data), job.jd_name, bytes(job.jd_data))
+        job.session = Session.objects.create(resume_document=resume, jd_document=jd)
+        if warnings:
+            job.progress['parse']['warnings'] = warnings
+        # Raw files are no longer needed once the text is persisted.
+        job.resume_data = None
+        job.jd_data = None
+    elif stage == 'chunk':
+        # Documents already stored by an earlier upload keep their chunks.
+        pending = unchunked_types(job.session)
+        chunks = build_chunks(job.session.resume_text, job.session.jd_text)
+        job.payload = {'chunks': {doc_type: [c._asdict() for c in stream] for doc_type, stream in chunks.items() if doc_type in pending}}
+    elif stage == 'embed':
+        job.progress['embed']['chunks'] = embed_documents(job.session, job.payload.get('chunks', {}))
+        job.payload = {}
+    elif stage == 'match':
+        # LLM errors fail the stage so it is retried with backoff; only the last attempt falls back to the lexical score.
+        last_attempt = job.attempts + 1 >= job.max_attempts
+        save_match(job.session, analyze_match(job.session.resume_text, job.session.jd_text, force=job.force_reanalyze,
+                                              mode=job.analysis_mode, fallback=last_attempt))
+
+
+def run_job(job: UploadJob):
+    """Run the job's remaining stages. Every write is fenced by the job's lease, so a worker whose lock
+    went stale and was reclaimed stops at its next write instead of overwriting the new owner's progress."""
+    try:
+        _run_stages(job)
+    except LeaseLost:
+        logger.warning('Upload job %s was reclaimed by another worker; dropping it', job.id)
+
+
+def _run_stages(job: UploadJob):
+    while job.stage in STAGES:
+        stage = job.stage
+        job.progress[stage] = {**job.progress.get(stage, {}), 'status': 'running', 'attempt': job.attempts + 1}
+        _save(job, 'progress')
+        start = time.perf_counter()
+        try:
+            _run_stage(job, stage)
+        except Exception as e:
+            logger.exception('Upload job %s failed in stage %s', job.id, stage)
+            job.attempts += 1
+            job.error = f"{stage}: {e}"
+            job.progress[stage]['status'] = 'failed'
+            # A document that can't be read won't become readable on retry.
+            if job.attempts >= job.max_attempts or isinstance(e, DocumentError):
+                job.status = UploadJob.STATUS_FAILED
+            else:
+                job.status = UploadJob.STATUS_QUEUED
+                job.available_at = timezone.now() + timedelta(seconds=JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1))
+            job.locked_at = None
+            job.locked_by = ''
+            _save(job)
+            return
+        job.progress[stage].update(status='done', duration_ms=round((time.perf_counter() - start) * 1000, 1))
+        next_index = STAGES.index(stage) + 1
+        job.stage = STAGES[next_index] if next_index < len(STAGES) else 'done'
+        _save(job)
+    job.status = UploadJob.STATUS_DONE
+    job.error = ''
+    job.locked_at = None
+    job.locked_by = ''
+    _save(job)
+
+
+def run_worker(once: bool = False, poll_interval: float = JOB_POLL_INTERVAL, stop_when_idle: bool = False) -> int:
+    """Process jobs until stopped; returns how many jobs were run."""
+    owner = worker_id()
+    processed = 0
+    while True:
+        close_old_connections()
+        job = claim_next_job(owner)
+        if job is not None:
+            run_job(job)
+            processed += 1
+            if once:
+                return processed
+            continue
+        if once:
+            return processed
+        if stop_when_idle and not UploadJob.objects.filter(status=UploadJob.STATUS_QUEUED).exists():
+            return processed
+        time.sleep(poll_interval)
+
+
+_thread_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_wakeup = False
+
+
+def _drain_queue():
+    global _thread, _wakeup
+    try:
+        while True:
+            run_worker(stop_when_idle=True)
+            with _thread_lock:
+                # A job enqueued while we were deciding to stop would otherwise wait for the next upload.
+                if not _wakeup:
+                    _thread = None
+                    return
+                _wakeup = False
+    finally:
+        connection.close()
+
+
+def start_thread_worker():
+    """Ensure one in-process daemon thread is draining the queue; it exits once no jobs are queued."""
+    global _thread, _wakeup
+    with _thread_lock:
+        if _thread is not None:
+            _wakeup = True
+            return
+        _wakeup = False
+        _thread = threading.Thread(target=_drain_queue, name='upload-worker', daemon=True)
+        _thread.start()
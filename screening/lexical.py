@@ -0,0 +1,202 @@
+"""Local lexical scoring: BM25 match scores for JD requirements and BM25 chunk retrieval, no network calls."""
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+import numpy as np
+from scipy import sparse
+from .parsing import SECTION_HEADINGS, SECTION_PATTERN, SENTENCE_BOUNDARY, iter_sections
+from .skills import get_matcher
+from .tracing import traced
+
+LEXICAL_BM25_K1 = float(os.environ.get('LEXICAL_BM25_K1', '1.2'))
+LEXICAL_BM25_B = float(os.environ.get('LEXICAL_BM25_B', '0.75'))
+# Taxonomy skills count this many times more than ordinary words.
+LEXICAL_SKILL_WEIGHT = float(os.environ.get('LEXICAL_SKILL_WEIGHT', '3.0'))
+
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9+#]*(?:[.\-/][a-z0-9+#]+)*")
+STOP_WORDS = frozenset("""
+a about above after all also an and any are as at be been being both but by can could do does done
+each etc for from had has have having he her his how i if in into is it its just like may more most
+must my nice no not of on or our out over own per plus preferred required requirements role s she
+should so some such than that the their them then there these they this those through to too under
+up us using very via was we well were what when where which while who will with within work would
+year years you your able ability strong good great solid excellent hands-on proven knowledge
+understanding experience experienced familiarity familiar working team teams candidate job
+know knows tell me did
+""".split()) | frozenset(w for h in SECTION_HEADINGS for w in h.split())
+
+
+def terms(text: str) -> List[str]:
+    """Canonical taxonomy skills plus the remaining non-stop words, lowercased, in order."""
+    out = []
+    pos = 0
+    for m in get_matcher().find(text):
+        out.extend(w for w in WORD_PATTERN.findall(text[pos:m.start].lower()) if w not in STOP_WORDS)
+        out.append(m.skill)
+        pos = m.end
+    out.extend(w for w in WORD_PATTERN.findall(text[pos:].lower()) if w not in STOP_WORDS)
+    return out
+
+
+class LexicalScorer:
+    """Scores resumes against one JD.
+
+    The JD is split into requirement sentences, weighted TF-IDF style (IDF across the JD's own
+    requirements, boosted for taxonomy skills). Each resume section is a BM25 document. A
+    requirement's coverage is its best section score over its best possible score, and the
+    match score is the weighted mean coverage. Scores depend only on the JD and that resume,
+    so a pre-screen ranks candidates the same way however the batch is composed.
+    """
+
+    def __init__(self, jd_text: str):
+        self.requirements = []
+        req_terms = []
+        for _, start, end in iter_sections(jd_text):
+            bounds = [start] + [m.end() for m in SENTENCE_BOUNDARY.finditer(jd_text, start, end)] + [end]
+            heading = SECTION_PATTERN.match(jd_text, start)
+            if heading:
+                bounds[0] = heading.end()
+            for lo, hi in zip(bounds, bounds[1:]):
+                found = terms(jd_text[lo:hi])
+                if found:
+                    self.requirements.append(jd_text[lo:hi].strip())
+                    req_terms.append(found)
+        self.vocab: Dict[str, int] = {}
+        for found in req_terms:
+            for t in found:
+                self.vocab.setdefault(t, len(self.vocab))
+        self.names = np.array(list(self.vocab), dtype=object)
+
+        skills = set(get_matcher().skills(jd_text))
+        n = max(1, len(req_terms))
+        presence = self._matrix(req_terms).astype(bool).astype(np.float64)
+        df = np.asarray(presence.sum(axis=0)).ravel()
+        idf = 1.0 + np.log((n + 1) / (df + 1))
+        boost = np.array([LEXICAL_SKILL_WEIGHT if t in skills else 1.0 for t in self.vocab])
+        self.weights = idf * boost
+        self.query = presence.multiply(self.weights).tocsr()  # requirements x vocab
+        self.bounds = np.asarray(self.query.sum(axis=1)).ravel()  # score of a section that has every term once
+
+    def _matrix(self, units: List[List[str]]) -> sparse.csr_matrix:
+        """Term counts (units x vocab) for vocabulary terms."""
+        rows, cols = [], []
+        for i, found in enumerate(units):
+            for t in found:
+                j = self.vocab.get(t)
+                if j is not None:
+                    rows.append(i)
+                    cols.append(j)
+        data = np.ones(len(rows), dtype=np.float64)
+        matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(units), len(self.vocab)))
+        matrix.sum_duplicates()
+        return matrix
+
+    def score_many(self, resume_texts: List[str]) -> List[Dict]:
+        start = time.perf_counter()
+        units, owner, lengths = [], [], []
+        for r, text in enumerate(resume_texts):
+            for _, lo, hi in iter_sections(text):
+                found = terms(text[lo:hi])
+                units.append(found)
+                owner.append(r)
+                lengths.append(len(found))
+        owner = np.array(owner, dtype=np.int64)
+        lengths = np.array(lengths, dtype=np.float64)
+        if not self.vocab or not units:
+            elapsed = (time.perf_counter() - start) * 1000
+            return [self._result(np.zeros(len(self.requirements)), np.zeros(len(self.vocab), bool), elapsed)
+                    for _ in resume_texts]
+
+        # BM25 term saturation with length normalized against the same resume's sections.
+        per_resume = np.bincount(owner, weights=lengths, minlength=len(resume_texts))
+        sections = np.bincount(owner, minlength=len(resume_texts))
+        avg_len = np.maximum(per_resume / np.maximum(sections, 1), 1.0)[owner]
+        tf = self._matrix(units)
+        norm = LEXICAL_BM25_K1 * (1 - LEXICAL_BM25_B + LEXICAL_BM25_B * lengths / avg_len)
+        tf.data = tf.data * (LEXICAL_BM25_K1 + 1) / (tf.data + np.repeat(norm, np.diff(tf.indptr)))
+
+        scores = (self.query @ tf.T).toarray()  # requirements x units
+        bounds = np.maximum(self.bounds, 1e-9)[:, None]
+        owners = sparse.csr_matrix((np.ones(len(owner)), (owner, np.arange(len(owner)))), shape=(len(resume_texts), len(owner)))
+        present = (owners @ tf) > 0  # resumes x vocab
+
+        elapsed = (time.perf_counter() - start) * 1000
+        results = []
+        for r in range(len(resume_texts)):
+            cols = np.flatnonzero(owner == r)
+            coverage = np.minimum(1.0, scores[:, cols].max(axis=1) / bounds[:, 0]) if len(cols) else np.zeros(len(bounds))
+            results.append(self._result(coverage, present[r].toarray().ravel(), elapsed / max(1, len(resume_texts))))
+        return results
+
+    def score(self, resume_text: str) -> Dict:
+        return self.score_many([resume_text])[0]
+
+    def _result(self, coverage: np.ndarray, present: np.ndarray, elapsed_ms: float) -> Dict:
+        total = float(self.bounds.sum())
+        score = round(100 * float(self.bounds @ coverage) / total, 2) if total else 0.0
+        order = np.argsort(-self.weights, kind='stable')
+        matched = [str(self.names[j]) for j in order if present[j]]
+        missing = [str(self.names[j]) for j in order if not present[j]]
+        covered = [self.requirements[i] for i in np.argsort(-coverage, kind='stable') if coverage[i] >= 0.5]
+        uncovered = [self.requirements[i] for i in np.argsort(coverage, kind='stable') if coverage[i] < 0.5]
+        return {
+            'match_score': score,
+            'strengths': [f"Covers: {req[:160]}" for req in covered[:5]] or [f"Mentions {t}" for t in matched[:5]],
+            'gaps': [f"No clear evidence for: {req[:160]}" for req in uncovered[:4]],
+            'insights': (
+                f"Fast lexical pre-screen: {sum(coverage >= 0.5)} of {len(coverage)} job requirements are well covered; "
+                f"the resume mentions {len(matched)} of {len(matched) + len(missing)} key terms"
+                + (f" (missing: {', '.join(missing[:5])})." if missing else '.')
+            ),
+            'matched_terms': matched,
+            'missing_terms': missing,
+            'mode': 'fast',
+            'elapsed_ms': round(elapsed_ms, 2),
+        }
+
+
+@traced('fast_match')
+def fast_match(resume_text: str, jd_text: str) -> Dict:
+    return LexicalScorer(jd_text).score(resume_text)
+
+
+def term_counts(text: str) -> Dict[str, int]:
+    return dict(Counter(terms(text)))
+
+
+class LexicalIndex:
+    """BM25 inverted index over one session's chunks; rows keep the order they were given in."""
+
+    def __init__(self, docs: List[Dict[str, int]], k1: float = LEXICAL_BM25_K1, b: float = LEXICAL_BM25_B):
+        self.size = len(docs)
+        self.k1 = k1
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = np.zeros(self.size)
+        for row, counts in enumerate(docs):
+            lengths[row] = sum(counts.values())
+            for t, tf in counts.items():
+                rows, tfs = postings.setdefault(t, ([], []))
+                rows.append(row)
+                tfs.append(tf)
+        avg_len = max(float(lengths.mean()), 1.0) if self.size else 1.0
+        self.norm = k1 * (1 - b + b * lengths / avg_len)
+        self.postings = {t: (np.array(rows, dtype=np.int32), np.array(tfs, dtype=np.float64))
+                         for t, (rows, tfs) in postings.items()}
+        self.nbytes = int(self.norm.nbytes) + sum(len(t) + 64 + 12 * len(p[0]) for t, p in self.postings.items())
+
+    def __len__(self) -> int:
+        return self.size
+
+    def scores(self, query_terms: List[str]) -> np.ndarray:
+        """BM25 score of every row for the query (0 where no query term occurs)."""
+        out = np.zeros(self.size)
+        for t in dict.fromkeys(query_terms):
+            posting = self.postings.get(t)
+            if posting is None:
+                continue
+            rows, tf = posting
+            idf = np.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            out[rows] += idf * tf * (self.k1 + 1) / (tf + self.norm[rows])
+        return out
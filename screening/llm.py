@@ -0,0 +1,355 @@
+"""Process-wide gateway for OpenAI calls.
+
+One long-lived client (and so one HTTP connection pool) per process, shared by matching,
+chat and embeddings. Every call is scheduled against request- and token-per-minute
+buckets, retried on 429/5xx/connection errors with jittered exponential backoff (honouring
+Retry-After), and identical in-flight requests are coalesced into a single upstream call:
+embeddings per text, chat completions per exact request. The ``a*`` methods are the
+asyncio counterparts used by the ASGI views; they share the buckets but keep one
+AsyncOpenAI client per event loop.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+from .tokens import count_tokens
+from .tracing import Counter, record_usage, registry
+
+logger = logging.getLogger(__name__)
+
+LLM_RPM = int(os.environ.get('LLM_RPM', '0'))  # upstream requests/minute per process, 0 = unlimited
+LLM_TPM = int(os.environ.get('LLM_TPM', '0'))  # estimated tokens/minute per process, 0 = unlimited
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '4'))
+LLM_RETRY_BASE_SECONDS = float(os.environ.get('LLM_RETRY_BASE_SECONDS', '0.5'))
+LLM_RETRY_MAX_SECONDS = float(os.environ.get('LLM_RETRY_MAX_SECONDS', '20'))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '60'))
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', '32'))
+# Completion tokens assumed for the TPM bucket when a request sets no max_tokens.
+LLM_DEFAULT_COMPLETION_TOKENS = 300
+
+RETRYABLE = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError, openai.APITimeoutError)
+
+api_retries = registry.register(Counter(
+    'talentrag_api_retries_total', 'OpenAI calls retried after a 429/5xx/connection error.', ['api']))
+api_coalesced = registry.register(Counter(
+    'talentrag_api_coalesced_total', 'Requests (embeddings: texts) served by an identical in-flight call.', ['api']))
+api_throttled = registry.register(Counter(
+    'talentrag_api_throttled_seconds_total', 'Time calls waited for the RPM/TPM buckets.', ['api']))
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units evenly over a minute, holding at most one minute's worth.
+
+    ``acquire`` blocks until enough units are available; ``settle`` corrects an estimate
+    afterwards and may leave the bucket in debt, which delays later callers.
+    """
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.per_minute, self.tokens + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def _take(self, n: float) -> float:
+        """Take ``n`` units and return 0, or return how long to wait before trying again."""
+        n = min(n, self.per_minute)  # a request bigger than the bucket waits for a full bucket
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= n:
+                self.tokens -= n
+                return 0.0
+            return (n - self.tokens) * 60 / self.per_minute
+
+    def acquire(self, n: float = 1) -> float:
+        """Take ``n`` units, returning the seconds spent waiting."""
+        waited = 0.0
+        while self.per_minute > 0:
+            wait = self._take(n)
+            if not wait:
+                break
+            time.sleep(wait)
+            waited += wait
+        return waited
+
+    async def aacquire(self, n: float = 1) -> float:
+        waited = 0.0
+        while self.per_minute > 0:
+            wait = self._take(n)
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited
+
+    def settle(self, delta: float):
+        if self.per_minute > 0 and delta:
+            with self._lock:
+                self._refill(time.monotonic())
+                self.tokens -= delta
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    ms = response.headers.get('retry-after-ms')
+    if ms:
+        return float(ms) / 1000
+    seconds = response.headers.get('retry-after')
+    try:
+        return float(seconds) if seconds else None
+    except ValueError:
+        return None
+
+
+class _LoopState:
+    """The AsyncOpenAI client and in-flight requests of one event loop (futures can't cross loops)."""
+
+    def __init__(self, client: AsyncOpenAI):
+        self.client = client
+        self.inflight: Dict[Tuple, asyncio.Future] = {}
+
+
+class Gateway:
+    def __init__(self, rpm: int = LLM_RPM, tpm: int = LLM_TPM, max_retries: int = LLM_MAX_RETRIES,
+                 base_url: Optional[str] = None, api_key: Optional[str] = None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.base_url = base_url
+        self.api_key = api_key
+        self._client: Optional[OpenAI] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple, Future] = {}
+        self._loops: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]' = weakref.WeakKeyDictionary()
+
+    def _client_options(self) -> Dict:
+        api_key = self.api_key or os.environ.get('OPENAI_API_KEY')
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY environment variable is not set. Set it or create backend/.env and restart.")
+        # Retries are ours (they re-enter the rate buckets), so the SDK's own are off.
+        return {'api_key': api_key, 'base_url': self.base_url or os.environ.get('OPENAI_BASE_URL') or None,
+                'max_retries': 0, 'timeout': LLM_TIMEOUT_SECONDS}
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+
+    @property
+    def client(self) -> OpenAI:
+        with self._lock:
+            if self._client is None:
+                self._client = OpenAI(**self._client_options(),
+                                      http_client=httpx.Client(limits=self._limits(), timeout=LLM_TIMEOUT_SECONDS))
+            return self._client
+
+    def _loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                state = self._loops[loop] = _LoopState(AsyncOpenAI(
+                    **self._client_options(), http_client=httpx.AsyncClient(limits=self._limits(), timeout=LLM_TIMEOUT_SECONDS)))
+            return state
+
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        """The running event loop's pooled async client."""
+        return self._loop_state().client
+
+    def configure(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        """Point the gateway elsewhere (e.g. a local stand-in); the next call opens a new pool."""
+        with self._lock:
+            old, self._client = self._client, None
+            self._loops = weakref.WeakKeyDictionary()
+            self.base_url, self.api_key = base_url, api_key
+        if old is not None:
+            old.close()
+
+    def _retry_delay(self, api: str, attempt: int, error: Exception) -> float:
+        delay = _retry_after(error)
+        if delay is None:
+            delay = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+        api_retries.inc(api)
+        logger.info('%s call failed (%s), retry %d in %.2fs', api, type(error).__name__, attempt + 1, delay)
+        return min(delay, LLM_RETRY_MAX_SECONDS)
+
+    def _finish(self, api: str, model: str, estimate: int, throttled: float, response, record: bool):
+        if throttled:
+            api_throttled.inc(api, amount=throttled)
+        if record:  # streams report usage in their last event, see chat_stream
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                self.tokens.settle(getattr(usage, 'total_tokens', estimate) - estimate)
+            record_usage(api, model, usage)
+        return response
+
+    def _call(self, api: str, model: str, estimate: int, fn: Callable[[OpenAI], object], record: bool = True):
+        throttled = self.requests.acquire(1) + self.tokens.acquire(estimate)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._finish(api, model, estimate, throttled, fn(self.client), record)
+            except RETRYABLE as e:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(api, attempt, e))
+                throttled += self.requests.acquire(1)
+
+    async def _acall(self, api: str, model: str, estimate: int, fn: Callable[[AsyncOpenAI], Awaitable], record: bool = True):
+        throttled = await self.requests.aacquire(1) + await self.tokens.aacquire(estimate)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._finish(api, model, estimate, throttled, await fn(self.aclient), record)
+            except RETRYABLE as e:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(api, attempt, e))
+                throttled += await self.requests.aacquire(1)
+
+    def _coalesce(self, keys: List[Tuple], api: str, inflight: Optional[Dict] = None,
+                  new_future: Callable = Future) -> Tuple[Dict[Tuple, Future], List[Tuple]]:
+        """Futures for ``keys``; the keys returned as owned must be resolved by the caller."""
+        inflight = self._inflight if inflight is None else inflight
+        futures, owned = {}, []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                future = inflight.get(key)
+                if future is None:
+                    future = inflight[key] = new_future()
+                    owned.append(key)
+                else:
+                    api_coalesced.inc(api)
+                futures[key] = future
+        return futures, owned
+
+    def _release(self, futures: Dict[Tuple, Future], owned: List[Tuple], results: Optional[List] = None,
+                 error: Optional[BaseException] = None, inflight: Optional[Dict] = None):
+        inflight = self._inflight if inflight is None else inflight
+        with self._lock:
+            for key in owned:
+                inflight.pop(key, None)
+        for i, key in enumerate(owned):
+            if error is not None:
+                futures[key].set_exception(error)
+                futures[key].exception()  # the owner re-raises; don't report it as never retrieved
+            else:
+                futures[key].set_result(results[i])
+
+    def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        """One embeddings request for the texts no concurrent caller is already embedding."""
+        keys = [('embeddings', model, t) for t in texts]
+        futures, owned = self._coalesce(keys, 'embeddings')
+        if owned:
+            batch = [key[2] for key in owned]
+            try:
+                resp = self._call('embeddings', model, sum(count_tokens(t, model) for t in batch),
+                                  lambda c: c.embeddings.create(model=model, input=batch))
+            except BaseException as e:
+                self._release(futures, owned, error=e)
+                raise
+            self._release(futures, owned, [d.embedding for d in sorted(resp.data, key=lambda d: d.index)])
+        return [futures[key].result() for key in keys]
+
+    async def aembed(self, texts: List[str], model: str) -> List[List[float]]:
+        state = self._loop_state()
+        keys = [('embeddings', model, t) for t in texts]
+        futures, owned = self._coalesce(keys, 'embeddings', state.inflight, asyncio.get_running_loop().create_future)
+        if owned:
+            batch = [key[2] for key in owned]
+            try:
+                resp = await self._acall('embeddings', model, sum(count_tokens(t, model) for t in batch),
+                                         lambda c: c.embeddings.create(model=model, input=batch))
+            except BaseException as e:
+                self._release(futures, owned, error=e, inflight=state.inflight)
+                raise
+            self._release(futures, owned, [d.embedding for d in sorted(resp.data, key=lambda d: d.index)],
+                          inflight=state.inflight)
+        return [await futures[key] for key in keys]
+
+    def _chat_estimate(self, model: str, messages: List[Dict], kwargs: Dict) -> int:
+        prompt = sum(count_tokens(m.get('content') or '', model) + 4 for m in messages)
+        return prompt + kwargs.get('max_tokens', LLM_DEFAULT_COMPLETION_TOKENS)
+
+    @staticmethod
+    def _chat_key(model: str, messages: List[Dict], kwargs: Dict) -> Tuple:
+        return ('chat', hashlib.sha256(json.dumps([model, messages, kwargs], sort_keys=True, default=str).encode()).hexdigest())
+
+    def chat(self, model: str, messages: List[Dict], **kwargs):
+        """A chat completion; an identical request already in flight is shared rather than repeated."""
+        key = self._chat_key(model, messages, kwargs)
+        futures, owned = self._coalesce([key], 'chat')
+        if owned:
+            try:
+                resp = self._call('chat', model, self._chat_estimate(model, messages, kwargs),
+                                  lambda c: c.chat.completions.create(model=model, messages=messages, **kwargs))
+            except BaseException as e:
+                self._release(futures, owned, error=e)
+                raise
+            self._release(futures, owned, [resp])
+        return futures[key].result()
+
+    async def achat(self, model: str, messages: List[Dict], **kwargs):
+        state = self._loop_state()
+        key = self._chat_key(model, messages, kwargs)
+        futures, owned = self._coalesce([key], 'chat', state.inflight, asyncio.get_running_loop().create_future)
+        if owned:
+            try:
+                resp = await self._acall('chat', model, self._chat_estimate(model, messages, kwargs),
+                                         lambda c: c.chat.completions.create(model=model, messages=messages, **kwargs))
+            except BaseException as e:
+                self._release(futures, owned, error=e, inflight=state.inflight)
+                raise
+            self._release(futures, owned, [resp], inflight=state.inflight)
+        return await futures[key]
+
+    def chat_stream(self, model: str, messages: List[Dict], **kwargs) -> Iterator:
+        """Streamed chat completion events; retried only until the stream has started, never coalesced."""
+        estimate = self._chat_estimate(model, messages, kwargs)
+        stream = self._call('chat', model, estimate,
+                            lambda c: c.chat.completions.create(model=model, messages=messages, stream=True,
+                                                                stream_options={'include_usage': True}, **kwargs),
+                            record=False)
+        usage = None
+        try:
+            for event in stream:
+                usage = getattr(event, 'usage', None) or usage  # final event when include_usage is honoured
+                yield event
+        finally:
+            stream.close()
+            record_usage('chat', model, usage)
+            if usage is not None:
+                self.tokens.settle(usage.total_tokens - estimate)
+
+    async def achat_stream(self, model: str, messages: List[Dict], **kwargs) -> AsyncIterator:
+        estimate = self._chat_estimate(model, messages, kwargs)
+        stream = await self._acall('chat', model, estimate,
+                                   lambda c: c.chat.completions.create(model=model, messages=messages, stream=True,
+                                                                       stream_options={'include_usage': True}, **kwargs),
+                                   record=False)
+        usage = None
+        try:
+            async for event in stream:
+                usage = getattr(event, 'usage', None) or usage
+                yield event
+        finally:
+            await stream.close()
+            record_usage('chat', model, usage)
+            if usage is not None:
+                self.tokens.settle(usage.total_tokens - estimate)
+
+
+gateway = Gateway()
@@ -0,0 +1,58 @@
+import tempfile
+import time
+import uuid
+import numpy as np
+from django.core.management.base import BaseCommand
+from screening.ann import IVFIndex
+
+
+def clustered_vectors(rng, n: int, dim: int, clusters: int, spread: float = 0.35) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    x = centers[rng.integers(0, clusters, size=n)] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+class Command(BaseCommand):
+    help = 'Recall@k and QPS of the IVF index against exact brute-force search on synthetic embeddings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--dim', type=int, default=256)
+        parser.add_argument('--clusters', type=int, default=500)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--nprobe', default='1,4,8,16,32')
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(0)
+        n, k = opts['rows'], opts['k']
+        data = clustered_vectors(rng, n + opts['queries'], opts['dim'], opts['clusters'])
+        base, queries = data[:n], data[n:]
+        sessions = [uuid.uuid4() for _ in range(n)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            index = IVFIndex(tmp)
+            start = time.perf_counter()
+            for lo in range(0, n, 10000):
+                index.add(sessions[lo:lo + 10000], list(range(lo, min(lo + 10000, n))), base[lo:lo + 10000], auto_train=False)
+            index.train()
+            build_s = time.perf_counter() - start
+            self.stdout.write(f"Indexed {n} x {opts['dim']} in {build_s:.1f}s: {index.stats()}")
+
+            start = time.perf_counter()
+            truth = []
+            for q in queries:
+                scores = base @ q
+                truth.append(set(np.argpartition(-scores, k - 1)[:k].tolist()))
+            brute_qps = len(queries) / (time.perf_counter() - start)
+            self.stdout.write(f"{'nprobe':>8} {'recall@' + str(k):>10} {'QPS':>10} {'vs brute':>9}")
+            self.stdout.write(f"{'brute':>8} {1.0:>10.3f} {brute_qps:>10.1f} {1.0:>8.1f}x")
+
+            for nprobe in [int(p) for p in opts['nprobe'].split(',') if p.strip()]:
+                hits = 0
+                start = time.perf_counter()
+                for q, expected in zip(queries, truth):
+                    _, rows = index.search(q, k=k, nprobe=nprobe)
+                    hits += len(expected & set(rows.tolist()))
+                qps = len(queries) / (time.perf_counter() - start)
+                self.stdout.write(f"{nprobe:>8} {hits / (k * len(queries)):>10.3f} {qps:>10.1f} {qps / brute_qps:>8.1f}x")
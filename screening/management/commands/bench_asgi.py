@@ -0,0 +1,172 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+import httpx
+from screening.benchmarks.corpus import make_job_description, make_resume
+from screening.benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from screening.benchmarks.harness import point_clients_at
+from screening.benchmarks.suite import percentiles
+from screening.documents import create_session, delete_sessions
+from screening.models import Session
+from screening.parsing import normalize_whitespace
+from screening.pipeline import build_chunks, save_match
+from screening.rag import store_documents
+
+DEPLOYMENTS = {
+    # What render.yaml used to run: sync workers, one request in flight per worker.
+    'wsgi': ('gunicorn', ['backend.wsgi:application', '--bind', '127.0.0.1:{port}', '--workers', '{workers}', '--timeout', '120']),
+    'asgi': ('uvicorn', ['backend.asgi:application', '--host', '127.0.0.1', '--port', '{port}', '--workers', '{workers}']),
+}
+SCENARIOS = ('chat', 'upload')
+BENCH_USER = 'bench-asgi'
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = ('Start the WSGI (gunicorn sync workers) and ASGI (uvicorn, async views) deployments on this box against '
+            'a local fake OpenAI server and compare throughput and latency as concurrency grows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deployments', default='wsgi,asgi')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per deployment.')
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrent client counts.')
+        parser.add_argument('--requests', type=int, default=64, help='Requests per scenario and concurrency level.')
+        parser.add_argument('--embed-latency-ms', type=float, default=100)
+        parser.add_argument('--chat-latency-ms', type=float, default=800)
+        parser.add_argument('--keep', action='store_true', help='Keep the sessions created by the benchmark.')
+
+    def handle(self, *args, **opts):
+        deployments = [d.strip() for d in opts['deployments'].split(',') if d.strip()]
+        scenarios = [s.strip() for s in opts['scenarios'].split(',') if s.strip()]
+        unknown = (set(deployments) - set(DEPLOYMENTS)) | (set(scenarios) - set(SCENARIOS))
+        if unknown:
+            raise CommandError(f"Unknown deployment/scenario: {', '.join(sorted(unknown))}")
+        levels = [int(c) for c in opts['concurrency'].split(',') if c.strip()]
+        user, _ = User.objects.get_or_create(username=BENCH_USER)
+        token = str(AccessToken.for_user(user))
+        seed = int(time.time())
+        config = FakeOpenAIConfig(embed_latency_ms=opts['embed_latency_ms'], chat_latency_ms=opts['chat_latency_ms'])
+        created = []
+        self.stdout.write(f"{'deployment':<10} {'scenario':<8} {'clients':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6}")
+        try:
+            with FakeOpenAIServer(config) as fake:
+                with point_clients_at(fake.base_url):
+                    session = self.chat_session(seed)
+                created.append(session.id)
+                for name in deployments:
+                    with self.serve(name, opts['workers'], fake.base_url) as base_url:
+                        # Untimed warm-up so every worker has imported, connected and opened its pools.
+                        asyncio.run(self.load(base_url, token, 'chat', session, seed, opts['workers'] * 2, opts['workers'] * 4, created))
+                        seed += 1
+                        for scenario in scenarios:
+                            for clients in levels:
+                                result = asyncio.run(self.load(base_url, token, scenario, session, seed, clients, opts['requests'], created))
+                                seed += 1
+                                self.stdout.write(
+                                    f"{name:<10} {scenario:<8} {clients:>7} {result['rps']:>8.2f} {result['p50_ms']:>9.1f} "
+                                    f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['errors']:>6}")
+                                if result['errors']:
+                                    self.stderr.write(f"  e.g. {result['first_error']}")
+        finally:
+            if not opts['keep']:
+                delete_sessions(Session.objects.filter(id__in=created))
+            user.delete()
+
+    def chat_session(self, seed: int) -> Session:
+        resume = normalize_whitespace(make_resume(seed, jobs=6))
+        jd = normalize_whitespace(make_job_description(seed))
+        session = create_session(resume, jd)
+        store_documents(session, build_chunks(resume, jd))
+        save_match(session, {'match_score': 70.0, 'strengths': ['Backend experience'], 'gaps': ['Cloud'],
+                             'insights': 'Benchmark session.'})
+        return session
+
+    def serve(self, name: str, workers: int, openai_base_url: str):
+        module, argv = DEPLOYMENTS[name]
+        if importlib.util.find_spec(module) is None:
+            raise CommandError(f'{module} is not installed (pip install -r requirements.txt).')
+        port = _free_port()
+        argv = [a.format(port=port, workers=workers) for a in argv]
+        env = {**os.environ, 'OPENAI_BASE_URL': openai_base_url, 'OPENAI_API_KEY': 'sk-fake', 'DEBUG': 'false',
+               'DJANGO_SETTINGS_MODULE': 'backend.settings'}
+        env.pop('ASYNC_VIEWS', None)  # each entry point picks its own views
+        return _Server([sys.executable, '-m', module] + argv, env, f'http://127.0.0.1:{port}', settings.BASE_DIR)
+
+    async def load(self, base_url: str, token: str, scenario: str, session: Session, seed: int, clients: int,
+                   requests: int, created: list) -> dict:
+        latencies, errors = [], []
+        gate = asyncio.Semaphore(clients)
+        headers = {'Authorization': f'Bearer {token}'}
+        limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=300) as client:
+            async def one(i: int):
+                async with gate:
+                    start = time.perf_counter()
+                    try:
+                        if scenario == 'chat':
+                            # Unique wording so neither the answer cache nor the embedding cache serves it.
+                            response = await client.post(f'/api/session/{session.id}/chat/',
+                                                         json={'question': f'Does the candidate know tool {i}? (run {seed})'})
+                        else:
+                            files = {'resume': (f'resume_{i}.txt', make_resume(seed * 1000 + i).encode()),
+                                     'job_description': (f'jd_{i}.txt', make_job_description(seed * 1000 + i).encode())}
+                            response = await client.post('/api/upload/', files=files)
+                        response.raise_for_status()
+                        if scenario == 'upload':
+                            created.append(response.json()['session'])
+                    except Exception as e:
+                        errors.append(f'{type(e).__name__}: {e}')
+                        return
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests)))
+            wall = time.perf_counter() - start
+        return {'rps': len(latencies) / wall if wall else 0.0, 'errors': len(errors),
+                'first_error': errors[0] if errors else '', **percentiles(latencies)}
+
+
+class _Server:
+    """A deployment subprocess that is ready (answers HTTP) on enter and stopped on exit."""
+
+    def __init__(self, cmd, env, base_url: str, cwd):
+        self.cmd, self.env, self.base_url, self.cwd = cmd, env, base_url, cwd
+
+    def __enter__(self) -> str:
+        self.log = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(self.cmd, env=self.env, cwd=self.cwd, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                break
+            try:
+                httpx.get(self.base_url + '/api/metrics/', timeout=1)
+                return self.base_url
+            except httpx.TransportError:
+                time.sleep(0.2)
+        self.__exit__()
+        self.log.seek(0)
+        raise CommandError(f"{' '.join(self.cmd[2:4])} did not start:\n{self.log.read().decode(errors='replace')[-2000:]}")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.log.close()
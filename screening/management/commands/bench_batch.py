@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand
+from screening.batch import screen_batch
+from screening.benchmarks.corpus import make_job_description, make_resumes
+from screening.benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from screening.benchmarks.harness import point_clients_at
+from screening.documents import delete_sessions
+from screening.models import Session
+
+
+class Command(BaseCommand):
+    help = 'Measure batch screening throughput (resumes/minute) against a local fake OpenAI server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resumes', type=int, default=40)
+        parser.add_argument('--concurrency', default='1,4,8', help='Comma-separated worker counts to compare.')
+        parser.add_argument('--mode', default='llm', help="Comma-separated batch modes to compare: llm, fast, prescreen.")
+        parser.add_argument('--llm-top', type=int, default=10, help="Resumes sent to the LLM in prescreen mode.")
+        parser.add_argument('--embed-latency-ms', type=float, default=80)
+        parser.add_argument('--chat-latency-ms', type=float, default=600)
+        parser.add_argument('--seed', type=int, default=None, help='Corpus seed (default: fresh, to avoid cache hits).')
+        parser.add_argument('--keep', action='store_true', help='Keep the sessions created by the benchmark.')
+
+    def handle(self, *args, **opts):
+        config = FakeOpenAIConfig(embed_latency_ms=opts['embed_latency_ms'], chat_latency_ms=opts['chat_latency_ms'])
+        seed = opts['seed'] if opts['seed'] is not None else int(time.time())
+        jd = make_job_description(seed).encode()
+        self.stdout.write(f"{'mode':>10} {'workers':>8} {'resumes':>8} {'seconds':>9} {'resumes/min':>12} {'api calls':>10}")
+        with FakeOpenAIServer(config) as server, point_clients_at(server.base_url):
+            modes = [m.strip() for m in opts['mode'].split(',') if m.strip()]
+            workers_list = [int(w) for w in opts['concurrency'].split(',') if w.strip()]
+            for run, (mode, workers) in enumerate((m, w) for m in modes for w in workers_list):
+                # A distinct corpus per run so the embedding cache doesn't favour later runs.
+                resumes = [(f'resume_{i}.txt', text.encode()) for i, text in
+                           enumerate(make_resumes(opts['resumes'], seed=seed * 1000 + run * opts['resumes']))]
+                before = server.counters
+                start = time.perf_counter()
+                result = screen_batch(f'jd_{run}.txt', jd, resumes, force=True, concurrency=workers, mode=mode,
+                                      llm_top=opts['llm_top'])
+                elapsed = time.perf_counter() - start
+                after = server.counters
+                calls = sum(after.get(k, 0) - before.get(k, 0) for k in ('embeddings', 'chat'))
+                self.stdout.write(f"{mode:>10} {workers:>8} {len(resumes):>8} {elapsed:>9.2f} {len(resumes) / elapsed * 60:>12.1f} {calls:>10}")
+                errors = [c for c in result['candidates'] if c.get('error')]
+                if errors:
+                    self.stderr.write(f"  {len(errors)} candidate(s) failed, e.g. {errors[0]['error']}")
+                if not opts['keep']:
+                    delete_sessions(Session.objects.filter(id__in=[c['session'] for c in result['candidates'] if c['session']]))
@@ -0,0 +1,75 @@
+import random
+import time
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+from screening.benchmarks.corpus import make_job_description, make_pdf
+from screening.benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from screening.benchmarks.harness import point_clients_at
+from screening.benchmarks.suite import percentiles
+from screening.documents import delete_sessions
+from screening.models import Document, ResumeChunk, Session
+
+BENCH_USER = 'bench-documents'
+
+
+class Command(BaseCommand):
+    help = ('Upload latency, embedding requests and stored rows when the same resumes (PDF) and one job '
+            'description are uploaded again and again: first uploads vs repeats served by the document store.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--distinct', type=int, default=10, help='Different resume files.')
+        parser.add_argument('--uploads', type=int, default=60, help='Uploads, cycling through the resumes.')
+        parser.add_argument('--pages', type=int, default=3, help='Pages per resume PDF.')
+        parser.add_argument('--mode', default='fast', help="Analysis mode; 'fast' keeps LLM latency out of the timings.")
+        parser.add_argument('--embed-latency-ms', type=float, default=80)
+        parser.add_argument('--seed', type=int, default=None, help='Corpus seed (default: fresh, to avoid cache hits).')
+        parser.add_argument('--keep', action='store_true', help='Keep the sessions and documents created by the benchmark.')
+
+    def handle(self, *args, **opts):
+        seed = opts['seed'] if opts['seed'] is not None else int(time.time())
+        resumes = [make_pdf(opts['pages'], seed=seed * 1000 + i) for i in range(opts['distinct'])]
+        jd = make_job_description(seed).encode()
+        order = [i % len(resumes) for i in range(opts['uploads'])]
+        random.Random(seed).shuffle(order)
+        client = APIClient()
+        user, _ = User.objects.get_or_create(username=BENCH_USER)
+        client.force_authenticate(user)
+        seen, timings, created = set(), {'first': [], 'repeat': []}, []
+        config = FakeOpenAIConfig(embed_latency_ms=opts['embed_latency_ms'], chat_latency_ms=1)
+        try:
+            with FakeOpenAIServer(config) as server, point_clients_at(server.base_url):
+                before = server.counters
+                for n, i in enumerate(order):
+                    files = {'resume': SimpleUploadedFile(f'resume_{i}.pdf', resumes[i]),
+                             'job_description': SimpleUploadedFile('jd.txt', jd), 'mode': opts['mode'], 'async': '0'}
+                    start = time.perf_counter()
+                    response = client.post('/api/upload/', files, format='multipart')
+                    elapsed = (time.perf_counter() - start) * 1000
+                    if response.status_code != 200:
+                        self.stderr.write(f"Upload {n} failed: HTTP {response.status_code} {response.data}")
+                        continue
+                    created.append(response.data['session'])
+                    timings['repeat' if i in seen else 'first'].append(elapsed)
+                    seen.add(i)
+                after = server.counters
+
+            self.stdout.write(f"{'uploads':<8} {'count':>6} {'p50 ms':>8} {'p95 ms':>8}")
+            for label, samples in timings.items():
+                if samples:
+                    p = percentiles(samples)
+                    self.stdout.write(f"{label:<8} {len(samples):>6} {p['p50_ms']:>8.1f} {p['p95_ms']:>8.1f}")
+            sessions = Session.objects.filter(id__in=created)
+            document_ids = {d for pair in sessions.values_list('resume_document_id', 'jd_document_id') for d in pair}
+            per_document = dict(Document.objects.filter(id__in=document_ids).values_list('id', 'chunk_count'))
+            per_session = sum((per_document[r] or 0) + (per_document[j] or 0)
+                              for r, j in sessions.values_list('resume_document_id', 'jd_document_id'))
+            stored = ResumeChunk.objects.filter(document_id__in=document_ids).count()
+            self.stdout.write(f"embedding requests {after.get('embeddings', 0) - before.get('embeddings', 0)}; "
+                              f"{len(created)} sessions over {len(document_ids)} documents; "
+                              f"chunk rows {stored} (one copy per session would be {per_session})")
+        finally:
+            if not opts['keep']:
+                delete_sessions(Session.objects.filter(id__in=created))
+            user.delete()
@@ -0,0 +1,189 @@
+import time
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+from screening.benchmarks.corpus import make_job_description, make_resume
+from screening.benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from screening.benchmarks.harness import point_clients_at
+from screening.benchmarks.suite import BASELINE_PATH, compare, load_baseline, run_scenario, save_baseline
+from screening.documents import create_session, delete_sessions
+from screening.models import Session
+from screening.parsing import chunk_text, iter_chunks, normalize_whitespace, split_sections
+from screening.pipeline import build_chunks, save_match
+from screening.rag import embed_question, retrieve, store_documents
+
+SCENARIOS = ('upload', 'chat', 'chat_stream', 'retrieve', 'chunk_text', 'iter_chunks')
+QUESTIONS = [
+    'What are the main gaps for this role?', 'Summarize the candidate in two sentences.',
+    'Does the candidate have cloud experience?', 'Which projects are most relevant?',
+    'How many years of experience does the candidate have?', 'Is the candidate a fit for a senior role?',
+]
+BENCH_USER = 'bench-e2e'
+
+
+class Command(BaseCommand):
+    help = ('Drive the real endpoints against a local fake OpenAI server and report throughput, '
+            'p50/p95/p99 latency and stage timings, compared with a stored baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+        parser.add_argument('--requests', type=int, default=30, help='Requests per endpoint scenario.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients for endpoint scenarios.')
+        parser.add_argument('--embed-latency-ms', type=float, default=50)
+        parser.add_argument('--chat-latency-ms', type=float, default=300)
+        parser.add_argument('--tokens-per-second', type=float, default=200, help='Fake completion token rate (0 = instant).')
+        parser.add_argument('--seed', type=int, default=None, help='Corpus seed (default: fresh, to avoid cache hits).')
+        parser.add_argument('--baseline', default=str(BASELINE_PATH))
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95/throughput drift before failing.')
+        parser.add_argument('--keep', action='store_true', help='Keep the sessions created by the benchmark.')
+
+    def handle(self, *args, **opts):
+        names = [s.strip() for s in opts['scenarios'].split(',') if s.strip()]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+        seed = opts['seed'] if opts['seed'] is not None else int(time.time())
+        config = {k: opts[k] for k in ('requests', 'concurrency', 'embed_latency_ms', 'chat_latency_ms', 'tokens_per_second')}
+        fake = FakeOpenAIConfig(embed_latency_ms=opts['embed_latency_ms'], chat_latency_ms=opts['chat_latency_ms'],
+                                tokens_per_second=opts['tokens_per_second'])
+        user, _ = User.objects.get_or_create(username=BENCH_USER)
+        self.created = []
+        results = {}
+        try:
+            with FakeOpenAIServer(fake) as server, point_clients_at(server.base_url):
+                for name in names:
+                    fn, requests, concurrency = getattr(self, f'scenario_{name}')(user, seed, opts)
+                    before = server.counters
+                    result = run_scenario(fn, requests, concurrency)
+                    after = server.counters
+                    result['api_calls'] = sum(after.get(k, 0) - before.get(k, 0) for k in ('embeddings', 'chat'))
+                    results[name] = result
+                    self.report(name, result)
+        finally:
+            if not opts['keep']:
+                delete_sessions(Session.objects.filter(id__in=self.created))
+            user.delete()
+
+        path = Path(opts['baseline'])
+        if opts['save_baseline']:
+            save_baseline({'config': config, 'scenarios': results}, path)
+            self.stdout.write(f'Baseline written to {path}')
+            return
+        baseline = load_baseline(path)
+        if not baseline:
+            self.stdout.write(f'No baseline at {path}; run with --save-baseline to create one.')
+            return
+        if baseline.get('config') != config:
+            self.stdout.write(self.style.WARNING(f"Baseline was recorded with {baseline.get('config')}; comparing anyway."))
+        regressions = compare(results, baseline.get('scenarios', {}), opts['tolerance'])
+        if regressions:
+            raise CommandError('Regressions against baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path} (tolerance {opts["tolerance"]:.0%}).'))
+
+    def report(self, name, r):
+        stages = ', '.join(f'{k} {v:.1f}' for k, v in r['stages_p50_ms'].items())
+        self.stdout.write(
+            f"{name:<12} {r['requests']:>4} req x{r['concurrency']:<2} {r['rps']:>9.2f} req/s  "
+            f"p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms  "
+            f"calls {r['api_calls']:>4}  errors {r['errors']}" + (f"\n{'':<12} stages p50 ms: {stages}" if stages else '')
+        )
+        if r['errors']:
+            self.stderr.write(f"{'':<12} e.g. {r['first_error']}")
+
+    def client(self, user) -> APIClient:
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def sessions(self, seed, count):
+        """Ready-to-chat sessions built directly through the pipeline (not timed)."""
+        sessions = []
+        for i in range(count):
+            resume = normalize_whitespace(make_resume(seed * 1000 + i, jobs=6))
+            jd = normalize_whitespace(make_job_description(seed * 1000 + i))
+            session = create_session(resume, jd)
+            store_documents(session, build_chunks(resume, jd))
+            save_match(session, {'match_score': 70.0, 'strengths': ['Backend experience'], 'gaps': ['Cloud'],
+                                 'insights': 'Benchmark session.'})
+            self.created.append(session.id)
+            sessions.append(session)
+        return sessions
+
+    def scenario_upload(self, user, seed, opts):
+        def run(i):
+            files = {
+                'resume': SimpleUploadedFile(f'resume_{i}.txt', make_resume(seed * 1000 + 500 + i).encode()),
+                'job_description': SimpleUploadedFile(f'jd_{i}.txt', make_job_description(seed * 1000 + 500 + i).encode()),
+                'async': '0',
+            }
+            response = self.client(user).post('/api/upload/', files, format='multipart')
+            if response.status_code != 200:
+                raise RuntimeError(f'HTTP {response.status_code}: {response.data}')
+            self.created.append(response.data['session'])
+            t = response.data['timings']
+            return {
+                'prepare': t['prepare_ms'],
+                'match': t['match']['end_ms'] - t['match']['start_ms'],
+                'embed': t['embed']['end_ms'] - t['embed']['start_ms'],
+            }
+        return run, opts['requests'], opts['concurrency']
+
+    def _chat_pairs(self, seed, requests):
+        # A distinct (session, question) per request so the answer cache doesn't serve repeats, and
+        # run-specific wording so question embeddings aren't served from earlier runs.
+        sessions = self.sessions(seed, -(-requests // len(QUESTIONS)))
+        return [(sessions[i % len(sessions)], f'{QUESTIONS[i // len(sessions) % len(QUESTIONS)]} (run {seed})')
+                for i in range(requests)]
+
+    def scenario_chat(self, user, seed, opts):
+        pairs = self._chat_pairs(seed * 7 + 1, opts['requests'])
+
+        def run(i):
+            session, question = pairs[i]
+            response = self.client(user).post(f'/api/session/{session.id}/chat/', {'question': question}, format='json')
+            if response.status_code != 200:
+                raise RuntimeError(f'HTTP {response.status_code}: {response.data}')
+        return run, opts['requests'], opts['concurrency']
+
+    def scenario_chat_stream(self, user, seed, opts):
+        pairs = self._chat_pairs(seed * 7 + 2, opts['requests'])
+
+        def run(i):
+            session, question = pairs[i]
+            start = time.perf_counter()
+            response = self.client(user).post(f'/api/session/{session.id}/chat/stream/', {'question': question}, format='json')
+            stages = {}
+            for part in response.streaming_content:
+                ms = (time.perf_counter() - start) * 1000
+                if b'event: sources' in part:
+                    stages.setdefault('sources', ms)
+                elif b'event: token' in part:
+                    stages.setdefault('first_token', ms)
+                elif b'event: error' in part:
+                    raise RuntimeError(part.decode(errors='replace'))
+            return stages
+        return run, opts['requests'], opts['concurrency']
+
+    def scenario_retrieve(self, user, seed, opts):
+        sessions = self.sessions(seed * 7 + 3, 5)
+        questions = [f'{q} (run {seed})' for q in QUESTIONS]
+        vectors = {q: embed_question(q) for q in questions}
+
+        def run(i):
+            question = questions[i % len(questions)]
+            retrieve(sessions[i % len(sessions)], question, q_vec=vectors[question])
+        return run, opts['requests'] * 10, 1
+
+    def _long_resume(self, seed):
+        return make_resume(seed, jobs=20, bullets=8)
+
+    def scenario_chunk_text(self, user, seed, opts):
+        text = self._long_resume(seed)
+        return lambda i: chunk_text(split_sections(text)) and None, opts['requests'] * 10, 1
+
+    def scenario_iter_chunks(self, user, seed, opts):
+        text = self._long_resume(seed)
+        return lambda i: list(iter_chunks(text)) and None, opts['requests'] * 10, 1
@@ -0,0 +1,70 @@
+import time
+from django.core.management.base import BaseCommand
+from openai import OpenAI
+from screening.benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from screening.benchmarks.suite import run_scenario
+from screening.llm import Gateway, api_coalesced, api_retries
+
+MODEL = 'gpt-4.1-mini'
+EMBED_MODEL = 'text-embedding-3-small'
+
+
+class Command(BaseCommand):
+    help = ('Load-test OpenAI access against a local fake server: a new client per call with SDK retries '
+            '(the previous behaviour) vs the shared gateway with pooling, retries and request coalescing.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Simulated chat turns (embed question + answer).')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--distinct', type=int, default=40,
+                            help='Distinct questions; fewer means more identical requests in flight together.')
+        parser.add_argument('--error-rate', type=float, default=0.05, help='Fraction of upstream requests failed.')
+        parser.add_argument('--error-status', type=int, default=429)
+        parser.add_argument('--embed-latency-ms', type=float, default=60)
+        parser.add_argument('--chat-latency-ms', type=float, default=300)
+        parser.add_argument('--rpm', type=int, default=0, help='Gateway requests/minute budget (0 = unlimited).')
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"{'client':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} "
+                          f"{'upstream':>9} {'conns':>6} {'retries':>8} {'coalesced':>10}")
+        for name in ('legacy', 'gateway'):
+            config = FakeOpenAIConfig(embed_latency_ms=opts['embed_latency_ms'], chat_latency_ms=opts['chat_latency_ms'],
+                                      answer_tokens=20, dim=256, error_rate=opts['error_rate'],
+                                      error_status=opts['error_status'], seed=1)
+            with FakeOpenAIServer(config) as server:
+                turn = self.legacy_turn(server.base_url) if name == 'legacy' else self.gateway_turn(server.base_url, opts['rpm'])
+                retries0 = sum(api_retries.value(a) for a in ('embeddings', 'chat'))
+                coalesced0 = sum(api_coalesced.value(a) for a in ('embeddings', 'chat'))
+                questions = [f'Question {i % opts["distinct"]}: does the candidate know Kubernetes?' for i in range(opts['requests'])]
+                result = run_scenario(lambda i: turn(questions[i]), opts['requests'], opts['concurrency'])
+                counters = server.counters
+            retries = sum(api_retries.value(a) for a in ('embeddings', 'chat')) - retries0
+            coalesced = sum(api_coalesced.value(a) for a in ('embeddings', 'chat')) - coalesced0
+            if name == 'legacy':
+                retries = counters.get('errors', 0) - result['errors']  # SDK retries are not counted client-side
+            self.stdout.write(f"{name:>8} {result['rps']:>7.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+                              f"{result['p99_ms']:>8.1f} {result['errors']:>7} {counters.get('requests', 0):>9} "
+                              f"{counters.get('connections', 0):>6} {retries:>8.0f} {coalesced:>10.0f}")
+            if result['errors']:
+                self.stderr.write(f"  e.g. {result['first_error']}")
+
+    def legacy_turn(self, base_url: str):
+        def turn(question: str):
+            # As before: rag.get_client() built a fresh client (and connection pool) for every call.
+            start = time.perf_counter()
+            with OpenAI(api_key='sk-fake', base_url=base_url) as client:
+                client.embeddings.create(model=EMBED_MODEL, input=[question])
+            with OpenAI(api_key='sk-fake', base_url=base_url) as client:
+                client.chat.completions.create(model=MODEL, messages=[{'role': 'user', 'content': question}], temperature=0.2)
+            return {'turn': (time.perf_counter() - start) * 1000}
+        return turn
+
+    def gateway_turn(self, base_url: str, rpm: int):
+        gateway = Gateway(rpm=rpm, base_url=base_url, api_key='sk-fake')
+
+        def turn(question: str):
+            start = time.perf_counter()
+            gateway.embed([question], EMBED_MODEL)
+            gateway.chat(MODEL, [{'role': 'user', 'content': question}], temperature=0.2)
+            return {'turn': (time.perf_counter() - start) * 1000}
+        return turn
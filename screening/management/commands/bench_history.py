@@ -0,0 +1,103 @@
+import json
+import random
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from screening.benchmarks.corpus import make_job_description, make_resume
+from screening.benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from screening.benchmarks.harness import point_clients_at
+from screening.documents import create_session, delete_sessions
+from screening.models import ChatMessage, Session
+from screening.parsing import normalize_whitespace
+from screening.pipeline import build_chunks
+from screening.rag import SOURCE_PREVIEW_CHARS, source_refs, store_documents
+from screening.views import ChatView
+
+BENCH_USER = 'bench-history'
+
+
+def legacy_retrieved(chunks, rng: random.Random, k: int = 6):
+    """What answer_question used to copy into every assistant message: previews plus all scores."""
+    return [{'chunk_index': c.index, 'doc_type': c.doc_type, 'section': c.section,
+             'text': c.text[:SOURCE_PREVIEW_CHARS], 'score': rng.random() / 30,
+             'dense_score': rng.random(), 'lexical_score': rng.random() * 10}
+            for c in rng.sample(chunks, min(k, len(chunks)))]
+
+
+class Command(BaseCommand):
+    help = ('Stored source bytes and history response size/latency on a synthetic long chat: full previews in every '
+            'message and the whole history per request vs source references and cursor pages.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per variant (median reported).')
+
+    def handle(self, *args, **opts):
+        rng = random.Random(5)
+        user, _ = User.objects.get_or_create(username=BENCH_USER)
+        resume = normalize_whitespace(make_resume(5, jobs=10))
+        jd = normalize_whitespace(make_job_description(5))
+        session = create_session(resume, jd)
+        try:
+            with FakeOpenAIServer(FakeOpenAIConfig(embed_latency_ms=1, dim=256)) as server, point_clients_at(server.base_url):
+                store_documents(session, build_chunks(resume, jd))
+            chunks = list(session.chunks.all())
+            legacy, rows = {}, []
+            for i in range(opts['messages']):
+                if i % 2 == 0:
+                    rows.append(ChatMessage(session=session, role='user', question=f'Question {i} about the candidate?'))
+                    continue
+                retrieved = legacy_retrieved(chunks, rng)
+                rows.append(ChatMessage(session=session, role='assistant', question=f'Question {i - 1} about the candidate?',
+                                        answer=' '.join(['The candidate shows relevant experience for this requirement.'] * 10),
+                                        sources=source_refs(retrieved)))
+                legacy[len(rows) - 1] = retrieved
+            created = ChatMessage.objects.bulk_create(rows)
+            legacy = {created[pos].id: retrieved for pos, retrieved in legacy.items()}
+
+            legacy_bytes = sum(len(json.dumps(r)) for r in legacy.values())
+            ref_bytes = sum(len(json.dumps(m.sources)) for m in created if m.role == 'assistant')
+            self.stdout.write(f"sources stored for {len(legacy)} answers: copied previews {legacy_bytes / 1024:.1f} KiB, "
+                              f"references {ref_bytes / 1024:.1f} KiB ({legacy_bytes / max(ref_bytes, 1):.1f}x smaller)")
+
+            factory = APIRequestFactory()
+            view = ChatView.as_view()
+
+            def legacy_history():
+                messages = session.messages.order_by('created_at')
+                data = [{'id': m.id, 'role': m.role, 'question': m.question, 'answer': m.answer,
+                         'retrieved_chunks': legacy.get(m.id, []), 'created_at': m.created_at} for m in messages]
+                return JSONRenderer().render(data)
+
+            def page(query: str = ''):
+                request = factory.get(f'/api/session/{session.id}/chat/{query}')
+                force_authenticate(request, user=user)
+                response = view(request, session_id=session.id)
+                return response, JSONRenderer().render(response.data)
+
+            def all_pages():
+                total, query = 0, ''
+                while True:
+                    response, body = page(query)
+                    total += len(body)
+                    if not response.data['next']:
+                        return total
+                    query = '?' + response.data['next'].split('?', 1)[1]
+
+            self.stdout.write(f"{'history request':<32} {'bytes':>10} {'p50 ms':>8}")
+            for label, fn in (('whole history, copied sources', lambda: len(legacy_history())),
+                              ('first page', lambda: len(page()[1])),
+                              ('first page, expand=sources', lambda: len(page('?expand=sources')[1])),
+                              ('every page', all_pages)):
+                times = []
+                for _ in range(opts['repeat']):
+                    start = time.perf_counter()
+                    size = fn()
+                    times.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(f'{label:<32} {size:>10} {statistics.median(times):>8.1f}')
+        finally:
+            delete_sessions(Session.objects.filter(id=session.id))
+            user.delete()
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from screening import answer_cache, memory, prompts
+from screening.benchmarks.corpus import make_job_description, make_resume
+from screening.benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from screening.benchmarks.harness import point_clients_at
+from screening.documents import create_session, delete_sessions
+from screening.models import Session
+from screening.parsing import normalize_whitespace
+from screening.pipeline import build_chunks, save_match
+from screening.rag import CHAT_MODEL, answer_question, store_documents
+
+QUESTIONS = [
+    'What are the main gaps for this role?', 'Summarize the candidate in two sentences.',
+    'Does the candidate have cloud experience?', 'Which projects are most relevant?',
+    'How many years of experience does the candidate have?', 'Is the candidate a fit for a senior role?',
+    'What should I ask in the technical interview?', 'How strong is their leadership experience?',
+]
+
+
+class Command(BaseCommand):
+    help = ('Chat prompt tokens per turn over one long conversation against a fake model server: the last '
+            'three exchanges verbatim (CHAT_MEMORY_ENABLED=false) vs the rolling summary plus a short tail.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--turns', type=int, default=40)
+        parser.add_argument('--answer-tokens', type=int, default=250, help='Length of each fake answer.')
+        parser.add_argument('--budget', type=int, default=6000,
+                            help='Chat prompt budget, high enough that packing does not hide the history size.')
+        parser.add_argument('--report-every', type=int, default=5)
+
+    def handle(self, *args, **opts):
+        prompts.PROMPT_TOKEN_BUDGETS[CHAT_MODEL] = opts['budget']
+        saved = memory.CHAT_MEMORY_ENABLED, answer_cache.ANSWER_CACHE_ENABLED, memory.schedule
+        answer_cache.ANSWER_CACHE_ENABLED = False  # every turn must build a prompt
+        memory.schedule = lambda session: None  # updated inline below, so each call is measured on its own
+        config = FakeOpenAIConfig(embed_latency_ms=1, chat_latency_ms=1, answer_tokens=opts['answer_tokens'], dim=256)
+        resume = normalize_whitespace(make_resume(11, jobs=8))
+        jd = normalize_whitespace(make_job_description(11))
+        results = {}
+        try:
+            for mode in ('window', 'memory'):
+                memory.CHAT_MEMORY_ENABLED = mode == 'memory'
+                with FakeOpenAIServer(config) as server, point_clients_at(server.base_url):
+                    session = create_session(resume, jd)
+                    try:
+                        store_documents(session, build_chunks(resume, jd))
+                        save_match(session, {'match_score': 70.0, 'strengths': ['Backend experience'], 'gaps': ['Cloud'],
+                                             'insights': 'Benchmark session.'})
+                        results[mode] = self.converse(server, session, opts['turns'])
+                    finally:
+                        delete_sessions(Session.objects.filter(id=session.id))
+        finally:
+            memory.CHAT_MEMORY_ENABLED, answer_cache.ANSWER_CACHE_ENABLED, memory.schedule = saved
+            prompts.PROMPT_TOKEN_BUDGETS.pop(CHAT_MODEL, None)
+
+        self.stdout.write(f"{'turn':>5} {'window':>8} {'memory':>8}   (prompt tokens of the answer call)")
+        for turn in range(opts['turns']):
+            if turn == 0 or (turn + 1) % opts['report_every'] == 0:
+                self.stdout.write(f"{turn + 1:>5} {results['window']['turns'][turn]:>8} {results['memory']['turns'][turn]:>8}")
+        for mode, r in results.items():
+            turns = r['turns']
+            self.stdout.write(f"{mode}: answer prompts {sum(turns)} tokens (max {max(turns)}), "
+                              f"summary calls {r['summary_calls']} using {r['summary_tokens']} prompt tokens, "
+                              f"total {sum(turns) + r['summary_tokens']}")
+
+    def converse(self, server, session: Session, turns: int) -> dict:
+        per_turn, summary_calls, summary_tokens = [], 0, 0
+        for i in range(turns):
+            before = server.counters
+            answer_question(session, f'{QUESTIONS[i % len(QUESTIONS)]} (turn {i + 1})')
+            after = server.counters
+            per_turn.append(after.get('prompt_tokens', 0) - before.get('prompt_tokens', 0))
+            if memory.CHAT_MEMORY_ENABLED and memory.update(session.id):
+                summary_calls += 1
+                summary_tokens += server.counters.get('prompt_tokens', 0) - after.get('prompt_tokens', 0)
+        return {'turns': per_turn, 'summary_calls': summary_calls, 'summary_tokens': summary_tokens}
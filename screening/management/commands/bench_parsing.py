@@ -0,0 +1,72 @@
+import re
+import time
+from django.core.management.base import BaseCommand
+from screening.benchmarks.corpus import make_resume
+from screening.parsing import SECTION_HEADINGS, split_sections, extract_skills
+
+LEGACY_SKILL_PATTERN = re.compile(r"(?i)\b([A-Za-z][A-Za-z0-9+.#-]{1,})\b")
+LEGACY_STOP_WORDS = set(['and', 'or', 'the', 'in', 'on', 'at', 'for', 'with', 'to', 'of', 'a', 'an'])
+
+
+def legacy_split_sections(text):
+    """One regex scan per heading over the lowercased text."""
+    lowered = text.lower()
+    positions = []
+    for heading in SECTION_HEADINGS:
+        for match in re.finditer(rf"(?i)\b{re.escape(heading)}\b", lowered):
+            positions.append((match.start(), heading))
+    positions.sort()
+    sections = []
+    for i, (pos, heading) in enumerate(positions):
+        end = positions[i + 1][0] if i + 1 < len(positions) else len(text)
+        sections.append((heading, text[pos:end].strip()))
+    return sections or [('full', text)]
+
+
+def legacy_extract_skills(text):
+    """Every word is a "skill", de-duplicated against a list."""
+    uniq = []
+    for c in LEGACY_SKILL_PATTERN.findall(text):
+        token = c.strip('.').lower()
+        if token in LEGACY_STOP_WORDS or len(token) < 2 or token.isdigit():
+            continue
+        if token not in uniq:
+            uniq.append(token)
+    return uniq[:300]
+
+
+def best_of(fn, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = 'Compare the per-heading splitter and word-list skill extraction with the single-pass parsers on large resumes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', default='3,30,300')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **opts):
+        extract_skills('warm up the matcher')
+        self.stdout.write(
+            f"{'resume':>11} {'KB':>6} {'split legacy':>13} {'split new':>10} "
+            f"{'skills legacy':>14} {'skills new':>11} {'found legacy/new':>17}"
+        )
+        for jobs in (int(j) for j in opts['jobs'].split(',')):
+            text = make_resume(jobs, jobs=jobs, bullets=8)
+            # Ticket references give the legacy list de-duplication a realistic number of distinct words.
+            with_ids = '\n'.join(f"{line} (ticket ENG-{i})" for i, line in enumerate(text.split('\n')))
+            for label, doc in ((f'{jobs} jobs', text), (f'{jobs} +ids', with_ids)):
+                split_old, _ = best_of(legacy_split_sections, doc, opts['repeat'])
+                split_new, _ = best_of(split_sections, doc, opts['repeat'])
+                skills_old, old_found = best_of(legacy_extract_skills, doc, opts['repeat'])
+                skills_new, found = best_of(extract_skills, doc, opts['repeat'])
+                self.stdout.write(
+                    f"{label:>11} {len(doc) // 1024:>6} {split_old * 1000:>11.2f}ms {split_new * 1000:>8.2f}ms "
+                    f"{skills_old * 1000:>12.2f}ms {skills_new * 1000:>9.2f}ms {len(old_found):>8}/{len(found)}"
+                )
@@ -0,0 +1,40 @@
+import time
+from io import BytesIO
+from pdfminer.high_level import extract_text
+from django.core.management.base import BaseCommand
+from screening.benchmarks.corpus import make_pdf
+from screening.parsing import extract_pdf, PDF_WORKERS
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Compare whole-document pdfminer extraction with the page-streaming and process-pool extractors.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', default='5,20,60')
+        parser.add_argument('--workers', type=int, default=PDF_WORKERS)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **opts):
+        workers, repeat = opts['workers'], opts['repeat']
+        extract_pdf(make_pdf(16), max_pages=0, workers=workers)  # start the forkserver outside the timings
+        self.stdout.write(f"{'pages':>6} {'KB':>7} {'extract_text':>13} {'streaming':>10} {'pool x' + str(workers):>10} {'speedup':>8}")
+        for pages in (int(p) for p in opts['pages'].split(',')):
+            data = make_pdf(pages, seed=pages)
+            legacy = best_of(lambda: extract_text(BytesIO(data)), repeat)
+            serial = best_of(lambda: extract_pdf(data, max_pages=0, time_budget=600, workers=1), repeat)
+            pooled = best_of(lambda: extract_pdf(data, max_pages=0, time_budget=600, workers=workers), repeat)
+            self.stdout.write(
+                f"{pages:>6} {len(data) // 1024:>7} {legacy * 1000:>11.0f}ms {serial * 1000:>8.0f}ms "
+                f"{pooled * 1000:>8.0f}ms {legacy / pooled:>7.1f}x"
+            )
+        capped = extract_pdf(make_pdf(60), workers=workers)
+        self.stdout.write(f"Default limits on a 60-page PDF: {capped.pages}/{capped.total_pages} pages, reason: {capped.reason or 'none'}")
@@ -0,0 +1,93 @@
+import json
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from screening import prompts
+from screening.benchmarks.corpus import make_job_description, make_resume
+from screening.benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from screening.benchmarks.harness import point_clients_at
+from screening.matching import CHAT_MODEL as MATCH_MODEL, MATCH_PROMPT_TEMPLATE, build_match_prompt
+from screening.documents import create_session, delete_sessions
+from screening.models import ChatMessage, Session
+from screening.parsing import normalize_whitespace
+from screening.pipeline import build_chunks
+from screening.rag import CHAT_MODEL, build_chat_messages, get_client, retrieve, store_documents
+from screening.tokens import count_tokens
+
+QUESTIONS = [
+    'What are the main gaps for this role?', 'Summarize the candidate in two sentences.',
+    'Does the candidate have cloud experience?', 'Which projects are most relevant?',
+    'How many years of experience does the candidate have?', 'Is the candidate a fit for a senior role?',
+]
+
+
+def legacy_chat_messages(session, question, retrieved):
+    """Character-capped prompt: six history turns and every chunk, never counted."""
+    history = [{'role': 'user', 'content': m.question} if m.role == 'user' else {'role': 'assistant', 'content': m.answer}
+               for m in reversed(list(session.messages.order_by('-created_at')[:6]))]
+    blocks = '\n\n'.join(f"[Chunk {i+1} | score={r['score']:.3f}]\n{r['text'][:400][:1500]}" for i, r in enumerate(retrieved))
+    system = (
+        "You are an expert recruiter assistant.\n\nMATCH ANALYSIS (precomputed):\n"
+        f"Match Score: {session.match_score}\nStrengths: {session.strengths}\nGaps: {session.gaps}\nInsights: {session.insights}\n\n"
+        f"RELEVANT CONTEXT:\n{blocks}\n\nInstructions:\n- Keep answers concise but useful (3-6 sentences)\n"
+    )
+    return [{'role': 'system', 'content': system}] + history + [{'role': 'user', 'content': question}]
+
+
+def legacy_match_prompt(jd_text, resume_text):
+    return MATCH_PROMPT_TEMPLATE.format(jd_text=jd_text[:3000], resume_text=resume_text[:4000])
+
+
+class Command(BaseCommand):
+    help = 'Prompt tokens and p50/p95 latency of character-capped vs token-budgeted prompts against a fake model server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=30)
+        parser.add_argument('--budget', type=int, default=None, help='Override the chat and match prompt budgets.')
+        parser.add_argument('--jobs', type=int, default=30, help='Jobs in the synthetic resume (controls its length).')
+        parser.add_argument('--history', type=int, default=20, help='Chat messages already in the session.')
+        parser.add_argument('--chat-latency-ms', type=float, default=150)
+        parser.add_argument('--prefill-ms-per-1k', type=float, default=120, help='Fake server time per 1k prompt tokens.')
+
+    def handle(self, *args, **opts):
+        if opts['budget']:
+            prompts.PROMPT_TOKEN_BUDGETS[CHAT_MODEL] = prompts.PROMPT_TOKEN_BUDGETS[MATCH_MODEL] = opts['budget']
+        config = FakeOpenAIConfig(embed_latency_ms=5, chat_latency_ms=opts['chat_latency_ms'],
+                                  prefill_ms_per_1k_tokens=opts['prefill_ms_per_1k'], dim=256)
+        resume = normalize_whitespace(make_resume(7, jobs=opts['jobs'], bullets=8))
+        jd = normalize_whitespace(make_job_description(7))
+        with FakeOpenAIServer(config) as server, point_clients_at(server.base_url):
+            session = create_session(
+                resume, jd, match_score=72.0,
+                strengths=['Strong backend experience with the requested stack.'] * 5,
+                gaps=['No evidence of on-call ownership.'] * 3,
+                insights=' '.join(['The candidate is a solid fit with some gaps in cloud operations.'] * 12),
+            )
+            try:
+                store_documents(session, build_chunks(resume, jd))
+                for i in range(opts['history']):
+                    ChatMessage.objects.create(session=session, role='user' if i % 2 == 0 else 'assistant',
+                                               question=QUESTIONS[i % len(QUESTIONS)],
+                                               answer='' if i % 2 == 0 else ' '.join(['The candidate has relevant experience here.'] * 12))
+                client = get_client()
+                rows = []
+                for label, build in (('chat legacy', lambda q, r: legacy_chat_messages(session, q, r)),
+                                     ('chat budgeted', lambda q, r: build_chat_messages(session, q, r)),
+                                     ('match legacy', lambda q, r: [{'role': 'user', 'content': legacy_match_prompt(jd, resume)}]),
+                                     ('match budgeted', lambda q, r: [{'role': 'user', 'content': build_match_prompt(jd, resume)}])):
+                    tokens, latencies = [], []
+                    for n in range(opts['requests']):
+                        question = QUESTIONS[n % len(QUESTIONS)]
+                        messages = build(question, retrieve(session, question))
+                        tokens.append(count_tokens(json.dumps(messages), CHAT_MODEL))
+                        start = time.perf_counter()
+                        client.chat.completions.create(model=CHAT_MODEL, messages=messages, temperature=0.2)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                    rows.append((label, np.mean(tokens), np.max(tokens), *np.percentile(latencies, [50, 95])))
+            finally:
+                delete_sessions(Session.objects.filter(id=session.id))
+        self.stdout.write(f"Resume {count_tokens(resume, CHAT_MODEL)} tokens; budgets: chat {prompts.prompt_budget(CHAT_MODEL, 'chat')}, "
+                          f"match {prompts.prompt_budget(MATCH_MODEL, 'match')}")
+        self.stdout.write(f"{'prompt':<16} {'mean tokens':>12} {'max tokens':>11} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, mean_t, max_t, p50, p95 in rows:
+            self.stdout.write(f"{label:<16} {mean_t:>12.0f} {max_t:>11.0f} {p50:>8.0f} {p95:>8.0f}")
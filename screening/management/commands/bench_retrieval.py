@@ -0,0 +1,65 @@
+import json
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from screening.rag import cosine_similarity, pack_embedding, unpack_embeddings, select_top
+
+
+def legacy_retrieve(rows, q_emb, top_k, per_doc_k):
+    """The pre-binary path: JSON decode every row and score it in a Python loop."""
+    q_vec = np.array(q_emb)
+    scored_by_doc = {}
+    for doc_type, raw in rows:
+        c_vec = np.array(json.loads(raw))
+        scored_by_doc.setdefault(doc_type, []).append((cosine_similarity(q_vec, c_vec), doc_type))
+    for doc_type in scored_by_doc:
+        scored_by_doc[doc_type].sort(key=lambda x: x[0], reverse=True)
+    picked, leftovers = [], []
+    for scored in scored_by_doc.values():
+        picked.extend(scored[:per_doc_k])
+        leftovers.extend(scored[per_doc_k:])
+    picked.sort(key=lambda x: x[0], reverse=True)
+    if len(picked) < top_k and leftovers:
+        leftovers.sort(key=lambda x: x[0], reverse=True)
+        picked.extend(leftovers[: max(0, top_k - len(picked))])
+    return picked[:top_k]
+
+
+def vectorized_retrieve(blobs, doc_types, q_emb, top_k, per_doc_k):
+    q_vec = np.frombuffer(pack_embedding(q_emb), dtype='<f4')
+    matrix = unpack_embeddings(blobs)
+    return select_top(matrix @ q_vec, doc_types, top_k, per_doc_k)
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON/loop retrieval against packed float32 matrix retrieval on synthetic chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000')
+        parser.add_argument('--dim', type=int, default=1536)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(0)
+        dim = opts['dim']
+        repeat = opts['repeat']
+        self.stdout.write(f"{'chunks':>8} {'legacy ms':>12} {'binary ms':>12} {'speedup':>9}")
+        for n in [int(s) for s in opts['sizes'].split(',') if s.strip()]:
+            vectors = rng.standard_normal((n, dim)).astype(np.float32)
+            kinds = ['resume' if i % 3 else 'job_description' for i in range(n)]
+            json_rows = [(k, json.dumps(v.tolist())) for k, v in zip(kinds, vectors)]
+            blobs = [pack_embedding(v) for v in vectors]
+            doc_types = np.array(kinds, dtype=object)
+            q_emb = rng.standard_normal(dim).tolist()
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                legacy_retrieve(json_rows, q_emb, 6, 3)
+            legacy_ms = (time.perf_counter() - start) * 1000 / repeat
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                vectorized_retrieve(blobs, doc_types, q_emb, 6, 3)
+            binary_ms = (time.perf_counter() - start) * 1000 / repeat
+
+            self.stdout.write(f"{n:>8} {legacy_ms:>12.3f} {binary_ms:>12.3f} {legacy_ms / max(binary_ms, 1e-9):>8.1f}x")
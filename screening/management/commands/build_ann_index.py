@@ -0,0 +1,45 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from screening.ann import ann_index
+from screening.models import ResumeChunk
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cross-session ANN index from every stored resume chunk, then train it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--nlist', type=int, default=None, help='Number of IVF lists (default: ~4*sqrt(rows)).')
+
+    def handle(self, *args, **opts):
+        ann_index.reset()
+        latest = ResumeChunk.objects.filter(doc_type='resume').order_by('-id').values_list('embedding', flat=True).first()
+        if latest is None:
+            self.stdout.write('No resume chunks to index.')
+            return
+        # Rows embedded with another model (dimension) than the latest one can't share the index.
+        self.dim = len(latest) // 4
+        qs = ResumeChunk.objects.filter(doc_type='resume').order_by('id').values_list('id', 'document_id', 'embedding')
+        batch, total, self.skipped = [], 0, 0
+        for row in qs.iterator(chunk_size=opts['batch_size']):
+            batch.append(row)
+            if len(batch) >= opts['batch_size']:
+                total += self._flush(batch)
+                batch = []
+        if batch:
+            total += self._flush(batch)
+        if total:
+            ann_index.train(opts['nlist'])
+        if self.skipped:
+            self.stderr.write(f"Skipped {self.skipped} chunks whose embedding size differs from the index ({ann_index.dim}-d).")
+        self.stdout.write(f"Indexed {total} resume chunks: {ann_index.stats()}")
+
+    def _flush(self, batch):
+        dim = self.dim
+        rows = [r for r in batch if len(r[2]) == 4 * dim]
+        self.skipped += len(batch) - len(rows)
+        if not rows:
+            return 0
+        vectors = np.frombuffer(b''.join(bytes(r[2]) for r in rows), dtype='<f4').reshape(len(rows), dim)
+        ann_index.add([r[1] for r in rows], [r[0] for r in rows], vectors, auto_train=False)
+        return len(rows)
@@ -0,0 +1,51 @@
+import statistics
+from django.core.management.base import BaseCommand
+from screening.benchmarks.corpus import make_job_description, make_resume
+from screening.models import Document
+from screening.parsing import (
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_TOKEN_MODEL, chunk_text, iter_chunks, normalize_whitespace, split_sections,
+)
+from screening.tokens import count_tokens
+
+
+def summarize(texts, chunk_lists, embed_dim):
+    sizes = [count_tokens(c, CHUNK_TOKEN_MODEL) for chunks in chunk_lists for c in chunks]
+    if not sizes:
+        return {}
+    # Share of each document's words that made it into at least one chunk.
+    covered = [len(set(' '.join(chunks).split()) & set(t.split())) / max(1, len(set(t.split())))
+               for t, chunks in zip(texts, chunk_lists)]
+    return {
+        'words covered': f"{100 * statistics.mean(covered):.1f}%",
+        'chunks/doc': round(len(sizes) / len(chunk_lists), 2),
+        'tokens/doc': round(sum(sizes) / len(chunk_lists), 1),
+        'mean tokens/chunk': round(statistics.mean(sizes), 1),
+        'chunks < 100 tokens': f"{100 * sum(s < 100 for s in sizes) / len(sizes):.0f}%",
+        'matrix KB/doc': round(len(sizes) / len(chunk_lists) * embed_dim * 4 / 1024, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare chunk counts and embedding tokens of the character chunker and the token-aware chunker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docs', type=int, default=200, help='Synthetic resumes to chunk.')
+        parser.add_argument('--from-db', action='store_true', help='Use the stored resume and JD documents instead.')
+        parser.add_argument('--dim', type=int, default=1536)
+
+    def handle(self, *args, **opts):
+        if opts['from_db']:
+            texts = [t for t in Document.objects.values_list('text', flat=True) if t]
+        else:
+            texts = [make_resume(i, jobs=2 + i % 6, bullets=3 + i % 5) for i in range(opts['docs'])]
+            texts += [make_job_description(i) for i in range(max(1, opts['docs'] // 10))]
+        texts = [normalize_whitespace(t) for t in texts]
+        self.stdout.write(f"{len(texts)} documents; token model {CHUNK_TOKEN_MODEL}, "
+                          f"max {CHUNK_MAX_TOKENS} tokens, overlap {CHUNK_OVERLAP_TOKENS}")
+
+        legacy = summarize(texts, [chunk_text(split_sections(t)) for t in texts], opts['dim'])
+        token_aware = summarize(texts, [[c.text for c in iter_chunks(t)] for t in texts], opts['dim'])
+        no_overlap = summarize(texts, [[c.text for c in iter_chunks(t, overlap_tokens=0)] for t in texts], opts['dim'])
+        self.stdout.write(f"{'':<22} {'chars (1200)':>13} {'tokens':>10} {'no overlap':>11}")
+        for key in legacy:
+            self.stdout.write(f"{key:<22} {legacy[key]!s:>13} {token_aware[key]!s:>10} {no_overlap[key]!s:>11}")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from screening.match_cache import invalidate
+from screening.matching import prompt_version
+
+
+class Command(BaseCommand):
+    help = 'Invalidate memoized compute_match results (by default only those from older prompt versions).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also drop results for the current prompt version.')
+
+    def handle(self, *args, **opts):
+        current = prompt_version()
+        deleted = invalidate(stale_only=not opts['all'], current_version=current)
+        self.stdout.write(f"Deleted {deleted} cached match result(s); current prompt version is {current}.")
@@ -0,0 +1,31 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from screening.models import Document, ResumeChunk
+from screening.segments import segment_store
+
+
+class Command(BaseCommand):
+    help = 'Compact the memory-mapped embedding segment store (drops deleted/superseded documents).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help='First copy documents that are only in the database.')
+
+    def handle(self, *args, **opts):
+        if opts['backfill']:
+            added = 0
+            document_ids = ResumeChunk.objects.values_list('document_id', flat=True).distinct()
+            for document_id in document_ids.iterator():
+                if document_id in segment_store:
+                    continue
+                rows = list(ResumeChunk.objects.filter(document_id=document_id).order_by('doc_type', 'index').values_list('id', 'embedding'))
+                vectors = np.frombuffer(b''.join(bytes(r[1]) for r in rows), dtype='<f4').reshape(len(rows), -1)
+                segment_store.append(document_id, [r[0] for r in rows], vectors)
+                added += 1
+            self.stdout.write(f"Backfilled {added} document(s).")
+        live = {str(pk) for pk in Document.objects.values_list('id', flat=True).iterator()}
+        result = segment_store.compact(keep=live)
+        before, after = result['before'], result['after']
+        self.stdout.write(
+            f"Documents {before['documents']} -> {after['documents']}, "
+            f"bytes {before['total_bytes']} -> {after['total_bytes']} (generation {after['generation']})."
+        )
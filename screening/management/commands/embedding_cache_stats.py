@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from screening.embedding_cache import EMBED_CACHE_MAX_ENTRIES, evict
+from screening.models import EmbeddingCacheEntry, EmbeddingCacheStat
+
+
+class Command(BaseCommand):
+    help = 'Report embedding cache hit ratio and tokens saved per model.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evict', action='store_true', help='Apply the EMBED_CACHE_MAX_ENTRIES cap now.')
+
+    def handle(self, *args, **opts):
+        entries = dict(EmbeddingCacheEntry.objects.values('model').annotate(n=Count('id')).values_list('model', 'n'))
+        stats = {s.model: s for s in EmbeddingCacheStat.objects.all()}
+        models = sorted(set(entries) | set(stats))
+        if not models:
+            self.stdout.write('Embedding cache is empty.')
+            return
+        self.stdout.write(f"{'model':<28} {'entries':>8} {'hits':>8} {'misses':>8} {'hit ratio':>9} {'tokens saved':>13} {'tokens embedded':>16}")
+        for model in models:
+            s = stats.get(model)
+            hits, misses = (s.hits, s.misses) if s else (0, 0)
+            ratio = hits / (hits + misses) if hits + misses else 0.0
+            self.stdout.write(
+                f"{model:<28} {entries.get(model, 0):>8} {hits:>8} {misses:>8} {ratio:>9.1%} "
+                f"{(s.tokens_saved if s else 0):>13} {(s.tokens_embedded if s else 0):>16}"
+            )
+            if opts['evict']:
+                removed = evict(model)
+                if removed:
+                    self.stdout.write(f"  evicted {removed} entries (cap {EMBED_CACHE_MAX_ENTRIES})")
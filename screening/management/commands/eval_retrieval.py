@@ -0,0 +1,99 @@
+import hashlib
+import re
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from screening.benchmarks.corpus import SKILLS, make_job_description, make_resume
+from screening.documents import create_session, delete_sessions
+from screening.models import Session
+from screening.parsing import iter_chunks
+from screening.rag import RETRIEVAL_MODES, embed_packed, embed_question, pack_embedding, retrieve, store_documents
+
+
+def bag_of_words_embedding(text: str, dim: int) -> np.ndarray:
+    """Offline stand-in for a dense model: hashed word vectors summed, so similar wording scores high
+    but a single rare term in a long chunk barely moves the vector."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for word in re.findall(r'\w+', text.lower()):
+        seed = int.from_bytes(hashlib.sha256(word.encode('utf-8')).digest()[:8], 'little')
+        vec += np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec
+
+
+def build_questions(chunks, rng):
+    """One question per skill mentioned in the resume; the relevant chunks are those naming it."""
+    questions = []
+    for skill in rng.permutation(SKILLS):
+        pattern = re.compile(r'(?<!\w)' + re.escape(skill) + r'(?!\w)')
+        relevant = {i for i, c in enumerate(chunks) if pattern.search(c.text)}
+        if relevant and len(relevant) < len(chunks):
+            questions.append((f'Does the candidate have hands-on experience with {skill}?', relevant))
+    return questions
+
+
+class Command(BaseCommand):
+    help = 'Hit rate, MRR and latency of dense vs hybrid (dense + BM25) retrieval on generated resumes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=20)
+        parser.add_argument('--questions', type=int, default=5, help='Questions per session.')
+        parser.add_argument('--jobs', type=int, default=8, help='Jobs per generated resume (longer resumes, more chunks).')
+        parser.add_argument('--max-tokens', type=int, default=128, help='Chunk size for the evaluation sessions.')
+        parser.add_argument('--top-k', type=int, default=6)
+        parser.add_argument('--per-doc-k', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed retrievals per question and mode.')
+        parser.add_argument('--dim', type=int, default=1536)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--live', action='store_true',
+                            help='Embed with the configured OpenAI model instead of offline bag-of-words vectors.')
+        parser.add_argument('--keep', action='store_true', help='Keep the sessions created by the evaluation.')
+
+    def embed(self, texts, opts):
+        if opts['live']:
+            return embed_packed(texts)
+        return [pack_embedding(bag_of_words_embedding(t, opts['dim'])) for t in texts]
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(opts['seed'])
+        cases, sessions = [], []
+        for s in range(opts['sessions']):
+            seed = opts['seed'] * 100000 + s
+            resume = list(iter_chunks(make_resume(seed, jobs=opts['jobs']), max_tokens=opts['max_tokens']))
+            jd = list(iter_chunks(make_job_description(seed), max_tokens=opts['max_tokens']))
+            session = create_session('\n'.join(c.text for c in resume), '\n'.join(c.text for c in jd))
+            sessions.append(session)
+            store_documents(session, {'resume': resume, 'job_description': jd}, embedded={
+                'resume': self.embed([c.text for c in resume], opts),
+                'job_description': self.embed([c.text for c in jd], opts),
+            })
+            for question, relevant in build_questions(resume, rng)[:opts['questions']]:
+                if opts['live']:
+                    q_vec = embed_question(question)
+                else:
+                    q_vec = np.frombuffer(self.embed([question], opts)[0], dtype='<f4')
+                cases.append((session, question, q_vec, relevant))
+        chunks = sum(s.chunks.filter(doc_type='resume').count() for s in sessions) / max(1, len(sessions))
+        self.stdout.write(f"{len(cases)} questions over {len(sessions)} sessions ({chunks:.1f} resume chunks each, "
+                          f"{'live' if opts['live'] else 'bag-of-words'} embeddings)")
+
+        self.stdout.write(f"{'mode':>8} {'hit@1':>7} {'hit@3':>7} {'mrr':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        try:
+            for mode in RETRIEVAL_MODES:
+                ranks, timings = [], []
+                for session, question, q_vec, relevant in cases:
+                    results = retrieve(session, question, top_k=opts['top_k'], per_doc_k=opts['per_doc_k'], q_vec=q_vec, mode=mode)
+                    resume_hits = [r['chunk_index'] for r in results if r['doc_type'] == 'resume']
+                    ranks.append(next((pos for pos, i in enumerate(resume_hits, 1) if i in relevant), None))
+                    for _ in range(opts['repeat']):
+                        start = time.perf_counter()
+                        retrieve(session, question, top_k=opts['top_k'], per_doc_k=opts['per_doc_k'], q_vec=q_vec, mode=mode)
+                        timings.append((time.perf_counter() - start) * 1000)
+                n = max(1, len(ranks))
+                hit1 = sum(1 for r in ranks if r == 1) / n
+                hit3 = sum(1 for r in ranks if r is not None and r <= 3) / n
+                mrr = sum(1 / r for r in ranks if r is not None) / n
+                p50, p95 = np.percentile(timings, [50, 95]) if timings else (0.0, 0.0)
+                self.stdout.write(f"{mode:>8} {hit1:>7.3f} {hit3:>7.3f} {mrr:>7.3f} {p50:>8.3f} {p95:>8.3f}")
+        finally:
+            if not opts['keep']:
+                delete_sessions(Session.objects.filter(id__in=[s.id for s in sessions]))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from screening.documents import prune_documents
+
+
+class Command(BaseCommand):
+    help = 'Delete stored resumes/job descriptions (and their chunks) that no session references any more.'
+
+    def handle(self, *args, **opts):
+        deleted = prune_documents()
+        self.stdout.write(f"Deleted {deleted} unused document(s).")
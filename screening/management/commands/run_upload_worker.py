@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from screening.jobs import JOB_POLL_INTERVAL, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Process queued uploads (parse -> chunk -> embed -> match) from the database queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run at most one job and exit.')
+        parser.add_argument('--drain', action='store_true', help='Exit once no jobs are queued.')
+        parser.add_argument('--poll-interval', type=float, default=JOB_POLL_INTERVAL)
+
+    def handle(self, *args, **opts):
+        processed = run_worker(once=opts['once'], poll_interval=opts['poll_interval'], stop_when_idle=opts['drain'])
+        self.stdout.write(f"Processed {processed} job(s).")
@@ -0,0 +1,33 @@
+import hashlib
+from typing import Dict, Optional
+from django.db.models import F
+from .models import MatchCacheEntry
+
+
+def document_hash(text: str) -> str:
+    return hashlib.sha256(' '.join((text or '').split()).encode('utf-8')).hexdigest()
+
+
+def get_cached_match(resume_text: str, jd_text: str, model: str, prompt_version: str) -> Optional[Dict]:
+    key = dict(resume_hash=document_hash(resume_text), jd_hash=document_hash(jd_text), model=model, prompt_version=prompt_version)
+    entry = MatchCacheEntry.objects.filter(**key).only('id', 'result').first()
+    if entry is None:
+        return None
+    MatchCacheEntry.objects.filter(id=entry.id).update(hits=F('hits') + 1)
+    return entry.result
+
+
+def store_match(resume_text: str, jd_text: str, model: str, prompt_version: str, result: Dict):
+    MatchCacheEntry.objects.update_or_create(
+        resume_hash=document_hash(resume_text), jd_hash=document_hash(jd_text), model=model, prompt_version=prompt_version,
+        defaults={'result': result},
+    )
+
+
+def invalidate(stale_only: bool = True, current_version: str = '') -> int:
+    """Delete cached results; with stale_only, only those from other prompt versions."""
+    qs = MatchCacheEntry.objects.all()
+    if stale_only:
+        qs = qs.exclude(prompt_version=current_version)
+    deleted, _ = qs.delete()
+    return deleted
@@ -1,21 +1,30 @@
 from typing import List, Dict
+import hashlib
+import json
+import logging
 import os
-from openai import OpenAI
+from asgiref.sync import sync_to_async
+from .match_cache import get_cached_match, store_match
+from .lexical import fast_match
+from .prompts import PromptPacker, prompt_budget
+from .tokens import count_tokens
+from .tracing import traced
+from .llm import gateway
+
+logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
 CHAT_MODEL = os.environ.get('OPENAI_CHAT_MODEL', 'gpt-4o-mini')
+# Bump when the scoring instructions change in a way the template hash wouldn't capture
+# (e.g. different post-processing of the model output, or how documents are cut to fit).
+MATCH_PROMPT_VERSION = '2'
 
-def compute_match(resume_skills: List[str], jd_text: str, resume_text: str = '') -> Dict:
-    """
-    Use LLM to generate comprehensive match analysis with detailed insights.
-    """
-    prompt = f"""You are an expert recruiter analyzing a candidate's resume against a job description.
+MATCH_PROMPT_TEMPLATE = """You are an expert recruiter analyzing a candidate's resume against a job description.
 
 JOB DESCRIPTION:
-{jd_text[:3000]}
+{jd_text}
 
 RESUME:
-{resume_text[:4000]}
+{resume_text}
 
 Analyze the candidate and provide:
 1. A match score (0-100) based on how well the candidate fits the job requirements
@@ -44,44 +53,87 @@ Respond ONLY with valid JSON in this exact format:
   "insights": "The candidate presents a compelling profile with strong technical foundations... [detailed paragraph]"
 }}"""
 
+def prompt_version() -> str:
+    """Changes whenever MATCH_PROMPT_TEMPLATE, MATCH_PROMPT_VERSION or the model's prompt budget changes."""
+    digest = hashlib.sha256(MATCH_PROMPT_TEMPLATE.encode('utf-8')).hexdigest()[:12]
+    return f"{MATCH_PROMPT_VERSION}:{digest}:{prompt_budget(CHAT_MODEL, 'match')}"
+
+def build_match_prompt(jd_text: str, resume_text: str, model: str = CHAT_MODEL) -> str:
+    """Fill the model's prompt budget: the JD gets whatever the resume doesn't need, but at least 40%."""
+    packer = PromptPacker(model, 'match')
+    packer.require(MATCH_PROMPT_TEMPLATE.format(jd_text='', resume_text=''), message=True)
+    room = packer.remaining
+    jd_share = max(int(room * 0.4), room - count_tokens(resume_text, model))
+    jd = packer.add(jd_text, truncate=True, min_tokens=0, max_tokens=jd_share) or ''
+    resume = packer.add(resume_text, truncate=True, min_tokens=0) or ''
+    packer.log('Match', jd=f'{len(jd)}/{len(jd_text)} chars', resume=f'{len(resume)}/{len(resume_text)} chars')
+    return MATCH_PROMPT_TEMPLATE.format(jd_text=jd, resume_text=resume)
+
+MATCH_REQUEST = {'response_format': {'type': 'json_object'}, 'temperature': 0.7, 'max_tokens': 1500}
+
+def _llm_match(jd_text: str, resume_text: str) -> Dict:
+    messages = [{'role': 'user', 'content': build_match_prompt(jd_text, resume_text)}]
+    return _parse_match(gateway.chat(CHAT_MODEL, messages, **MATCH_REQUEST))
+
+async def _allm_match(jd_text: str, resume_text: str) -> Dict:
+    messages = [{'role': 'user', 'content': build_match_prompt(jd_text, resume_text)}]
+    return _parse_match(await gateway.achat(CHAT_MODEL, messages, **MATCH_REQUEST))
+
+def _parse_match(response) -> Dict:
+    content = response.choices[0].message.content
+    if not content:
+        raise ValueError('Empty response from OpenAI')
+
+    result = json.loads(content)
+
+    # Ensure proper structure
+    return {
+        'match_score': result.get('matchScore', 50),
+        'strengths': result.get('strengths', ['Unable to analyze strengths']),
+        'gaps': result.get('gaps', ['Unable to analyze gaps']),
+        'insights': result.get('insights', 'Analysis unavailable')
+    }
+
+@traced('compute_match')
+def compute_match(resume_skills: List[str], jd_text: str, resume_text: str = '', force: bool = False,
+                  fallback: bool = True) -> Dict:
+    """
+    Use LLM to generate comprehensive match analysis with detailed insights.
+
+    Results are memoized on (resume hash, JD hash, CHAT_MODEL, prompt version); pass
+    force=True to re-run the analysis and overwrite the stored result. If the LLM call
+    fails the local lexical score is returned instead, unless fallback=False, in which
+    case the error propagates (the upload job queue retries it with backoff).
+    """
+    if not force:
+        cached = get_cached_match(resume_text, jd_text, CHAT_MODEL, prompt_version())
+        if cached is not None:
+            return cached
+    try:
+        result = _llm_match(jd_text, resume_text)
+    except Exception as e:
+        if not fallback:
+            raise
+        logger.warning('LLM match analysis failed, using the lexical score: %s', e)
+        # Fallback to the local lexical score (never cached, so the next upload retries the LLM)
+        return fast_match(resume_text or ' '.join(resume_skills), jd_text)
+    store_match(resume_text, jd_text, CHAT_MODEL, prompt_version(), result)
+    return result
+
+@traced('compute_match')
+async def acompute_match(resume_skills: List[str], jd_text: str, resume_text: str = '', force: bool = False,
+                         fallback: bool = True) -> Dict:
+    """compute_match for the async views; the memo lookups run in a worker thread."""
+    if not force:
+        cached = await sync_to_async(get_cached_match)(resume_text, jd_text, CHAT_MODEL, prompt_version())
+        if cached is not None:
+            return cached
     try:
-        response = client.chat.completions.create(
-            model=CHAT_MODEL,
-            messages=[{'role': 'user', 'content': prompt}],
-            response_format={'type': 'json_object'},
-            temperature=0.7,
-            max_tokens=1500
-        )
-        
-        content = response.choices[0].message.content
-        if not content:
-            raise ValueError('Empty response from OpenAI')
-        
-        import json
-        result = json.loads(content)
-        
-        # Ensure proper structure
-        return {
-            'match_score': result.get('matchScore', 50),
-            'strengths': result.get('strengths', ['Unable to analyze strengths']),
-            'gaps': result.get('gaps', ['Unable to analyze gaps']),
-            'insights': result.get('insights', 'Analysis unavailable')
-        }
+        result = await _allm_match(jd_text, resume_text)
     except Exception as e:
-        print(f"Error in LLM analysis: {e}")
-        # Fallback to basic analysis
-        resume_set = set(resume_skills)
-        jd_lower = jd_text.lower()
-        jd_tokens = [t for t in jd_lower.split() if len(t) > 2]
-        from collections import Counter
-        jd_counts = Counter(jd_tokens)
-        required = [w for w in jd_counts if w in resume_set]
-        coverage_ratio = len(required) / max(len(set(jd_counts)), 1)
-        score = round(min(1.0, coverage_ratio) * 100, 2)
-        
-        return {
-            'match_score': score,
-            'strengths': [f"Experience with {s}" for s in required[:5]],
-            'gaps': [f"No clear mention of {g}" for g in list(set(jd_counts.keys()) - resume_set)[:3]],
-            'insights': f"The candidate shows {coverage_ratio*100:.0f}% alignment with job requirements based on keyword analysis."
-        }
+        if not fallback:
+            raise
+        logger.warning('LLM match analysis failed, using the lexical score: %s', e)
+        return fast_match(resume_text or ' '.join(resume_skills), jd_text)
+    await sync_to_async(store_match)(resume_text, jd_text, CHAT_MODEL, prompt_version(), result)
+    return result
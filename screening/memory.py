@@ -0,0 +1,149 @@
+"""Conversation memory for chat prompts: a rolling per-session summary plus a short verbatim tail.
+
+Each exchange is one assistant ChatMessage (it stores the question with the answer). The
+newest CHAT_MEMORY_TAIL_TURNS exchanges go into the prompt verbatim; once
+CHAT_MEMORY_SUMMARY_EVERY more have piled up behind them, a background call folds them
+into Session.memory_summary. Until then only their questions are listed, so the history
+part of a chat prompt stays the same size however long the conversation gets.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from django.db import close_old_connections, connection
+from .llm import gateway
+from .models import ChatMessage, Session
+from .prompts import truncate_to_tokens
+from .tracing import Counter, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+CHAT_MEMORY_ENABLED = os.environ.get('CHAT_MEMORY_ENABLED', 'true').lower() == 'true'
+CHAT_MEMORY_TAIL_TURNS = int(os.environ.get('CHAT_MEMORY_TAIL_TURNS', '2'))
+CHAT_MEMORY_SUMMARY_EVERY = max(1, int(os.environ.get('CHAT_MEMORY_SUMMARY_EVERY', '4')))
+CHAT_MEMORY_SUMMARY_TOKENS = int(os.environ.get('CHAT_MEMORY_SUMMARY_TOKENS', '200'))
+# Longest answer repeated verbatim from the tail; longer ones are cut at a token boundary.
+CHAT_MEMORY_ANSWER_TOKENS = int(os.environ.get('CHAT_MEMORY_ANSWER_TOKENS', '150'))
+CHAT_MEMORY_MODEL = os.environ.get('CHAT_MEMORY_MODEL', os.environ.get('OPENAI_CHAT_MODEL', 'gpt-4.1-mini'))
+# Without memory: the last six ChatMessage rows (about three exchanges), answers in full.
+CHAT_HISTORY_MESSAGES = 6
+
+SUMMARY_INSTRUCTIONS = (
+    "You keep the running summary of a recruiter's chat with an assistant about one candidate's resume "
+    "and one job description. Rewrite the summary so it also covers the new exchanges. Keep what was asked, "
+    "the conclusions and evidence given (skills, years, gaps, scores) and any open follow-ups; drop wording "
+    "and repetition. Write at most {words} words of plain prose and reply with the summary only."
+)
+
+TOKEN_BUCKETS = (250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+prompt_tokens = registry.register(Histogram(
+    'talentrag_chat_prompt_tokens', 'Input tokens of each packed chat prompt.', ['history'], TOKEN_BUCKETS))
+memory_updates = registry.register(Counter(
+    'talentrag_chat_memory_updates_total', 'Rolling summary updates by outcome (folded, stale, failed).', ['outcome']))
+
+_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('CHAT_MEMORY_WORKERS', '2')), thread_name_prefix='memory')
+_pending_lock = threading.Lock()
+_pending: Dict[str, Future] = {}
+
+
+def recall(session: Session) -> Tuple[str, List[str], List[ChatMessage]]:
+    """(summary, questions of exchanges not yet summarized, verbatim tail oldest first).
+
+    Read fresh rather than from ``session``: a background update may have moved the summary on.
+    """
+    if not CHAT_MEMORY_ENABLED:
+        rows = list(session.messages.filter(role='assistant').order_by('-id')[:CHAT_HISTORY_MESSAGES // 2])
+        return '', [], rows[::-1]
+    summary, through = Session.objects.filter(id=session.id).values_list('memory_summary', 'memory_through').get()
+    unsummarized = session.messages.filter(role='assistant', id__gt=through)
+    tail = list(unsummarized.order_by('-id')[:CHAT_MEMORY_TAIL_TURNS])[::-1]
+    # Every question between the summary and the tail, however far the summary lags behind.
+    if tail:
+        unsummarized = unsummarized.filter(id__lt=tail[0].id)
+    return summary, list(unsummarized.order_by('id').values_list('question', flat=True)), tail
+
+
+def tail_answer(message: ChatMessage, model: str) -> str:
+    if not CHAT_MEMORY_ENABLED:
+        return message.answer
+    return truncate_to_tokens(message.answer, CHAT_MEMORY_ANSWER_TOKENS, model)
+
+
+def summary_messages(summary: str, exchanges: List[ChatMessage]) -> List[Dict]:
+    words = max(40, CHAT_MEMORY_SUMMARY_TOKENS * 3 // 4)
+    turns = '\n\n'.join(f'Recruiter: {m.question}\nAssistant: {m.answer}' for m in exchanges)
+    return [
+        {'role': 'system', 'content': SUMMARY_INSTRUCTIONS.format(words=words)},
+        {'role': 'user', 'content': f"CURRENT SUMMARY:\n{summary or '(none yet)'}\n\nNEW EXCHANGES:\n{turns}"},
+    ]
+
+
+def update(session_id) -> bool:
+    """Fold exchanges older than the tail into the summary, SUMMARY_EVERY at a time, while that many
+    have piled up behind it.
+
+    Each fold is one summary call over at most SUMMARY_EVERY exchanges and moves memory_through just
+    past them, so a backlog (say, after failed updates) is worked off in prompts of bounded size.
+    Returns whether the summary moved. Each write is conditional on the summary not having moved
+    meanwhile, so two processes folding the same session cannot interleave their results.
+    """
+    folded = False
+    while True:
+        row = Session.objects.filter(id=session_id).values_list('memory_summary', 'memory_through').first()
+        if row is None:
+            return folded
+        summary, through = row
+        due = CHAT_MEMORY_TAIL_TURNS + CHAT_MEMORY_SUMMARY_EVERY
+        rows = list(ChatMessage.objects.filter(session_id=session_id, role='assistant', id__gt=through)
+                    .order_by('id')[:due])
+        if len(rows) < due:
+            return folded
+        fold = rows[:CHAT_MEMORY_SUMMARY_EVERY]
+        resp = gateway.chat(CHAT_MEMORY_MODEL, summary_messages(summary, fold), temperature=0,
+                            max_tokens=CHAT_MEMORY_SUMMARY_TOKENS)
+        new_summary = (resp.choices[0].message.content or '').strip()
+        moved = Session.objects.filter(id=session_id, memory_through=through).update(
+            memory_summary=new_summary, memory_through=fold[-1].id)
+        memory_updates.inc('folded' if moved else 'stale')
+        if not moved:
+            return folded
+        logger.info('Chat memory for session %s: folded %d exchanges, summary %d chars',
+                    session_id, len(fold), len(new_summary))
+        folded = True
+
+
+def _run(key: str):
+    close_old_connections()
+    try:
+        update(key)
+    except Exception:
+        memory_updates.inc('failed')
+        logger.exception('Chat memory update failed for session %s', key)
+    finally:
+        with _pending_lock:
+            _pending.pop(key, None)
+        connection.close()
+
+
+def schedule(session: Session) -> Optional[Future]:
+    """Update the session's summary on a background thread (at most one update per session at a time).
+
+    Called after every stored answer; cheap when nothing is due. Safe to call from async code.
+    """
+    if not CHAT_MEMORY_ENABLED:
+        return None
+    key = str(session.id)
+    with _pending_lock:
+        if key in _pending:
+            return _pending[key]
+        future = _pending[key] = _pool.submit(_run, key)
+    return future
+
+
+def wait(session: Session, timeout: Optional[float] = None):
+    """Block until a scheduled update of ``session`` (if any) has finished."""
+    with _pending_lock:
+        future = _pending.get(str(session.id))
+    if future is not None:
+        future.result(timeout)
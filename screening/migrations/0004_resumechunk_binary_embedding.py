@@ -0,0 +1,67 @@
+import numpy as np
+from django.db import migrations, models
+
+
+def _pack(vector):
+    vec = np.asarray(vector, dtype='<f4')
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec = vec / norm
+    return vec.astype('<f4').tobytes()
+
+
+def json_to_binary(apps, schema_editor):
+    ResumeChunk = apps.get_model("screening", "ResumeChunk")
+    batch = []
+    for chunk in ResumeChunk.objects.only("id", "embedding").iterator(chunk_size=500):
+        chunk.embedding_f32 = _pack(chunk.embedding or [])
+        batch.append(chunk)
+        if len(batch) >= 500:
+            ResumeChunk.objects.bulk_update(batch, ["embedding_f32"])
+            batch = []
+    if batch:
+        ResumeChunk.objects.bulk_update(batch, ["embedding_f32"])
+
+
+def binary_to_json(apps, schema_editor):
+    ResumeChunk = apps.get_model("screening", "ResumeChunk")
+    batch = []
+    for chunk in ResumeChunk.objects.only("id", "embedding_f32").iterator(chunk_size=500):
+        chunk.embedding = np.frombuffer(bytes(chunk.embedding_f32), dtype='<f4').tolist()
+        batch.append(chunk)
+        if len(batch) >= 500:
+            ResumeChunk.objects.bulk_update(batch, ["embedding"])
+            batch = []
+    if batch:
+        ResumeChunk.objects.bulk_update(batch, ["embedding"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0003_resumechunk_doc_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resumechunk",
+            name="embedding_f32",
+            field=models.BinaryField(default=b""),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name="resumechunk",
+            name="embedding",
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name="resumechunk",
+            name="embedding",
+        ),
+        migrations.RenameField(
+            model_name="resumechunk",
+            old_name="embedding_f32",
+            new_name="embedding",
+        ),
+    ]
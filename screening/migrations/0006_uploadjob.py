@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:24
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0005_embedding_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(db_index=True, default='queued', max_length=10)),
+                ('stage', models.CharField(default='parse', max_length=10)),
+                ('progress', models.JSONField(blank=True, default=dict)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('resume_name', models.CharField(max_length=255)),
+                ('resume_data', models.BinaryField(null=True)),
+                ('jd_name', models.CharField(max_length=255)),
+                ('jd_data', models.BinaryField(null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=3)),
+                ('error', models.TextField(blank=True, default='')),
+                ('available_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='screening.session')),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0007_answercacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='force_reanalyze',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='MatchCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resume_hash', models.CharField(max_length=64)),
+                ('jd_hash', models.CharField(max_length=64)),
+                ('model', models.CharField(max_length=100)),
+                ('prompt_version', models.CharField(max_length=40)),
+                ('result', models.JSONField()),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resume_hash', 'jd_hash', 'model', 'prompt_version'), name='uniq_match_cache_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0008_match_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumechunk',
+            name='char_end',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resumechunk',
+            name='char_start',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resumechunk',
+            name='section',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0009_resumechunk_section_offsets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='analysis_mode',
+            field=models.CharField(default='llm', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='uploadjob',
+            name='analysis_mode',
+            field=models.CharField(default='llm', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0010_analysis_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumechunk',
+            name='terms',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0011_resumechunk_terms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='memory_summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='memory_through',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:30
+
+from django.db import migrations, models
+
+
+def copy_source_refs(apps, schema_editor):
+    """Replace each message's copied chunk previews with [doc_type, chunk_index, score] references."""
+    ChatMessage = apps.get_model('screening', 'ChatMessage')
+    batch = []
+    for message in ChatMessage.objects.filter(role='assistant').only('id', 'retrieved_chunks').iterator(chunk_size=500):
+        if not message.retrieved_chunks:
+            continue
+        message.sources = [[r.get('doc_type') or 'resume', r['chunk_index'], round(r['score'], 4)]
+                           for r in message.retrieved_chunks if 'chunk_index' in r]
+        batch.append(message)
+        if len(batch) >= 500:
+            ChatMessage.objects.bulk_update(batch, ['sources'])
+            batch = []
+    if batch:
+        ChatMessage.objects.bulk_update(batch, ['sources'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0012_session_memory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='sources',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(copy_source_refs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='retrieved_chunks',
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'created_at'], name='chat_session_created_idx'),
+        ),
+    ]
@@ -0,0 +1,100 @@
+import hashlib
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_to_documents(apps, schema_editor):
+    """One Document per distinct (doc_type, text); the first session's chunks become the document's."""
+    Document = apps.get_model('screening', 'Document')
+    Session = apps.get_model('screening', 'Session')
+    ResumeChunk = apps.get_model('screening', 'ResumeChunk')
+    known = {}  # (doc_type, text hash) -> [document id, chunk count]
+    for session in Session.objects.order_by('created_at').iterator(chunk_size=200):
+        for doc_type, field, text in (('resume', 'resume_document_id', session.resume_text),
+                                      ('job_description', 'jd_document_id', session.jd_text)):
+            key = (doc_type, hashlib.sha256(text.encode('utf-8')).hexdigest())
+            if key not in known:
+                known[key] = [Document.objects.create(doc_type=doc_type, text_hash=key[1], text=text).id, None]
+            doc_id, count = known[key]
+            chunks = ResumeChunk.objects.filter(session_id=session.id, doc_type=doc_type)
+            if count is None:
+                moved = chunks.update(document_id=doc_id)
+                if moved:
+                    known[key][1] = moved
+                    Document.objects.filter(id=doc_id).update(chunk_count=moved)
+            else:
+                chunks.delete()
+            setattr(session, field, doc_id)
+        session.save(update_fields=['resume_document', 'jd_document'])
+    ResumeChunk.objects.filter(document__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0013_chatmessage_source_refs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Document',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('doc_type', models.CharField(max_length=20)),
+                ('text_hash', models.CharField(max_length=64)),
+                ('file_hash', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('text', models.TextField()),
+                ('warning', models.TextField(blank=True, default='')),
+                ('chunk_count', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('doc_type', 'text_hash'), name='uniq_document_text')],
+            },
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='resume_document',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='resume_sessions', to='screening.document'),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='jd_document',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='jd_sessions', to='screening.document'),
+        ),
+        migrations.AddField(
+            model_name='resumechunk',
+            name='document',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='screening.document'),
+        ),
+        migrations.RunPython(move_to_documents, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='resumechunk',
+            name='session',
+        ),
+        migrations.RemoveField(
+            model_name='session',
+            name='resume_text',
+        ),
+        migrations.RemoveField(
+            model_name='session',
+            name='jd_text',
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='resume_document',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='resume_sessions', to='screening.document'),
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='jd_document',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='jd_sessions', to='screening.document'),
+        ),
+        migrations.AlterField(
+            model_name='resumechunk',
+            name='document',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='screening.document'),
+        ),
+    ]
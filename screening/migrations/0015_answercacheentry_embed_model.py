@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0014_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answercacheentry',
+            name='dim',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='answercacheentry',
+            name='embed_model',
+            field=models.CharField(default='', max_length=100),
+        ),
+    ]
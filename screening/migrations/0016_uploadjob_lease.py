@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening', '0015_answercacheentry_embed_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='lease',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -1,27 +1,150 @@
 import uuid
 from django.db import models
+from django.utils import timezone
+
+class Document(models.Model):
+    """One parsed resume or job description, stored once however many sessions use it (see screening.documents)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    doc_type = models.CharField(max_length=20)  # resume | job_description
+    text_hash = models.CharField(max_length=64)  # sha256 of the normalized text
+    file_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)  # sha256 of the first file read
+    text = models.TextField()
+    warning = models.TextField(blank=True, default='')  # extraction warning (e.g. truncated), repeated on reuse
+    chunk_count = models.IntegerField(null=True, blank=True)  # set once chunks and embeddings are stored
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doc_type', 'text_hash'], name='uniq_document_text'),
+        ]
 
 class Session(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    resume_text = models.TextField()
-    jd_text = models.TextField()
+    resume_document = models.ForeignKey(Document, related_name='resume_sessions', on_delete=models.PROTECT)
+    jd_document = models.ForeignKey(Document, related_name='jd_sessions', on_delete=models.PROTECT)
     match_score = models.FloatField(null=True, blank=True)
     strengths = models.JSONField(default=list, blank=True)
     gaps = models.JSONField(default=list, blank=True)
     insights = models.TextField(blank=True, default='')  # Changed to TextField for paragraph format
+    analysis_mode = models.CharField(max_length=10, default='llm')  # llm | fast (see screening.lexical)
+    memory_summary = models.TextField(blank=True, default='')  # rolling chat summary, see screening.memory
+    memory_through = models.BigIntegerField(default=0)  # id of the last assistant ChatMessage in memory_summary
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @property
+    def resume_text(self) -> str:
+        return self.resume_document.text
+
+    @property
+    def jd_text(self) -> str:
+        return self.jd_document.text
+
+    @property
+    def document_ids(self):
+        return (self.resume_document_id, self.jd_document_id)
+
+    @property
+    def chunks(self):
+        """Chunks of both documents; the rows belong to the documents, not to the session."""
+        return ResumeChunk.objects.filter(document_id__in=self.document_ids)
+
 class ResumeChunk(models.Model):
-    session = models.ForeignKey(Session, related_name='chunks', on_delete=models.CASCADE)
-    doc_type = models.CharField(max_length=20, default='resume')  # resume | job_description
+    document = models.ForeignKey(Document, related_name='chunks', on_delete=models.CASCADE)
+    doc_type = models.CharField(max_length=20, default='resume')  # resume | job_description, same as the document's
     index = models.IntegerField()
     text = models.TextField()
-    embedding = models.JSONField()  # list of floats
+    embedding = models.BinaryField()  # L2-normalized little-endian float32, see rag.pack_embedding
+    section = models.CharField(max_length=100, blank=True, default='')  # see parsing.Chunk
+    char_start = models.IntegerField(null=True, blank=True)
+    char_end = models.IntegerField(null=True, blank=True)
+    terms = models.JSONField(null=True, blank=True)  # {term: count} for BM25, see lexical.term_counts
 
 class ChatMessage(models.Model):
     session = models.ForeignKey(Session, related_name='messages', on_delete=models.CASCADE)
     role = models.CharField(max_length=10)  # user / assistant
     question = models.TextField(blank=True)
     answer = models.TextField(blank=True)
+    sources = models.JSONField(default=list, blank=True)  # [[doc_type, chunk_index, score], ...], see rag.source_refs
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['session', 'id'], name='chat_session_id_idx')]
+
+class EmbeddingCacheEntry(models.Model):
+    """Embedding of one normalized text, shared by every session that embeds it."""
+    model = models.CharField(max_length=100)
+    text_hash = models.CharField(max_length=64)  # sha256 of the normalized text
+    embedding = models.BinaryField()  # same packing as ResumeChunk.embedding
+    token_count = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'text_hash'], name='uniq_embedding_cache_key'),
+        ]
+
+class EmbeddingCacheStat(models.Model):
+    """Lifetime counters per embedding model (survive eviction of the entries themselves)."""
+    model = models.CharField(max_length=100, unique=True)
+    hits = models.BigIntegerField(default=0)
+    misses = models.BigIntegerField(default=0)
+    tokens_saved = models.BigIntegerField(default=0)
+    tokens_embedded = models.BigIntegerField(default=0)
+
+class UploadJob(models.Model):
+    """One queued upload processed by the background worker (see screening.jobs)."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    session = models.ForeignKey(Session, related_name='jobs', null=True, blank=True, on_delete=models.SET_NULL)
+    status = models.CharField(max_length=10, default=STATUS_QUEUED, db_index=True)
+    stage = models.CharField(max_length=10, default='parse')  # next stage to run
+    progress = models.JSONField(default=dict, blank=True)  # stage -> {status, duration_ms, ...}
+    payload = models.JSONField(default=dict, blank=True)  # intermediate stage output (chunks)
+    resume_name = models.CharField(max_length=255)
+    resume_data = models.BinaryField(null=True)
+    jd_name = models.CharField(max_length=255)
+    jd_data = models.BinaryField(null=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    force_reanalyze = models.BooleanField(default=False)  # bypass the compute_match cache
+    analysis_mode = models.CharField(max_length=10, default='llm')
+    error = models.TextField(blank=True, default='')
+    available_at = models.DateTimeField(default=timezone.now, db_index=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    lease = models.IntegerField(default=0)  # bumped by every claim; fences writes of a worker that lost the job
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class AnswerCacheEntry(models.Model):
+    """A chat answer reusable for near-duplicate questions about the same resume + JD content."""
+    content_hash = models.CharField(max_length=64, db_index=True)
+    embed_model = models.CharField(max_length=100, default='')  # model and dimension of question_embedding
+    dim = models.IntegerField(default=0)
+    question = models.TextField()
+    question_embedding = models.BinaryField()  # packed like ResumeChunk.embedding
+    answer = models.TextField()
     retrieved_chunks = models.JSONField(default=list, blank=True)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class MatchCacheEntry(models.Model):
+    """Parsed compute_match result for an exact (resume, JD, model, prompt version) combination."""
+    resume_hash = models.CharField(max_length=64)
+    jd_hash = models.CharField(max_length=64)
+    model = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=40)
+    result = models.JSONField()
+    hits = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['resume_hash', 'jd_hash', 'model', 'prompt_version'], name='uniq_match_cache_key'),
+        ]
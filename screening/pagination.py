@@ -0,0 +1,17 @@
+import os
+from rest_framework.pagination import CursorPagination
+
+CHAT_HISTORY_PAGE_SIZE = int(os.environ.get('CHAT_HISTORY_PAGE_SIZE', '50'))
+
+
+class ChatHistoryPagination(CursorPagination):
+    """Newest messages first; ``next`` pages back through older ones (index: session, id).
+
+    The cursor position is the id: it is unique and grows with insertion order, whereas messages
+    stored in the same instant share created_at, and DRF then falls back to an offset that shifts
+    as new messages arrive.
+    """
+    ordering = '-id'
+    page_size = CHAT_HISTORY_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -1,40 +1,209 @@
+import atexit
+import multiprocessing
+import os
 import re
-from io import BytesIO
-from typing import Tuple, List
-from pdfminer.high_level import extract_text
+import threading
+import time
+from contextlib import contextmanager
+from io import BytesIO, StringIO
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from .skills import get_matcher
+from .tokens import count_tokens
+from .tracing import traced
+
+PDF_MAX_BYTES = int(os.environ.get('PDF_MAX_BYTES', str(10 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', '30'))
+PDF_TIME_BUDGET = float(os.environ.get('PDF_TIME_BUDGET', '20'))  # seconds per document
+# Documents with at least this many pages are split across PDF_WORKERS processes.
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', '8'))
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', '2'))
 
 SECTION_HEADINGS = [
     'summary', 'experience', 'work experience', 'professional experience', 'education', 'skills', 'technical skills', 'projects'
 ]
 
-SKILL_PATTERN = re.compile(r"(?i)\b([A-Za-z][A-Za-z0-9+.#-]{1,})\b")
-STOP_WORDS = set(['and','or','the','in','on','at','for','with','to','of','a','an'])
 
-def extract_text_from_pdf(data: bytes) -> str:
+class DocumentError(ValueError):
+    """An uploaded document could not be read at all."""
+
+class PdfExtraction(NamedTuple):
+    text: str
+    pages: int  # pages actually extracted
+    total_pages: int
+    truncated: bool
+    reason: str  # why extraction stopped early ('' when complete)
+
+def count_pdf_pages(data: bytes) -> int:
+    return sum(1 for _ in PDFPage.get_pages(BytesIO(data)))
+
+def iter_pdf_pages(data: bytes, page_numbers: Optional[Sequence[int]] = None, max_pages: int = 0) -> Iterator[str]:
+    """Yield the text of each page in order, parsing one page at a time."""
+    rsrcmgr = PDFResourceManager(caching=True)
+    out = StringIO()
+    device = TextConverter(rsrcmgr, out, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
     try:
-        bio = BytesIO(data)
-        text = extract_text(bio)
-        return text
-    except Exception:
-        return ''
+        pagenos = set(page_numbers) if page_numbers is not None else None
+        for page in PDFPage.get_pages(BytesIO(data), pagenos=pagenos, maxpages=max_pages):
+            interpreter.process_page(page)
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate(0)
+    finally:
+        device.close()
+
+def _extract_page_range(args: Tuple[bytes, List[int]]) -> List[str]:
+    data, page_numbers = args
+    return list(iter_pdf_pages(data, page_numbers=page_numbers))
+
+def _pdf_context():
+    # forkserver: workers fork from a clean, single-threaded server that already imported pdfminer,
+    # so they never inherit the web worker's threads or DB sockets. Called on first use, not at import.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+class _PdfPools:
+    """Long-lived worker pools (one per size) shared by every extract_pdf call in this process.
+
+    A call that overruns its time budget retires its pool, since a worker may still be stuck on
+    that PDF: new calls get a fresh pool and the old one is terminated once its last user is done.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._current = {}  # processes -> pool
+        self._users = {}  # pool -> calls using it
+
+    @contextmanager
+    def lease(self, processes: int):
+        with self._lock:
+            if self._pid != os.getpid():  # pools don't survive a fork (e.g. gunicorn --preload)
+                self._pid, self._current, self._users = os.getpid(), {}, {}
+            pool = self._current.get(processes)
+            if pool is None:
+                pool = self._current[processes] = _pdf_context().Pool(processes)
+            self._users[pool] = self._users.get(pool, 0) + 1
+        try:
+            yield pool
+        finally:
+            with self._lock:
+                self._users[pool] -= 1
+                done = not self._users[pool] and pool not in self._current.values()
+                if done:
+                    del self._users[pool]
+            if done:
+                pool.terminate()
+
+    def retire(self, pool):
+        with self._lock:
+            for processes, current in list(self._current.items()):
+                if current is pool:
+                    del self._current[processes]
+
+    def close(self):
+        with self._lock:
+            pools = list(self._current.values()) if self._pid == os.getpid() else []
+            self._current = {}
+        for pool in pools:
+            pool.terminate()
+
+_pools = _PdfPools()
+atexit.register(_pools.close)
+
+@traced('extract_pdf')
+def extract_pdf(data: bytes, max_pages: int = PDF_MAX_PAGES, max_bytes: int = PDF_MAX_BYTES,
+                time_budget: float = PDF_TIME_BUDGET, workers: int = PDF_WORKERS) -> PdfExtraction:
+    """Extract PDF text within page, size and time limits, reporting any truncation.
+
+    Counting and parsing run in a long-lived pool of ``workers`` processes: large documents
+    are split into contiguous page ranges over the workers, small ones go page by page. Every
+    wait is bounded by the time budget, and a call that overruns it (or fails part way)
+    retires the pool, so a hostile PDF can't pin a worker for later uploads.
+    """
+    if len(data) > max_bytes:
+        raise DocumentError(f'PDF is {len(data)} bytes; the limit is {max_bytes}.')
+    deadline = time.monotonic() + time_budget
+    exceeded = f'time budget of {time_budget:g}s exceeded'
+
+    def remaining() -> float:
+        return max(0.0, deadline - time.monotonic())
+
+    processes = max(1, workers)
+    with _pools.lease(processes) as pool:
+        try:
+            total = pool.apply_async(count_pdf_pages, (data,)).get(timeout=remaining())
+        except multiprocessing.TimeoutError:
+            _pools.retire(pool)
+            raise DocumentError(f'Unreadable PDF: {exceeded} while counting pages.') from None
+        except Exception as e:
+            raise DocumentError(f'Unreadable PDF: {e}') from e
+        wanted = min(total, max_pages) if max_pages else total
+        reason = f'page limit of {max_pages} reached' if wanted < total else ''
+
+        if processes > 1 and wanted >= PDF_PARALLEL_MIN_PAGES:
+            # Several ranges per worker so a budget overrun still keeps the leading pages.
+            step = max(2, -(-wanted // (processes * 4)))
+        else:
+            step = 1
+        ranges = [list(range(lo, min(lo + step, wanted))) for lo in range(0, wanted, step)]
+        results = pool.imap(_extract_page_range, [(data, r) for r in ranges])
+        pages: List[str] = []
+        try:
+            for _ in ranges:
+                pages.extend(results.next(timeout=remaining()))
+        except multiprocessing.TimeoutError:
+            _pools.retire(pool)
+            reason = exceeded
+        except Exception as e:
+            # Ranges after the failing one are still queued; don't let them hold the shared workers.
+            _pools.retire(pool)
+            if not pages:
+                raise DocumentError(f'Unreadable PDF: {e}') from e
+            reason = f'stopped at page {len(pages) + 1}: {e}'
+    return PdfExtraction(''.join(pages), len(pages), total, bool(reason), reason)
+
+def extract_text_from_pdf(data: bytes) -> str:
+    return extract_pdf(data).text
+
+class DocumentText(NamedTuple):
+    text: str
+    warning: str  # non-empty when the text is incomplete
+
+@traced('read_document')
+def read_document(name: str, data: bytes) -> DocumentText:
+    if name.lower().endswith('.pdf'):
+        result = extract_pdf(data)
+        warning = ''
+        if result.truncated:
+            warning = f'{name}: extracted {result.pages} of {result.total_pages} pages ({result.reason}).'
+        return DocumentText(result.text, warning)
+    return DocumentText(data.decode(errors='ignore'), '')
+
+def read_bytes_content(name: str, data: bytes) -> str:
+    return read_document(name, data).text
 
 def read_file_content(uploaded_file) -> str:
-    name = uploaded_file.name.lower()
-    data = uploaded_file.read()
-    if name.endswith('.pdf'):
-        return extract_text_from_pdf(data)
-    return data.decode(errors='ignore')
+    return read_bytes_content(uploaded_file.name, uploaded_file.read())
 
 def normalize_whitespace(text: str) -> str:
     return re.sub(r'\s+', ' ', text).strip()
 
+# Longest headings first so "work experience" wins over the "experience" inside it.
+SECTION_PATTERN = re.compile(
+    r'(?i)\b(' + '|'.join(re.escape(h) for h in sorted(SECTION_HEADINGS, key=len, reverse=True)) + r')\b'
+)
+
+@traced('split_sections')
 def split_sections(text: str) -> List[Tuple[str,str]]:
-    lowered = text.lower()
-    positions = []
-    for heading in SECTION_HEADINGS:
-        for match in re.finditer(rf"(?i)\b{re.escape(heading)}\b", lowered):
-            positions.append((match.start(), heading))
-    positions.sort()
+    positions = [(m.start(), m.group(1).lower()) for m in SECTION_PATTERN.finditer(text)]
     sections = []
     for i,(pos, heading) in enumerate(positions):
         end = positions[i+1][0] if i+1 < len(positions) else len(text)
@@ -45,23 +214,10 @@ def split_sections(text: str) -> List[Tuple[str,str]]:
     return sections
 
 def extract_skills(text: str) -> List[str]:
-    candidates = SKILL_PATTERN.findall(text)
-    skills = []
-    for c in candidates:
-        token = c.strip('.').lower()
-        if token in STOP_WORDS:
-            continue
-        if len(token) < 2:
-            continue
-        if token.isdigit():
-            continue
-        skills.append(token)
-    uniq = []
-    for s in skills:
-        if s not in uniq:
-            uniq.append(s)
-    return uniq[:300]
+    """Canonical skills from the taxonomy (synonyms folded, e.g. "k8s" -> "kubernetes"), in order of first mention."""
+    return get_matcher().skills(text)
 
+@traced('chunk_text')
 def chunk_text(sections: List[Tuple[str,str]], max_chars: int = 1200) -> List[str]:
     chunks = []
     for heading, sec in sections:
@@ -89,3 +245,90 @@ def chunk_text(sections: List[Tuple[str,str]], max_chars: int = 1200) -> List[st
     if buf:
         merged.append(buf.strip())
     return merged
+
+CHUNK_TOKEN_MODEL = os.environ.get('OPENAI_EMBED_MODEL', 'text-embedding-3-small')
+CHUNK_MAX_TOKENS = int(os.environ.get('CHUNK_MAX_TOKENS', '512'))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get('CHUNK_OVERLAP_TOKENS', '32'))
+# A section shorter than this is merged with the next one instead of becoming its own chunk.
+CHUNK_MIN_TOKENS = int(os.environ.get('CHUNK_MIN_TOKENS', '160'))
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9])')
+
+class Chunk(NamedTuple):
+    text: str
+    section: str  # heading(s) the chunk was cut from, e.g. 'experience' or 'education+skills'
+    start: int  # character offsets into the source text; text == source[start:end]
+    end: int
+    tokens: int
+
+def iter_sections(text: str) -> Iterator[Tuple[str, int, int]]:
+    """(heading, start, end) spans covering the text; text before the first heading is 'header'."""
+    positions = [(m.start(), m.group(1).lower()) for m in SECTION_PATTERN.finditer(text)]
+    if not positions:
+        positions = [(0, 'full')]
+    elif positions[0][0] > 0:
+        positions.insert(0, (0, 'header'))
+    for i, (pos, heading) in enumerate(positions):
+        end = positions[i + 1][0] if i + 1 < len(positions) else len(text)
+        if text[pos:end].strip():
+            yield heading, pos, end
+
+def _sentence_spans(text: str, start: int, end: int, max_tokens: int, model: str) -> Iterator[Tuple[int, int, int]]:
+    """(start, end, tokens) per sentence; sentences over max_tokens are cut between words."""
+    bounds = [start] + [m.end() for m in SENTENCE_BOUNDARY.finditer(text, start, end)] + [end]
+    for lo, hi in zip(bounds, bounds[1:]):
+        sentence = text[lo:hi].rstrip()
+        lo += len(sentence) - len(sentence.lstrip())
+        hi = lo + len(sentence.strip())
+        if hi <= lo:
+            continue
+        n = count_tokens(text[lo:hi], model)
+        if n <= max_tokens:
+            yield lo, hi, n
+            continue
+        piece_start, piece_end, piece_tokens = lo, lo, 0
+        for word in re.finditer(r'\S+', text[lo:hi]):
+            w = count_tokens(word.group(0), model)
+            if piece_tokens and piece_tokens + w > max_tokens:
+                yield piece_start, piece_end, piece_tokens
+                piece_start, piece_tokens = lo + word.start(), 0
+            piece_end = lo + word.end()
+            piece_tokens += w
+        if piece_tokens:
+            yield piece_start, piece_end, piece_tokens
+
+@traced('iter_chunks')
+def iter_chunks(text: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                min_tokens: int = CHUNK_MIN_TOKENS, model: str = CHUNK_TOKEN_MODEL) -> Iterator[Chunk]:
+    """Pack whole sentences into chunks of up to ``max_tokens`` embedding tokens, lazily.
+
+    Chunks stay inside one section unless the section is under ``min_tokens``. When a section
+    overflows, the next chunk repeats up to ``overlap_tokens`` of trailing sentences from it.
+    """
+    window: List[Tuple[int, int, int, str]] = []  # (start, end, tokens, section)
+    size = 0
+
+    def emit() -> Chunk:
+        start, end = window[0][0], window[-1][1]
+        sections = '+'.join(dict.fromkeys(piece[3] for piece in window))
+        return Chunk(text[start:end], sections, start, end, size)
+
+    for section, sec_start, sec_end in iter_sections(text):
+        if window and size >= min_tokens:
+            yield emit()
+            window, size = [], 0
+        for start, end, n in _sentence_spans(text, sec_start, sec_end, max_tokens, model):
+            if window and size + n > max_tokens:
+                yield emit()
+                tail, tail_size = [], 0
+                for piece in reversed(window[1:]):
+                    if piece[3] != section or tail_size + piece[2] > overlap_tokens:
+                        break
+                    tail.insert(0, piece)
+                    tail_size += piece[2]
+                if tail_size + n > max_tokens:
+                    tail, tail_size = [], 0
+                window, size = tail, tail_size
+            window.append((start, end, n, section))
+            size += n
+    if window:
+        yield emit()
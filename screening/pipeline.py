@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, Tuple
+from asgiref.sync import sync_to_async
+from django.db import connection
+from .parsing import Chunk, extract_skills, iter_chunks
+from .matching import acompute_match, compute_match
+from .lexical import fast_match
+from .rag import astore_documents, store_documents
+from .documents import delete_sessions
+from .tracing import in_context
+from .models import Session
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_STAGE_WORKERS = int(os.environ.get('UPLOAD_STAGE_WORKERS', '4'))
+_stage_pool = ThreadPoolExecutor(max_workers=UPLOAD_STAGE_WORKERS, thread_name_prefix='upload-stage')
+
+
+class EmbeddingFailed(Exception):
+    """Embedding an upload's chunks failed; its session (analysis included) has been deleted."""
+
+def build_chunks(resume_text: str, jd_text: str) -> Dict[str, Iterator[Chunk]]:
+    """Lazy chunk streams per doc_type; store_documents embeds them as they are produced.
+
+    Streams of documents that already have chunks are never consumed, so passing both is free.
+    """
+    return {
+        'resume': iter_chunks(resume_text),
+        'job_description': iter_chunks(jd_text),
+    }
+
+ANALYSIS_MODES = ('llm', 'fast')
+
+def analyze_match(resume_text: str, jd_text: str, force: bool = False, mode: str = 'llm', fallback: bool = True) -> Dict:
+    """LLM analysis (memoized), or with mode='fast' the local lexical score without any network call."""
+    if mode == 'fast':
+        return fast_match(resume_text, jd_text)
+    return compute_match(extract_skills(resume_text), jd_text, resume_text, force=force, fallback=fallback)
+
+async def aanalyze_match(resume_text: str, jd_text: str, force: bool = False, mode: str = 'llm',
+                         fallback: bool = True) -> Dict:
+    if mode == 'fast':
+        return await sync_to_async(fast_match, thread_sensitive=False)(resume_text, jd_text)
+    return await acompute_match(extract_skills(resume_text), jd_text, resume_text, force=force, fallback=fallback)
+
+def save_match(session: Session, match_data: Dict):
+    session.match_score = match_data['match_score']
+    session.strengths = match_data['strengths']
+    session.gaps = match_data['gaps']
+    session.insights = match_data['insights']
+    session.analysis_mode = match_data.get('mode', 'llm')
+    session.save(update_fields=['match_score', 'strengths', 'gaps', 'insights', 'analysis_mode'])
+
+def embed_documents(session: Session, documents: Dict[str, Iterable]) -> int:
+    """Store chunks for the session's documents that have none yet; safe to repeat after a failure."""
+    return store_documents(session, documents)
+
+def _timed(fn: Callable, t0: float) -> Callable[[], Tuple[object, Dict]]:
+    def run():
+        start = time.perf_counter()
+        try:
+            return fn(), {'start_ms': round((start - t0) * 1000, 1), 'end_ms': round((time.perf_counter() - t0) * 1000, 1)}
+        finally:
+            # Pool threads get their own DB connection; don't leak it between tasks.
+            connection.close()
+    return run
+
+async def _atimed(work: Awaitable, t0: float) -> Tuple[object, Dict]:
+    start = time.perf_counter()
+    result = await work
+    return result, {'start_ms': round((start - t0) * 1000, 1), 'end_ms': round((time.perf_counter() - t0) * 1000, 1)}
+
+def match_and_embed(session: Session, documents: Dict[str, Iterable], force_match: bool = False, mode: str = 'llm') -> Tuple[Dict, Dict]:
+    """Run the match analysis and chunk embedding concurrently for an existing session.
+
+    Neither depends on the other, so wall time is max(match, embed) instead of the sum. The match
+    is saved as soon as it is ready, so analysis polling sees it without waiting for embedding.
+    Returns the match result and a timing breakdown (ms offsets from the start of this call).
+    If embedding fails the session is deleted, so no analysis without chunks is left behind,
+    and EmbeddingFailed is raised.
+    """
+    t0 = time.perf_counter()
+    match_future = _stage_pool.submit(in_context(_timed(lambda: analyze_match(session.resume_text, session.jd_text, force=force_match, mode=mode), t0)))
+    embed_future = _stage_pool.submit(in_context(_timed(lambda: store_documents(session, documents), t0)))
+    match_data, match_timing = match_future.result()
+    save_match(session, match_data)
+    try:
+        _, embed_timing = embed_future.result()
+    except Exception as e:
+        _discard(session, e)
+    return match_data, _timings(session, t0, match_timing, embed_timing)
+
+async def amatch_and_embed(session: Session, documents: Dict[str, Iterable], force_match: bool = False, mode: str = 'llm') -> Tuple[Dict, Dict]:
+    """match_and_embed on the event loop: both stages are awaited together instead of using pool threads."""
+    t0 = time.perf_counter()
+
+    async def match():
+        match_data, timing = await _atimed(aanalyze_match(session.resume_text, session.jd_text, force=force_match, mode=mode), t0)
+        await sync_to_async(save_match)(session, match_data)
+        return match_data, timing
+
+    # Let both finish before cleaning up, so a late save_match can't hit a deleted session.
+    matched, embedded = await asyncio.gather(
+        match(), _atimed(astore_documents(session, documents), t0), return_exceptions=True,
+    )
+    if isinstance(embedded, Exception):
+        await sync_to_async(_discard)(session, embedded)
+    if isinstance(matched, BaseException):
+        raise matched
+    if isinstance(embedded, BaseException):
+        raise embedded
+    (match_data, match_timing), (_, embed_timing) = matched, embedded
+    return match_data, _timings(session, t0, match_timing, embed_timing)
+
+def _discard(session: Session, error: Exception):
+    """Delete an upload's session after its embedding failed and raise EmbeddingFailed."""
+    logger.error('Upload %s: embedding failed, deleting the session: %s', session.id, error)
+    delete_sessions(Session.objects.filter(id=session.id))
+    raise EmbeddingFailed(str(error)) from error
+
+def _timings(session: Session, t0: float, match_timing: Dict, embed_timing: Dict) -> Dict:
+    wall_ms = round((time.perf_counter() - t0) * 1000, 1)
+    match_ms = round(match_timing['end_ms'] - match_timing['start_ms'], 1)
+    embed_ms = round(embed_timing['end_ms'] - embed_timing['start_ms'], 1)
+    timings = {
+        'match': match_timing,
+        'embed': embed_timing,
+        'wall_ms': wall_ms,
+        'overlap_ms': round(max(0.0, match_ms + embed_ms - wall_ms), 1),
+    }
+    logger.info('Upload %s: match %.1fms, embed %.1fms, wall %.1fms', session.id, match_ms, embed_ms, wall_ms)
+    return timings
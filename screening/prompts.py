@@ -0,0 +1,79 @@
+import logging
+import os
+from typing import Dict, Optional
+from .tokens import count_tokens, get_encoding
+
+logger = logging.getLogger(__name__)
+
+# Default prompt budgets (input tokens) per kind of prompt.
+PROMPT_TOKEN_BUDGET = {
+    'chat': int(os.environ.get('CHAT_PROMPT_TOKEN_BUDGET', '1500')),
+    'match': int(os.environ.get('MATCH_PROMPT_TOKEN_BUDGET', '1800')),
+}
+# Per-model overrides, e.g. "gpt-4o-mini=4000,gpt-4.1-mini:match=6000" (no kind = every kind).
+PROMPT_TOKEN_BUDGETS: Dict[str, int] = {
+    name.strip(): int(value)
+    for name, _, value in (item.partition('=') for item in os.environ.get('PROMPT_TOKEN_BUDGETS', '').split(','))
+    if name.strip() and value.strip()
+}
+# Framing tokens the chat format adds around every message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def prompt_budget(model: str, kind: str = 'chat') -> int:
+    return PROMPT_TOKEN_BUDGETS.get(f'{model}:{kind}', PROMPT_TOKEN_BUDGETS.get(model, PROMPT_TOKEN_BUDGET[kind]))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Longest prefix of ``text`` that is at most ``max_tokens`` tokens."""
+    if max_tokens <= 0:
+        return ''
+    enc = get_encoding(model)
+    if enc is None:
+        return text[:max_tokens * 4]  # same ~4 chars/token estimate as count_tokens
+    ids = enc.encode(text, disallowed_special=())
+    return text if len(ids) <= max_tokens else enc.decode(ids[:max_tokens])
+
+
+class PromptPacker:
+    """Fill a prompt token budget in priority order.
+
+    ``require`` always counts (instructions, the question); ``add`` takes optional parts in the
+    order it's called and drops, or cuts at a token boundary, whatever no longer fits.
+    """
+
+    def __init__(self, model: str, kind: str = 'chat', budget: Optional[int] = None):
+        self.model = model
+        self.budget = prompt_budget(model, kind) if budget is None else budget
+        self.used = 0
+        self.dropped = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.budget - self.used)
+
+    def require(self, text: str, message: bool = False) -> str:
+        self.used += count_tokens(text, self.model) + (MESSAGE_OVERHEAD_TOKENS if message else 0)
+        return text
+
+    def add(self, text: str, truncate: bool = False, min_tokens: int = 32, max_tokens: Optional[int] = None,
+            message: bool = False) -> Optional[str]:
+        """``text`` if it fits (or, with ``truncate``, a prefix of at least ``min_tokens``), else None."""
+        overhead = MESSAGE_OVERHEAD_TOKENS if message else 0
+        room = self.remaining - overhead
+        if max_tokens is not None:
+            room = min(room, max_tokens)
+        n = count_tokens(text, self.model)
+        if n <= room:
+            self.used += n + overhead
+            return text
+        if truncate and room >= min_tokens:
+            cut = truncate_to_tokens(text, room, self.model)
+            self.used += count_tokens(cut, self.model) + overhead
+            return cut
+        self.dropped += 1
+        return None
+
+    def log(self, label: str, **parts):
+        details = ', '.join(f'{k} {v}' for k, v in parts.items())
+        logger.info('%s prompt: %d/%d tokens (%s)', label, self.used, self.budget, details)
@@ -1,143 +1,571 @@
+import asyncio
 import os
 import numpy as np
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
 from openai import OpenAI
-from .models import ResumeChunk, Session, ChatMessage
+from .models import Document, ResumeChunk, Session, ChatMessage
+from .vector_cache import StackedMatrix, session_lexical, session_vectors
+from .embedding_cache import acached_embeddings, cached_embeddings
+from .tokens import count_tokens
+from .parsing import Chunk
+from .lexical import LexicalIndex, term_counts, terms
+from .prompts import PromptPacker
+from . import answer_cache, memory
+from .ann import index_chunks
+from .segments import SEGMENT_STORE_ENABLED, segment_store, store_document_segment
+from .documents import sessions_using, unchunked_types
+from .tracing import in_context, traced
+from .llm import gateway
 
 EMBED_MODEL = os.environ.get('OPENAI_EMBED_MODEL', 'text-embedding-3-small')
 CHAT_MODEL = os.environ.get('OPENAI_CHAT_MODEL', 'gpt-4.1-mini')
+# Per-request limits of the embeddings endpoint.
+EMBED_MAX_INPUTS = int(os.environ.get('EMBED_MAX_INPUTS', '2048'))
+EMBED_MAX_REQUEST_TOKENS = int(os.environ.get('EMBED_MAX_REQUEST_TOKENS', '300000'))
+# Chunks are sent to the embeddings API in batches of this size while chunking continues.
+EMBED_STREAM_BATCH = int(os.environ.get('EMBED_STREAM_BATCH', '64'))
+# 'hybrid' fuses dense and BM25 rankings with reciprocal rank fusion; 'dense' is cosine only.
+RETRIEVAL_MODES = ('dense', 'hybrid')
+RETRIEVAL_MODE = os.environ.get('RETRIEVAL_MODE', 'dense')
+RRF_K = int(os.environ.get('RRF_K', '60'))
+_embed_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('EMBED_STREAM_WORKERS', '2')), thread_name_prefix='embed')
 
 def get_client() -> OpenAI:
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY environment variable is not set. Set it or create backend/.env and restart.")
-    return OpenAI(api_key=api_key)
+    """The process-wide pooled client; prefer the gateway's methods, which add rate limiting and retries."""
+    return gateway.client
 
+def batch_by_tokens(texts: List[str], max_inputs: int = EMBED_MAX_INPUTS, max_tokens: int = EMBED_MAX_REQUEST_TOKENS) -> List[List[str]]:
+    """Greedily pack texts, in order, into as few requests as the input and token limits allow."""
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in texts:
+        n = count_tokens(text, EMBED_MODEL)
+        if current and (len(current) >= max_inputs or current_tokens + n > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += n
+    if current:
+        batches.append(current)
+    return batches
+
+@traced('embed_text')
 def embed_text(texts: List[str]) -> List[List[float]]:
-    client = get_client()
-    resp = client.embeddings.create(model=EMBED_MODEL, input=texts)
-    return [d.embedding for d in resp.data]
+    if not texts:
+        return []
+    embeddings: List[List[float]] = []
+    for batch in batch_by_tokens(texts):
+        embeddings.extend(gateway.embed(batch, EMBED_MODEL))
+    return embeddings
+
+@traced('embed_text')
+async def aembed_text(texts: List[str]) -> List[List[float]]:
+    batches = await asyncio.gather(*(gateway.aembed(batch, EMBED_MODEL) for batch in batch_by_tokens(texts)))
+    return [e for batch in batches for e in batch]
+
+def pack_embedding(vector) -> bytes:
+    """L2-normalize an embedding and pack it as little-endian float32 bytes."""
+    vec = np.asarray(vector, dtype='<f4')
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec = vec / norm
+    return vec.astype('<f4').tobytes()
+
+def unpack_embeddings(blobs: List[bytes]) -> np.ndarray:
+    """Stack packed embeddings into an (n, dim) float32 matrix."""
+    if not blobs:
+        return np.zeros((0, 0), dtype=np.float32)
+    buf = b''.join(bytes(b) for b in blobs)
+    return np.frombuffer(buf, dtype='<f4').reshape(len(blobs), -1)
+
+def embed_packed(texts: List[str]) -> List[bytes]:
+    """Packed embeddings for ``texts``; only texts missing from the shared cache hit the API."""
+    return cached_embeddings(EMBED_MODEL, texts, lambda misses: [pack_embedding(e) for e in embed_text(misses)])
+
+async def aembed_packed(texts: List[str]) -> List[bytes]:
+    async def embed_many(misses: List[str]) -> List[bytes]:
+        return [pack_embedding(e) for e in await aembed_text(misses)]
+    return await acached_embeddings(EMBED_MODEL, texts, embed_many)
+
+def _as_chunk(item: Union[Chunk, Dict, str]) -> Chunk:
+    """Accept a parsing.Chunk, its dict form (job payloads) or a bare string."""
+    if isinstance(item, Chunk):
+        return item
+    if isinstance(item, dict):
+        return Chunk(**item)
+    return Chunk(item, '', None, None, 0)
+
+def _embed_batch(texts: List[str]) -> List[bytes]:
+    try:
+        return embed_packed(texts)
+    finally:
+        connection.close()
+
+def embed_stream(texts: Iterable[str], batch_size: int = EMBED_STREAM_BATCH) -> List[bytes]:
+    """embed_packed over a lazily produced sequence: each full batch is sent while the producer keeps going."""
+    futures, batch = [], []
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= batch_size:
+            futures.append(_embed_pool.submit(in_context(_embed_batch), batch))
+            batch = []
+    tail = embed_packed(batch) if batch else []
+    return [emb for f in futures for emb in f.result()] + tail
+
+@traced('store_chunks')
+def store_documents(session: Session, documents: Dict[str, Iterable[Union[Chunk, Dict, str]]],
+                    embedded: Optional[Dict[str, List[bytes]]] = None) -> int:
+    """Embed and store the chunks of several documents (doc_type -> chunks) for a session.
+
+    Only documents without stored chunks are embedded; the streams of the others are never
+    consumed. Chunks may be a generator (see parsing.iter_chunks); embedding starts as soon
+    as a batch is ready. Rows are written with a single bulk INSERT inside one transaction.
+    ``embedded`` supplies already-packed vectors for some doc_types (e.g. a JD shared by a
+    batch). Returns the number of rows written.
+    """
+    documents = _unchunked(session, documents)
+    if not documents:
+        return 0
+    embedded = embedded or {}
+    rows: List[Tuple[str, int, Chunk]] = []
+
+    def pending():
+        for doc_type, chunks in documents.items():
+            for i, item in enumerate(chunks):
+                chunk = _as_chunk(item)
+                rows.append((doc_type, i, chunk))
+                if doc_type not in embedded:
+                    yield chunk.text
+
+    fresh = iter(embed_stream(pending()))
+    embeddings = [embedded[doc_type][i] if doc_type in embedded else next(fresh) for doc_type, i, _ in rows]
+    return _write_chunks(session, set(documents), rows, embeddings)
+
+@traced('store_chunks')
+async def astore_documents(session: Session, documents: Dict[str, Iterable[Union[Chunk, Dict, str]]]) -> int:
+    """store_documents for the async views: chunking runs in a worker thread, then all batches embed concurrently."""
+    documents = await sync_to_async(_unchunked)(session, documents)
+    if not documents:
+        return 0
+    rows = await sync_to_async(_collect_rows, thread_sensitive=False)(documents)
+    texts = [chunk.text for _, _, chunk in rows]
+    batches = await asyncio.gather(*(aembed_packed(texts[i:i + EMBED_STREAM_BATCH]) for i in range(0, len(texts), EMBED_STREAM_BATCH)))
+    return await sync_to_async(_write_chunks)(session, set(documents), rows, [emb for batch in batches for emb in batch])
+
+def _unchunked(session: Session, documents: Dict[str, Iterable]) -> Dict[str, Iterable]:
+    """The entries of ``documents`` whose Document has no stored chunks yet."""
+    pending = unchunked_types(session)
+    return {doc_type: chunks for doc_type, chunks in documents.items() if doc_type in pending}
+
+def _collect_rows(documents: Dict[str, Iterable[Union[Chunk, Dict, str]]]) -> List[Tuple[str, int, Chunk]]:
+    return [(doc_type, i, _as_chunk(item)) for doc_type, chunks in documents.items() for i, item in enumerate(chunks)]
+
+def _write_chunks(session: Session, doc_types: Set[str], rows: List[Tuple[str, int, Chunk]], embeddings: List[bytes]) -> int:
+    with transaction.atomic():
+        # Locked and re-checked: a concurrent upload of the same file may have stored them first.
+        open_docs = {d.doc_type: d for d in Document.objects.select_for_update().filter(
+            id__in=session.document_ids, doc_type__in=doc_types, chunk_count__isnull=True)}
+        created = ResumeChunk.objects.bulk_create([
+            ResumeChunk(document=open_docs[doc_type], doc_type=doc_type, index=i, text=chunk.text, embedding=emb,
+                        section=chunk.section[:100], char_start=chunk.start, char_end=chunk.end,
+                        terms=term_counts(chunk.text))
+            for (doc_type, i, chunk), emb in zip(rows, embeddings) if doc_type in open_docs
+        ])
+        for doc_type, document in open_docs.items():
+            Document.objects.filter(id=document.id).update(chunk_count=sum(c.doc_type == doc_type for c in created))
+        # bulk_create bypasses post_save, so drop any cached matrix of the sessions using these documents.
+        transaction.on_commit(lambda: _invalidate_sessions([d.id for d in open_docs.values()]))
+        transaction.on_commit(lambda: index_chunks(created))
+        transaction.on_commit(lambda: _mirror_segments(open_docs.values(), created))
+    return len(created)
+
+def _invalidate_sessions(document_ids: List):
+    for session_id in sessions_using(document_ids):
+        session_vectors.invalidate(session_id)
+        session_lexical.invalidate(session_id)
+
+def _mirror_segments(documents: Iterable[Document], created: List[ResumeChunk]):
+    # A document's chunks are all written in one call, so ``created`` covers each of them fully.
+    for document in documents:
+        store_document_segment(document.id, [c for c in created if c.document_id == document.id])
 
 def store_chunks(session: Session, chunks: List[str], doc_type: str = 'resume'):
-    if not chunks:
-        return
-    embeddings = embed_text(chunks)
-    for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-        ResumeChunk.objects.create(session=session, doc_type=doc_type, index=i, text=chunk, embedding=emb)
+    store_documents(session, {doc_type: chunks})
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     if not np.any(a) or not np.any(b):
         return 0.0
     return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
 
-def retrieve(session: Session, question: str, top_k: int = 6, per_doc_k: int = 3) -> List[Dict]:
-    """Retrieve relevant chunks from BOTH resume and job description.
+def load_session_vectors(session: Session) -> Tuple[np.ndarray, np.ndarray, List[Tuple[int, str]]]:
+    """Return (normalized matrix, doc_type array, [(chunk_index, text, section), ...]) for a session.
 
-    per_doc_k ensures we don't accidentally return only resume chunks when the question
-    is about job requirements (or vice versa).
+    When both documents are mirrored in the segment store the matrix stacks their memmap slices
+    without copying them (see vector_cache.StackedMatrix) and the embedding column is not read;
+    otherwise rows are unpacked from the database. Either way the JD rows come first, then the
+    resume rows.
     """
-    q_emb = embed_text([question])[0]
-    chunks = list(session.chunks.all())
-    q_vec = np.array(q_emb)
+    located = [segment_store.matrix(d) for d in (session.jd_document_id, session.resume_document_id)] if SEGMENT_STORE_ENABLED else [None]
+    if all(loc is not None for loc in located):
+        chunk_ids = [cid for loc in located for cid in loc[1]]
+        by_id = {r[0]: r[1:] for r in session.chunks.values_list('id', 'index', 'doc_type', 'text', 'section')}
+        if len(by_id) == len(chunk_ids) and all(cid in by_id for cid in chunk_ids):
+            doc_types = np.array([by_id[cid][1] or 'resume' for cid in chunk_ids], dtype=object)
+            meta = [(by_id[cid][0], by_id[cid][2], by_id[cid][3]) for cid in chunk_ids]
+            return StackedMatrix([loc[0] for loc in located]), doc_types, meta
+    rows = list(session.chunks.order_by('doc_type', 'index').values_list('index', 'doc_type', 'text', 'section', 'embedding'))
+    matrix = unpack_embeddings([r[4] for r in rows])
+    doc_types = np.array([r[1] or 'resume' for r in rows], dtype=object)
+    meta = [(r[0], r[2], r[3]) for r in rows]
+    return matrix, doc_types, meta
 
-    scored_by_doc: Dict[str, List] = {}
-    for c in chunks:
-        c_vec = np.array(c.embedding)
-        sim = cosine_similarity(q_vec, c_vec)
-        scored_by_doc.setdefault(getattr(c, 'doc_type', 'resume') or 'resume', []).append((sim, c))
+def _top_indices(scores: np.ndarray, idx: np.ndarray, k: int) -> np.ndarray:
+    """Unordered indices (from ``idx``) of the ``k`` highest scores, via argpartition."""
+    k = min(k, len(idx))
+    if k <= 0:
+        return idx[:0]
+    if k == len(idx):
+        return idx
+    return idx[np.argpartition(-scores[idx], k - 1)[:k]]
 
-    # Sort each doc bucket
-    for doc_type in scored_by_doc:
-        scored_by_doc[doc_type].sort(key=lambda x: x[0], reverse=True)
+def select_top(scores: np.ndarray, doc_types: np.ndarray, top_k: int, per_doc_k: int) -> List[int]:
+    """Pick row indices by score with a per-doc_type quota, filling leftovers by best score.
 
+    Every doc_type contributes its best ``per_doc_k`` rows first (sorted by score); if that
+    yields fewer than ``top_k`` rows the best remaining rows of any doc_type are appended.
+    """
+    n = len(scores)
+    if n == 0 or top_k <= 0:
+        return []
     picked = []
-    leftovers = []
-    for doc_type, scored in scored_by_doc.items():
-        picked.extend(scored[:per_doc_k])
-        leftovers.extend(scored[per_doc_k:])
-
-    # If we still need more, fill by best remaining irrespective of doc_type
-    picked.sort(key=lambda x: x[0], reverse=True)
-    if len(picked) < top_k and leftovers:
-        leftovers.sort(key=lambda x: x[0], reverse=True)
-        picked.extend(leftovers[: max(0, top_k - len(picked))])
-    picked = picked[:top_k]
+    taken = np.zeros(n, dtype=bool)
+    for doc_type in dict.fromkeys(doc_types.tolist()):
+        best = _top_indices(scores, np.flatnonzero(doc_types == doc_type), per_doc_k)
+        picked.extend(best.tolist())
+        taken[best] = True
+    picked.sort(key=lambda i: scores[i], reverse=True)
+    if len(picked) < top_k:
+        fill = _top_indices(scores, np.flatnonzero(~taken), top_k - len(picked))
+        picked.extend(sorted(fill.tolist(), key=lambda i: scores[i], reverse=True))
+    return picked[:top_k]
+
+def embed_question(question: str) -> np.ndarray:
+    return np.frombuffer(embed_packed([question])[0], dtype='<f4')
+
+async def aembed_question(question: str) -> np.ndarray:
+    return np.frombuffer((await aembed_packed([question]))[0], dtype='<f4')
+
+def load_lexical_index(session: Session, doc_types: np.ndarray, meta: List[Tuple[int, str, str]]) -> LexicalIndex:
+    """BM25 index over a session's chunks, rows aligned with load_session_vectors.
+
+    Term counts are stored with each chunk at write time; chunks written before that are
+    tokenized here.
+    """
+    counts = {(d or 'resume', i): t for d, i, t in session.chunks.values_list('doc_type', 'index', 'terms')}
+    keys = [(doc_types[row], m[0]) for row, m in enumerate(meta)]
+    docs = [counts.get(key) if counts.get(key) is not None else term_counts(m[1]) for key, m in zip(keys, meta)]
+    return LexicalIndex(docs)
+
+def rrf_fuse(rankings: List[np.ndarray], n: int, k: int = RRF_K) -> np.ndarray:
+    """Reciprocal rank fusion: each ranking (row indices, best first) adds 1 / (k + rank)."""
+    fused = np.zeros(n)
+    for order in rankings:
+        fused[order] += 1.0 / (k + np.arange(1, len(order) + 1))
+    return fused
+
+@traced('retrieve')
+def retrieve(session: Session, question: str, top_k: int = 6, per_doc_k: int = 3, q_vec: Optional[np.ndarray] = None,
+             mode: str = RETRIEVAL_MODE) -> List[Dict]:
+    """Retrieve relevant chunks from BOTH resume and job description.
+
+    per_doc_k ensures we don't accidentally return only resume chunks when the question
+    is about job requirements (or vice versa). In 'hybrid' mode the dense ranking is fused
+    with a BM25 ranking (chunks containing a question term) before the quotas are applied,
+    so exact terms such as tool names are found even when the embedding misses them. ``score``
+    stays the cosine similarity in both modes; hybrid results add ``rrf_score`` (their rank) and
+    ``lexical_score``.
+    """
+    if q_vec is None:
+        q_vec = embed_question(question)
+    matrix, doc_types, meta = session_vectors.get_or_load(session.id, lambda: load_session_vectors(session))
+    if not meta:
+        return []
+    dense = matrix @ q_vec
+    scores, lexical = dense, None
+    if mode == 'hybrid':
+        index = session_lexical.get_or_load(session.id, lambda: load_lexical_index(session, doc_types, meta))
+        if len(index) != len(meta):  # cached from before the session's latest chunks
+            index = load_lexical_index(session, doc_types, meta)
+        lexical = index.scores(terms(question))
+        hits = np.flatnonzero(lexical > 0)
+        scores = rrf_fuse([np.argsort(-dense, kind='stable'), hits[np.argsort(-lexical[hits], kind='stable')]], len(meta))
 
     results = []
-    for sim, c in picked:
-        snippet = c.text[:400]
-        results.append({
-            'chunk_index': c.index,
-            'doc_type': getattr(c, 'doc_type', 'resume') or 'resume',
-            'text': snippet,
-            'score': sim,
-        })
+    for i in select_top(scores, doc_types, top_k, per_doc_k):
+        chunk_index, text, section = meta[i]
+        result = {
+            'chunk_index': chunk_index,
+            'doc_type': doc_types[i],
+            'section': section,
+            'text': text,
+            'score': float(dense[i]),
+        }
+        if lexical is not None:
+            result.update(rrf_score=float(scores[i]), lexical_score=float(lexical[i]))
+        results.append(result)
     return results
 
-def generate_answer(session: Session, question: str, retrieved: List[Dict]) -> str:
-    history = list(session.messages.order_by('-created_at')[:6])
-    history_messages = []
-    for m in reversed(history):
-        if m.role == 'user':
-            history_messages.append({'role': 'user', 'content': m.question})
-        else:
-            history_messages.append({'role': 'assistant', 'content': m.answer})
+async def aretrieve(session: Session, question: str, top_k: int = 6, per_doc_k: int = 3, q_vec: Optional[np.ndarray] = None,
+                    mode: str = RETRIEVAL_MODE) -> List[Dict]:
+    """retrieve with the question embedded asynchronously; the ranking itself is local work on a worker thread."""
+    if q_vec is None:
+        q_vec = await aembed_question(question)
+    return await sync_to_async(retrieve)(session, question, top_k, per_doc_k, q_vec, mode)
 
-    resume_ctx = [r for r in retrieved if r.get('doc_type') == 'resume']
-    jd_ctx = [r for r in retrieved if r.get('doc_type') == 'job_description']
-    other_ctx = [r for r in retrieved if r.get('doc_type') not in ('resume', 'job_description')]
+SOURCE_PREVIEW_CHARS = 400
+CHAT_INSTRUCTIONS = (
+    "Instructions:\n"
+    "- Compare resume vs job requirements when asked about fit\n"
+    "- Be concrete (skills/years/projects/tools)\n"
+    "- If the question is about 'gaps', name gaps relative to the job description\n"
+    "- Keep answers concise but useful (3-6 sentences)\n"
+)
+CHUNK_LABEL = '[Chunk 0 | score=0.000]\n\n'  # stands in for each chunk's label when counting tokens
 
-    def _block(title: str, items: List[Dict]) -> str:
-        if not items:
-            return f"{title}:\n(none)"
-        return title + ":\n" + "\n\n".join(
-            [f"[Chunk {i+1} | score={r['score']:.3f}]\n{r['text'][:1500]}" for i, r in enumerate(items)]
-        )
+def build_chat_messages(session: Session, question: str, retrieved: List[Dict], model: str = CHAT_MODEL) -> List[Dict]:
+    """Chat prompt packed into the model's token budget.
 
-    match_block = (
+    Priority: instructions and the question, then the match analysis, then retrieved chunks
+    by rank, then the conversation memory (summary, then the verbatim tail newest first).
+    Lower-priority parts are cut or dropped first.
+    """
+    packer = PromptPacker(model)
+    intro = (
+        "You are an expert recruiter assistant. You must answer using BOTH: (1) the candidate's resume and "
+        "(2) the job description.\n\n"
+        "Use the retrieved context below. If a claim is not supported by the retrieved context, say you don't have enough evidence.\n\n"
+    )
+    titles = ['RELEVANT JOB DESCRIPTION CONTEXT', 'RELEVANT RESUME CONTEXT', 'OTHER CONTEXT']
+    packer.require(intro + CHAT_INSTRUCTIONS + 'MATCH ANALYSIS (precomputed):\n' + ':\n(none)\n\n'.join(titles), message=True)
+    packer.require(question, message=True)
+
+    match_block = packer.add((
         f"Match Score: {session.match_score if session.match_score is not None else 'N/A'}\n"
         f"Strengths: {session.strengths or []}\n"
         f"Gaps: {session.gaps or []}\n"
         f"Insights: {session.insights or ''}"
-    )
+    ), truncate=True) or '(omitted)'
 
+    kept = {}
+    for pos, r in sorted(enumerate(retrieved), key=lambda p: p[1].get('rrf_score', p[1]['score']), reverse=True):
+        label_tokens = count_tokens(CHUNK_LABEL, model)
+        text = packer.add(r['text'], truncate=True, min_tokens=48, max_tokens=packer.remaining - label_tokens)
+        if text is not None:
+            packer.require(CHUNK_LABEL)
+            kept[pos] = text
+    context = [{**r, 'text': kept[pos]} for pos, r in enumerate(retrieved) if pos in kept]
+
+    summary, pending, tail = memory.recall(session)
+    memory_block = ''
+    if summary or pending:
+        asked = ('Asked since: ' + '; '.join(pending)) if pending else ''
+        memory_block = packer.add(
+            'CONVERSATION SO FAR (summary of earlier turns):\n' + '\n'.join(p for p in (summary, asked) if p) + '\n\n',
+            truncate=True) or ''
+    history_messages = []
+    for m in reversed(tail):
+        answer = packer.add(memory.tail_answer(m, model), message=True)
+        if answer is None or packer.add(m.question, message=True) is None:
+            break
+        history_messages[:0] = [{'role': 'user', 'content': m.question}, {'role': 'assistant', 'content': answer}]
+
+    def _block(title: str, items: List[Dict]) -> str:
+        if not items:
+            return f"{title}:\n(none)"
+        return title + ":\n" + "\n\n".join(
+            [f"[Chunk {i+1} | score={r['score']:.3f}]\n{r['text']}" for i, r in enumerate(items)]
+        )
+
+    resume_ctx = [r for r in context if r.get('doc_type') == 'resume']
+    jd_ctx = [r for r in context if r.get('doc_type') == 'job_description']
+    other_ctx = [r for r in context if r.get('doc_type') not in ('resume', 'job_description')]
     system_prompt = (
-        "You are an expert recruiter assistant. You must answer using BOTH: (1) the candidate's resume and "
-        "(2) the job description.\n\n"
-        "Use the retrieved context below. If a claim is not supported by the retrieved context, say you don't have enough evidence.\n\n"
+        intro +
         "MATCH ANALYSIS (precomputed):\n"
         f"{match_block}\n\n"
-        f"{_block('RELEVANT JOB DESCRIPTION CONTEXT', jd_ctx)}\n\n"
-        f"{_block('RELEVANT RESUME CONTEXT', resume_ctx)}\n\n"
-        f"{_block('OTHER CONTEXT', other_ctx)}\n\n"
-        "Instructions:\n"
-        "- Compare resume vs job requirements when asked about fit\n"
-        "- Be concrete (skills/years/projects/tools)\n"
-        "- If the question is about 'gaps', name gaps relative to the job description\n"
-        "- Keep answers concise but useful (3-6 sentences)\n"
+        f"{_block(titles[0], jd_ctx)}\n\n"
+        f"{_block(titles[1], resume_ctx)}\n\n"
+        f"{_block(titles[2], other_ctx)}\n\n" +
+        memory_block +
+        CHAT_INSTRUCTIONS
     )
+    packer.log('Chat', session=session.id, chunks=f'{len(context)}/{len(retrieved)}',
+               summary=f'{count_tokens(memory_block, model) if memory_block else 0} tokens',
+               history=f'{len(history_messages) // 2}/{len(tail)} turns + {len(pending)} questions', dropped=packer.dropped)
+    memory.prompt_tokens.observe(packer.used, 'memory' if memory.CHAT_MEMORY_ENABLED else 'window')
     messages = [{'role': 'system', 'content': system_prompt}] + history_messages + [
         {'role': 'user', 'content': question}
     ]
-    client = get_client()
-    resp = client.chat.completions.create(model=CHAT_MODEL, messages=messages, temperature=0.2)
+    return messages
+
+@traced('generate_answer')
+def generate_answer(session: Session, question: str, retrieved: List[Dict]) -> str:
+    messages = build_chat_messages(session, question, retrieved)
+    resp = gateway.chat(CHAT_MODEL, messages, temperature=0.2)
     return resp.choices[0].message.content.strip()
 
-def answer_question(session: Session, question: str) -> Dict:
-    ChatMessage.objects.create(session=session, role='user', question=question, answer='')
-    retrieved = retrieve(session, question)
-    answer = generate_answer(session, question, retrieved)
-    msg = ChatMessage.objects.create(session=session, role='assistant', question=question, answer=answer, retrieved_chunks=retrieved)
-    sources = [
+@traced('generate_answer')
+def stream_answer_tokens(session: Session, question: str, retrieved: List[Dict]) -> Iterator[str]:
+    """Like generate_answer, but yields content deltas as the model produces them."""
+    messages = build_chat_messages(session, question, retrieved)
+    for event in gateway.chat_stream(CHAT_MODEL, messages, temperature=0.2):
+        if not event.choices:
+            continue
+        delta = event.choices[0].delta.content
+        if delta:
+            yield delta
+
+@traced('generate_answer')
+async def agenerate_answer(session: Session, question: str, retrieved: List[Dict]) -> str:
+    messages = await sync_to_async(build_chat_messages)(session, question, retrieved)
+    resp = await gateway.achat(CHAT_MODEL, messages, temperature=0.2)
+    return resp.choices[0].message.content.strip()
+
+@traced('generate_answer')
+async def astream_answer_tokens(session: Session, question: str, retrieved: List[Dict]) -> AsyncIterator[str]:
+    messages = await sync_to_async(build_chat_messages)(session, question, retrieved)
+    async for event in gateway.achat_stream(CHAT_MODEL, messages, temperature=0.2):
+        if not event.choices:
+            continue
+        delta = event.choices[0].delta.content
+        if delta:
+            yield delta
+
+def format_sources(retrieved: List[Dict]) -> List[Dict]:
+    return [
         {
             'chunk_index': r['chunk_index'],
             'doc_type': r.get('doc_type', 'resume'),
+            'section': r.get('section', ''),
             'score': round(r['score'], 4),
-            'preview': r['text']
+            **({'rrf_score': round(r['rrf_score'], 4)} if 'rrf_score' in r else {}),
+            'preview': r['text'][:SOURCE_PREVIEW_CHARS]
         } for r in retrieved
     ]
+
+def _for_storage(retrieved: List[Dict]) -> List[Dict]:
+    """Retrieved chunks as persisted with a cached answer: previews, not full text."""
+    return [{**r, 'text': r['text'][:SOURCE_PREVIEW_CHARS]} for r in retrieved]
+
+def source_refs(retrieved: List[Dict]) -> List[list]:
+    """Retrieved chunks as persisted with a ChatMessage: [doc_type, chunk_index, score] per chunk.
+
+    (doc_type, chunk_index) identifies the chunk within the message's session, so answers
+    served from the cross-session answer cache resolve against the asking session's chunks.
+    """
+    return [[r.get('doc_type') or 'resume', r['chunk_index'], round(r['score'], 4)] for r in retrieved]
+
+def resolve_sources(session: Session, messages: Iterable[ChatMessage]) -> Dict[Tuple[str, int], Tuple[str, str]]:
+    """{(doc_type, chunk_index): (section, text)} for every chunk the messages reference, in one query."""
+    indices = {ref[1] for m in messages for ref in m.sources}
+    if not indices:
+        return {}
+    rows = session.chunks.filter(index__in=indices).values_list('doc_type', 'index', 'section', 'text')
+    return {(d or 'resume', i): (section, text) for d, i, section, text in rows}
+
+def answer_question(session: Session, question: str, retrieval: str = RETRIEVAL_MODE) -> Dict:
+    ChatMessage.objects.create(session=session, role='user', question=question, answer='')
+    q_vec = embed_question(question)
+    cached = answer_cache.lookup(session, q_vec, EMBED_MODEL, retrieval)
+    if cached is not None:
+        answer, retrieved = cached.answer, cached.retrieved_chunks
+    else:
+        retrieved = retrieve(session, question, q_vec=q_vec, mode=retrieval)
+        answer = generate_answer(session, question, retrieved)
+        retrieved = _for_storage(retrieved)
+        answer_cache.store(session, question, q_vec, EMBED_MODEL, retrieval, answer, retrieved)
+    msg = ChatMessage.objects.create(session=session, role='assistant', question=question, answer=answer, sources=source_refs(retrieved))
+    memory.schedule(session)
+    return {
+        'answer': answer,
+        'sources': format_sources(retrieved),
+        'message_id': msg.id,
+        'cached': cached is not None,
+    }
+
+async def aanswer_question(session: Session, question: str, retrieval: str = RETRIEVAL_MODE) -> Dict:
+    """answer_question for the async views: same messages, cache and response, awaiting the API calls."""
+    await ChatMessage.objects.acreate(session=session, role='user', question=question, answer='')
+    q_vec = await aembed_question(question)
+    cached = await sync_to_async(answer_cache.lookup)(session, q_vec, EMBED_MODEL, retrieval)
+    if cached is not None:
+        answer, retrieved = cached.answer, cached.retrieved_chunks
+    else:
+        retrieved = await aretrieve(session, question, q_vec=q_vec, mode=retrieval)
+        answer = await agenerate_answer(session, question, retrieved)
+        retrieved = _for_storage(retrieved)
+        await sync_to_async(answer_cache.store)(session, question, q_vec, EMBED_MODEL, retrieval, answer, retrieved)
+    msg = await ChatMessage.objects.acreate(session=session, role='assistant', question=question, answer=answer, sources=source_refs(retrieved))
+    memory.schedule(session)
     return {
         'answer': answer,
-        'sources': sources,
-        'message_id': msg.id
+        'sources': format_sources(retrieved),
+        'message_id': msg.id,
+        'cached': cached is not None,
     }
+
+def stream_answer(session: Session, question: str, retrieval: str = RETRIEVAL_MODE) -> Iterator[Tuple[str, Dict]]:
+    """Streaming counterpart of answer_question yielding (event, data) pairs.
+
+    Emits 'sources' right after retrieval, then one 'token' per content delta, and finally
+    'done' once the assistant ChatMessage has been stored exactly as answer_question would.
+    """
+    ChatMessage.objects.create(session=session, role='user', question=question, answer='')
+    q_vec = embed_question(question)
+    cached = answer_cache.lookup(session, q_vec, EMBED_MODEL, retrieval)
+    if cached is not None:
+        retrieved = cached.retrieved_chunks
+        yield 'sources', {'sources': format_sources(retrieved)}
+        answer = cached.answer
+        yield 'token', {'text': answer}
+    else:
+        retrieved = retrieve(session, question, q_vec=q_vec, mode=retrieval)
+        yield 'sources', {'sources': format_sources(retrieved)}
+        parts = []
+        for delta in stream_answer_tokens(session, question, retrieved):
+            parts.append(delta)
+            yield 'token', {'text': delta}
+        answer = ''.join(parts).strip()
+        retrieved = _for_storage(retrieved)
+        answer_cache.store(session, question, q_vec, EMBED_MODEL, retrieval, answer, retrieved)
+    msg = ChatMessage.objects.create(session=session, role='assistant', question=question, answer=answer, sources=source_refs(retrieved))
+    memory.schedule(session)
+    yield 'done', {'message_id': msg.id, 'answer': answer, 'cached': cached is not None}
+
+async def astream_answer(session: Session, question: str, retrieval: str = RETRIEVAL_MODE) -> AsyncIterator[Tuple[str, Dict]]:
+    """Async counterpart of stream_answer, yielding the same events."""
+    await ChatMessage.objects.acreate(session=session, role='user', question=question, answer='')
+    q_vec = await aembed_question(question)
+    cached = await sync_to_async(answer_cache.lookup)(session, q_vec, EMBED_MODEL, retrieval)
+    if cached is not None:
+        retrieved = cached.retrieved_chunks
+        yield 'sources', {'sources': format_sources(retrieved)}
+        answer = cached.answer
+        yield 'token', {'text': answer}
+    else:
+        retrieved = await aretrieve(session, question, q_vec=q_vec, mode=retrieval)
+        yield 'sources', {'sources': format_sources(retrieved)}
+        parts = []
+        async for delta in astream_answer_tokens(session, question, retrieved):
+            parts.append(delta)
+            yield 'token', {'text': delta}
+        answer = ''.join(parts).strip()
+        retrieved = _for_storage(retrieved)
+        await sync_to_async(answer_cache.store)(session, question, q_vec, EMBED_MODEL, retrieval, answer, retrieved)
+    msg = await ChatMessage.objects.acreate(session=session, role='assistant', question=question, answer=answer, sources=source_refs(retrieved))
+    memory.schedule(session)
+    yield 'done', {'message_id': msg.id, 'answer': answer, 'cached': cached is not None}
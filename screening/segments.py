@@ -0,0 +1,228 @@
+"""Append-only, memory-mapped segment store for per-document chunk embeddings.
+
+Layout under SEGMENT_STORE_DIR:
+
+    CURRENT                  generation number of the live manifest
+    manifest-<gen>.jsonl     one JSON line per event:
+                             {"session", "segment", "offset", "rows", "dim", "chunk_ids"} or
+                             {"session", "deleted": true}
+                             ("session" holds the Document id; the field name predates documents)
+    seg-<gen>-<n>.f32        raw little-endian float32 rows, appended in manifest order
+
+Every gunicorn worker memory-maps the same segment files, so document matrices live once
+in the OS page cache and ``matrix`` returns a zero-copy slice. Writers append under an
+exclusive file lock; readers only consume complete manifest lines. ``compact`` rewrites
+live documents into a new generation, dropping deleted ones.
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from django.conf import settings
+from .storage import atomic_write_text, file_lock
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_STORE_ENABLED = os.environ.get('SEGMENT_STORE_ENABLED', 'true').lower() == 'true'
+SEGMENT_STORE_DIR = os.environ.get('SEGMENT_STORE_DIR', str(Path(settings.BASE_DIR) / 'var' / 'segments'))
+SEGMENT_MAX_BYTES = int(os.environ.get('SEGMENT_MAX_BYTES', str(64 * 1024 * 1024)))
+
+
+class SegmentStore:
+    def __init__(self, directory: str = SEGMENT_STORE_DIR, max_segment_bytes: int = SEGMENT_MAX_BYTES):
+        self.dir = Path(directory)
+        self.max_segment_bytes = max_segment_bytes
+        self._lock = threading.Lock()
+        self._reset_view(-1)
+
+    def _reset_view(self, generation: int):
+        self.generation = generation
+        self._manifest_pos = 0
+        self._locations: Dict[str, Dict] = {}
+        self._maps: Dict[int, np.memmap] = {}
+        self._segment_rows: Dict[int, int] = {}
+        self._segment_dim: Dict[int, int] = {}
+
+    def _path(self, name: str) -> Path:
+        return self.dir / name
+
+    def _current_generation(self) -> int:
+        try:
+            return int(self._path('CURRENT').read_text().strip())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    # -- manifest ----------------------------------------------------------------------
+    def refresh(self):
+        """Apply manifest lines appended (by any process) since the last call."""
+        gen = self._current_generation()
+        if gen != self.generation:
+            self._reset_view(gen)
+        path = self._path(f'manifest-{gen}.jsonl')
+        if not path.exists():
+            return
+        with open(path, 'rb') as fh:
+            fh.seek(self._manifest_pos)
+            data = fh.read()
+        end = data.rfind(b'\n')
+        if end < 0:
+            return
+        for line in data[:end].splitlines():
+            self._apply(json.loads(line))
+        self._manifest_pos += end + 1
+
+    def _apply(self, record: Dict):
+        if record.get('deleted'):
+            self._locations.pop(record['session'], None)
+            return
+        self._locations[record['session']] = record
+        seg = record['segment']
+        self._segment_rows[seg] = max(self._segment_rows.get(seg, 0), record['offset'] + record['rows'])
+        self._segment_dim[seg] = record['dim']
+
+    def _append_manifest(self, record: Dict):
+        with open(self._path(f'manifest-{self.generation}.jsonl'), 'a') as fh:
+            fh.write(json.dumps(record) + '\n')
+
+    # -- reads -------------------------------------------------------------------------
+    def _segment_map(self, seg: int, dim: int) -> np.memmap:
+        rows = self._segment_rows[seg]
+        mapped = self._maps.get(seg)
+        if mapped is None or len(mapped) < rows:
+            mapped = np.memmap(self._path(f'seg-{self.generation}-{seg}.f32'), dtype='<f4', mode='r', shape=(rows, dim))
+            self._maps[seg] = mapped
+        return mapped
+
+    def matrix(self, document_id) -> Optional[Tuple[np.ndarray, List[int]]]:
+        """(read-only memmap slice, chunk ids in row order) for a document, or None if not stored."""
+        key = str(document_id)
+        with self._lock:
+            self.refresh()
+            loc = self._locations.get(key)
+            if loc is None:
+                return None
+            mapped = self._segment_map(loc['segment'], loc['dim'])
+            return mapped[loc['offset']:loc['offset'] + loc['rows']], list(loc['chunk_ids'])
+
+    def __contains__(self, document_id) -> bool:
+        with self._lock:
+            self.refresh()
+            return str(document_id) in self._locations
+
+    # -- writes ------------------------------------------------------------------------
+    def _tail_segment(self, dim: int) -> Tuple[int, int]:
+        """(segment number, row offset) where the next rows of ``dim`` floats go."""
+        if not self._segment_rows:
+            return 0, 0
+        seg = max(self._segment_rows)
+        path = self._path(f'seg-{self.generation}-{seg}.f32')
+        size = path.stat().st_size if path.exists() else 0
+        # Start a new segment when full, when the dimension changes (new embedding model) or
+        # when a crashed writer left a partial row behind.
+        if size >= self.max_segment_bytes or self._segment_dim[seg] != dim or size % (4 * dim):
+            return seg + 1, 0
+        return seg, size // (4 * dim)
+
+    def append(self, document_id, chunk_ids: Sequence[int], vectors: np.ndarray):
+        """Store a document's rows; a later append for the same document supersedes the earlier one."""
+        if len(vectors) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype='<f4')
+        dim = vectors.shape[1]
+        with self._lock, file_lock(self.dir):
+            self.refresh()
+            if not self._path('CURRENT').exists():
+                atomic_write_text(self._path('CURRENT'), str(self.generation))
+            seg, offset = self._tail_segment(dim)
+            with open(self._path(f'seg-{self.generation}-{seg}.f32'), 'ab') as fh:
+                fh.write(vectors.tobytes())
+            record = {'session': str(document_id), 'segment': seg, 'offset': offset, 'rows': len(vectors),
+                      'dim': dim, 'chunk_ids': [int(c) for c in chunk_ids]}
+            self._append_manifest(record)
+            self.refresh()
+
+    def delete(self, document_id):
+        with self._lock, file_lock(self.dir):
+            self.refresh()
+            if str(document_id) in self._locations:
+                self._append_manifest({'session': str(document_id), 'deleted': True})
+                self.refresh()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self.refresh()
+            return self.stats_unlocked()
+
+    def compact(self, keep: Optional[Set[str]] = None) -> Dict:
+        """Rewrite live documents into a fresh generation and drop superseded/deleted rows.
+
+        ``keep`` (ids as strings) additionally drops entries for anything not in it, e.g.
+        documents deleted while the store was unreachable or pre-document session entries.
+        """
+        with self._lock, file_lock(self.dir):
+            self.refresh()
+            old_gen = self.generation
+            old_maps = {seg: self._segment_map(seg, dim) for seg, dim in self._segment_dim.items()}
+            live = sorted((loc for key, loc in self._locations.items() if keep is None or key in keep),
+                          key=lambda loc: (loc['segment'], loc['offset']))
+            before = self.stats_unlocked()
+            self._reset_view(old_gen + 1)
+            self._path(f'manifest-{self.generation}.jsonl').touch()
+            for loc in live:
+                rows = old_maps[loc['segment']][loc['offset']:loc['offset'] + loc['rows']]
+                seg, offset = self._tail_segment(loc['dim'])
+                with open(self._path(f'seg-{self.generation}-{seg}.f32'), 'ab') as fh:
+                    fh.write(np.ascontiguousarray(rows).tobytes())
+                record = {**loc, 'segment': seg, 'offset': offset}
+                self._append_manifest(record)
+                self._apply(record)
+            atomic_write_text(self._path('CURRENT'), str(self.generation))
+            self._reset_view(self.generation)
+            self.refresh()
+            # Readers that still map old files keep valid mappings after unlink (POSIX).
+            for path in list(self.dir.glob(f'seg-{old_gen}-*.f32')) + [self._path(f'manifest-{old_gen}.jsonl')]:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            after = self.stats_unlocked()
+            logger.info('Compacted segment store: %s -> %s', before, after)
+            return {'before': before, 'after': after}
+
+    def stats_unlocked(self) -> Dict:
+        live = sum(loc['rows'] * loc['dim'] * 4 for loc in self._locations.values())
+        total = sum(p.stat().st_size for p in self.dir.glob(f'seg-{self.generation}-*.f32')) if self.dir.exists() else 0
+        return {'generation': self.generation, 'documents': len(self._locations), 'segments': len(self._segment_rows),
+                'live_bytes': live, 'total_bytes': total, 'dead_bytes': max(0, total - live)}
+
+
+segment_store = SegmentStore()
+
+
+def store_document_segment(document_id, chunks: Sequence) -> bool:
+    """Mirror a document's freshly written ResumeChunks into the segment store; never raises."""
+    if not SEGMENT_STORE_ENABLED or not chunks:
+        return False
+    ordered = sorted(chunks, key=lambda c: (c.doc_type, c.index))
+    if any(c.pk is None for c in ordered):
+        # Backend couldn't return ids from bulk_create; retrieval falls back to the database.
+        return False
+    try:
+        vectors = np.frombuffer(b''.join(bytes(c.embedding) for c in ordered), dtype='<f4').reshape(len(ordered), -1)
+        segment_store.append(document_id, [c.pk for c in ordered], vectors)
+    except Exception:
+        logger.exception('Failed to append document %s to the segment store', document_id)
+        return False
+    return True
+
+
+def drop_document_segment(document_id):
+    if not SEGMENT_STORE_ENABLED:
+        return
+    try:
+        segment_store.delete(document_id)
+    except Exception:
+        logger.exception('Failed to tombstone document %s in the segment store', document_id)
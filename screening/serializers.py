@@ -1,15 +1,53 @@
 from rest_framework import serializers
-from .models import Session, ChatMessage
+from .models import Session, ChatMessage, UploadJob
+from .rag import RETRIEVAL_MODE, RETRIEVAL_MODES
 
 class SessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Session
-        fields = ['id', 'match_score', 'strengths', 'gaps', 'insights', 'created_at']
+        fields = ['id', 'match_score', 'strengths', 'gaps', 'insights', 'analysis_mode', 'created_at']
 
 class ChatMessageSerializer(serializers.ModelSerializer):
+    """Sources are references; pass ``chunks`` (rag.resolve_sources) in the context to add their section and text."""
+    sources = serializers.SerializerMethodField()
+
     class Meta:
         model = ChatMessage
-        fields = ['id', 'role', 'question', 'answer', 'retrieved_chunks', 'created_at']
+        fields = ['id', 'role', 'question', 'answer', 'sources', 'created_at']
+
+    def get_sources(self, message):
+        chunks = self.context.get('chunks')
+        sources = []
+        for doc_type, index, score in message.sources:
+            source = {'chunk_index': index, 'doc_type': doc_type, 'score': score}
+            if chunks is not None:
+                section, text = chunks.get((doc_type, index), ('', ''))
+                source.update(section=section, text=text)
+            sources.append(source)
+        return sources
 
 class ChatRequestSerializer(serializers.Serializer):
     question = serializers.CharField()
+    retrieval = serializers.ChoiceField(choices=RETRIEVAL_MODES, default=RETRIEVAL_MODE)
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    chat_ready = serializers.SerializerMethodField()
+    analysis = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadJob
+        fields = ['id', 'status', 'stage', 'progress', 'attempts', 'max_attempts', 'error', 'session',
+                  'chat_ready', 'analysis', 'created_at', 'updated_at']
+
+    def get_chat_ready(self, job):
+        return job.progress.get('embed', {}).get('status') == 'done'
+
+    def get_analysis(self, job):
+        if job.session is None or job.progress.get('match', {}).get('status') != 'done':
+            return None
+        return SessionSerializer(job.session).data
+
+class CandidateSearchSerializer(serializers.Serializer):
+    job_description = serializers.CharField()
+    top_k = serializers.IntegerField(min_value=1, max_value=200, default=20)
+    nprobe = serializers.IntegerField(min_value=1, required=False)
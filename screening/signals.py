@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from .documents import sessions_using
+from .models import Document, Session
+from .vector_cache import session_lexical, session_vectors
+from .segments import drop_document_segment
+
+
+def _invalidate(session_id):
+    session_vectors.invalidate(session_id)
+    session_lexical.invalidate(session_id)
+
+
+# Chunks are only written by rag._write_chunks (bulk_create, which invalidates on commit) and removed
+# by deleting their Document, so caches are invalidated once per document rather than per chunk.
+@receiver(pre_delete, sender=Document)
+def invalidate_document_sessions(sender, instance, **kwargs):
+    for session_id in sessions_using([instance.pk]):
+        _invalidate(session_id)
+
+
+@receiver(post_delete, sender=Session)
+def invalidate_session(sender, instance, **kwargs):
+    _invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=Document)
+def drop_document(sender, instance, **kwargs):
+    drop_document_segment(instance.pk)
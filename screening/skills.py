@@ -0,0 +1,76 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Tuple
+
+SKILLS_TAXONOMY_PATH = os.environ.get(
+    'SKILLS_TAXONOMY_PATH', os.path.join(os.path.dirname(__file__), 'data', 'skills.json')
+)
+
+
+class SkillMatch(NamedTuple):
+    skill: str  # canonical name
+    start: int
+    end: int
+    text: str  # as written in the document
+
+
+def load_taxonomy(path: str = SKILLS_TAXONOMY_PATH) -> Dict[str, List[str]]:
+    """{canonical: [synonyms]}. Names containing capitals only match with that exact case ("Go", "ML")."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _trie_pattern(node: Dict) -> str:
+    """Regex for a character trie; longer continuations are tried first."""
+    alternatives = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not alternatives:
+        return ''
+    body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+    return f'(?:{body})?' if '' in node else body
+
+
+class SkillMatcher:
+    """Every skill name and synonym in one character trie, compiled to a single regular expression.
+
+    Shared prefixes are stored once, so the scan is one linear pass over the text regardless
+    of taxonomy size, and it runs inside the C regex engine rather than a Python loop.
+    """
+
+    def __init__(self, taxonomy: Dict[str, List[str]]):
+        self.aliases: Dict[str, List[Tuple[str, str, bool]]] = {}  # lowercased -> (canonical, as written, exact case)
+        trie: Dict = {}
+        for canonical, synonyms in taxonomy.items():
+            for alias in [canonical] + list(synonyms):
+                key = alias.lower()
+                self.aliases.setdefault(key, []).append((canonical.lower(), alias, alias != key))
+                node = trie
+                for ch in key:
+                    node = node.setdefault(ch, {})
+                node[''] = {}
+        self.pattern = re.compile(r'(?<!\w)' + _trie_pattern(trie) + r'(?!\w)', re.IGNORECASE)
+
+    def find(self, text: str) -> List[SkillMatch]:
+        """Non-overlapping whole-word matches, longest alias first, in document order."""
+        matches = []
+        for m in self.pattern.finditer(text):
+            found = m.group(0)
+            for canonical, alias, exact in self.aliases.get(found.lower(), ()):
+                if not exact or found == alias:
+                    matches.append(SkillMatch(canonical, m.start(), m.end(), found))
+                    break
+        return matches
+
+    def skills(self, text: str) -> List[str]:
+        """Canonical skills in order of first mention."""
+        return list(dict.fromkeys(m.skill for m in self.find(text)))
+
+
+@lru_cache(maxsize=1)
+def get_matcher() -> SkillMatcher:
+    return SkillMatcher(load_taxonomy())
+
+
+def find_skills(text: str) -> List[SkillMatch]:
+    return get_matcher().find(text)
@@ -0,0 +1,23 @@
+"""Small helpers for the on-disk stores (ANN index, embedding segments) shared between workers."""
+import fcntl
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def file_lock(directory: Path):
+    """Exclusive inter-process lock on ``directory/.lock`` (created on demand)."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / '.lock', 'a+') as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def atomic_write_text(path: Path, text: str):
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(text)
+    os.replace(tmp, path)
@@ -0,0 +1,333 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest import mock
+import httpx
+import numpy as np
+import openai
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from . import answer_cache, jobs, matching, memory, rag
+from .benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from .documents import create_session
+from .lexical import LexicalScorer, fast_match
+from .llm import LLM_RETRY_MAX_SECONDS, Gateway, _retry_after
+from .models import ChatMessage, Session, UploadJob
+from .rag import rrf_fuse
+
+JD = (
+    "Requirements\n"
+    "Strong Python and Django experience.\n"
+    "Experience with Kubernetes in production.\n"
+    "Good communication with stakeholders."
+)
+
+
+class FastMatchTests(SimpleTestCase):
+    def test_scores_follow_requirement_coverage(self):
+        full = fast_match("Skills\nPython, Django, Kubernetes. Communication with stakeholders.", JD)
+        partial = fast_match("Skills\nPython and Django.", JD)
+        unrelated = fast_match("Skills\nWatercolour painting.", JD)
+        self.assertGreater(full['match_score'], partial['match_score'])
+        self.assertGreater(partial['match_score'], unrelated['match_score'])
+        self.assertEqual(unrelated['match_score'], 0.0)
+        self.assertEqual(full['mode'], 'fast')
+
+    def test_terms_are_ordered_by_weight(self):
+        result = fast_match("Skills\nPython and Django.", JD)
+        self.assertEqual(result['matched_terms'], ['python', 'django'])
+        # Taxonomy skills outweigh ordinary words, so they lead the missing terms too.
+        self.assertEqual(result['missing_terms'][0], 'kubernetes')
+        self.assertEqual(set(result['missing_terms']), {'kubernetes', 'communication', 'production', 'stakeholders'})
+        self.assertFalse(fast_match('', JD)['matched_terms'])
+
+    def test_gaps_list_least_covered_requirements(self):
+        result = fast_match("Skills\nPython and Django.", JD)
+        self.assertEqual(len(result['gaps']), 2)
+        self.assertTrue(any('Kubernetes' in gap for gap in result['gaps']))
+        self.assertTrue(any('Python' in strength for strength in result['strengths']))
+
+    def test_batch_scores_match_single_scores(self):
+        resumes = ["Skills\nPython, Django, Kubernetes.", "Skills\nPython and Django.", "Skills\nWatercolour painting."]
+        batch = [r['match_score'] for r in LexicalScorer(JD).score_many(resumes)]
+        self.assertEqual(batch, [fast_match(r, JD)['match_score'] for r in resumes])
+        self.assertEqual(batch, sorted(batch, reverse=True))
+
+
+class RRFFuseTests(SimpleTestCase):
+    def test_hand_computed_example(self):
+        dense = np.array([2, 0, 1])
+        lexical = np.array([0, 3])
+        fused = rrf_fuse([dense, lexical], 4, k=1)
+        # Row 0: 1/(1+2) + 1/(1+1); row 1: 1/(1+3); row 2: 1/(1+1); row 3: 1/(1+2).
+        np.testing.assert_allclose(fused, [5 / 6, 1 / 4, 1 / 2, 1 / 3])
+        self.assertEqual(np.argsort(-fused, kind='stable').tolist(), [0, 2, 3, 1])
+
+    def test_default_k_and_unranked_rows(self):
+        fused = rrf_fuse([np.array([1])], 3)
+        np.testing.assert_allclose(fused, [0, 1 / 61, 0])
+        np.testing.assert_array_equal(rrf_fuse([], 2), [0, 0])
+
+    def test_answer_cache_key_includes_retrieval_mode(self):
+        session = SimpleNamespace(document_ids=['resume', 'jd'], match_score=70.0)
+        key = answer_cache.content_hash(session, 'model', 256, 'hybrid')
+        self.assertEqual(key, answer_cache.content_hash(session, 'model', 256, 'hybrid'))
+        self.assertNotEqual(key, answer_cache.content_hash(session, 'model', 256, 'dense'))
+
+
+def rate_limited(**headers) -> openai.RateLimitError:
+    response = httpx.Response(429, headers=headers, request=httpx.Request('POST', 'http://fake/v1/chat/completions'))
+    return openai.RateLimitError('rate limited', response=response, body=None)
+
+
+class GatewayTests(SimpleTestCase):
+    def test_retry_after_headers(self):
+        self.assertEqual(_retry_after(rate_limited(**{'retry-after-ms': '250'})), 0.25)
+        self.assertEqual(_retry_after(rate_limited(**{'retry-after': '2'})), 2.0)
+        self.assertIsNone(_retry_after(rate_limited(**{'retry-after': 'Wed, 21 Oct 2026 07:28:00 GMT'})))
+        self.assertIsNone(_retry_after(rate_limited()))
+        self.assertIsNone(_retry_after(ValueError()))
+
+    def test_call_waits_for_retry_after_then_succeeds(self):
+        gateway = Gateway(max_retries=2, api_key='sk-test')
+        errors = [rate_limited(**{'retry-after-ms': '250'}), rate_limited(**{'retry-after': '600'})]
+
+        def fn(client):
+            if errors:
+                raise errors.pop(0)
+            return SimpleNamespace(usage=None)
+
+        with mock.patch('screening.llm.time.sleep') as sleep:
+            response = gateway._call('chat', 'model', 10, fn)
+        self.assertIsNone(response.usage)
+        # The server's hint is used as is, but never beyond the configured cap.
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.25, LLM_RETRY_MAX_SECONDS])
+
+    def test_call_gives_up_after_max_retries(self):
+        gateway = Gateway(max_retries=1, api_key='sk-test')
+
+        def fn(client):
+            raise rate_limited(**{'retry-after-ms': '1'})
+
+        with mock.patch('screening.llm.time.sleep'), self.assertRaises(openai.RateLimitError):
+            gateway._call('chat', 'model', 10, fn)
+
+    def test_identical_concurrent_requests_are_coalesced(self):
+        with FakeOpenAIServer(FakeOpenAIConfig(embed_latency_ms=200, chat_latency_ms=200, dim=8)) as server:
+            gateway = Gateway(base_url=server.base_url, api_key='sk-test')
+            messages = [{'role': 'user', 'content': 'Summarize the candidate.'}]
+            results = {}
+
+            def embed(i):
+                results[('embed', i)] = gateway.embed(['python developer', 'django'], 'text-embedding-3-small')
+
+            def chat(i):
+                results[('chat', i)] = gateway.chat('gpt-4.1-mini', messages, temperature=0).choices[0].message.content
+
+            threads = [threading.Thread(target=fn, args=(i,)) for fn in (embed, chat) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            counters = server.counters
+        self.assertEqual(counters.get('embeddings'), 1)
+        self.assertEqual(counters.get('chat'), 1)
+        self.assertEqual(len({str(results[('embed', i)]) for i in range(4)}), 1)
+        self.assertEqual(len({results[('chat', i)] for i in range(4)}), 1)
+
+    def test_async_identical_requests_are_coalesced(self):
+        with FakeOpenAIServer(FakeOpenAIConfig(embed_latency_ms=100, dim=8)) as server:
+            gateway = Gateway(base_url=server.base_url, api_key='sk-test')
+
+            async def run():
+                return await asyncio.gather(*(gateway.aembed(['python', 'go'], 'text-embedding-3-small') for _ in range(3)))
+
+            results = asyncio.run(run())
+            counters = server.counters
+        self.assertEqual(counters.get('embeddings'), 1)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+
+
+def completion(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@mock.patch.multiple(memory, CHAT_MEMORY_ENABLED=True, CHAT_MEMORY_TAIL_TURNS=2, CHAT_MEMORY_SUMMARY_EVERY=4)
+class ChatMemoryTests(TestCase):
+    def setUp(self):
+        self.session = create_session('Python developer.', 'Hiring a Python developer.')
+        self.prompts = []
+
+    def exchanges(self, n: int):
+        return [ChatMessage.objects.create(session=self.session, role='assistant', question=f'q{i}', answer=f'a{i}').id
+                for i in range(n)]
+
+    def summarize(self, model, messages, **kwargs):
+        self.prompts.append(messages[-1]['content'])
+        return completion(f'summary {len(self.prompts)}')
+
+    def test_nothing_to_fold_below_tail_plus_batch(self):
+        self.exchanges(5)
+        with mock.patch.object(memory.gateway, 'chat', side_effect=self.summarize):
+            self.assertFalse(memory.update(self.session.id))
+        self.assertEqual(self.prompts, [])
+        self.assertEqual(Session.objects.get(id=self.session.id).memory_through, 0)
+
+    def test_backlog_is_folded_one_batch_at_a_time(self):
+        ids = self.exchanges(11)
+        with mock.patch.object(memory.gateway, 'chat', side_effect=self.summarize):
+            self.assertTrue(memory.update(self.session.id))
+        self.assertEqual(len(self.prompts), 2)
+        self.assertIn('q0', self.prompts[0])
+        self.assertIn('q3', self.prompts[0])
+        self.assertNotIn('q4', self.prompts[0])
+        # The second fold starts from the first one's summary and covers the next four exchanges.
+        self.assertIn('summary 1', self.prompts[1])
+        self.assertIn('q7', self.prompts[1])
+        self.assertNotIn('q8', self.prompts[1])
+        session = Session.objects.get(id=self.session.id)
+        self.assertEqual(session.memory_through, ids[7])
+        self.assertEqual(session.memory_summary, 'summary 2')
+        summary, questions, tail = memory.recall(session)
+        self.assertEqual((summary, questions, [m.question for m in tail]), ('summary 2', ['q8'], ['q9', 'q10']))
+
+    def test_recall_keeps_every_unsummarized_question(self):
+        self.exchanges(9)
+        summary, questions, tail = memory.recall(self.session)
+        self.assertEqual(questions, [f'q{i}' for i in range(7)])
+        self.assertEqual([m.question for m in tail], ['q7', 'q8'])
+
+    def test_fold_is_dropped_when_the_summary_moved_meanwhile(self):
+        ids = self.exchanges(6)
+
+        def racing(model, messages, **kwargs):
+            Session.objects.filter(id=self.session.id).update(memory_summary='other', memory_through=ids[0])
+            return completion('late summary')
+
+        with mock.patch.object(memory.gateway, 'chat', side_effect=racing):
+            self.assertFalse(memory.update(self.session.id))
+        session = Session.objects.get(id=self.session.id)
+        self.assertEqual((session.memory_summary, session.memory_through), ('other', ids[0]))
+
+
+class ChatHistoryPaginationTests(TestCase):
+    def setUp(self):
+        self.session = create_session('Python developer.', 'Hiring a Python developer.')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='history-test'))
+        # Messages stored in the same instant share created_at; only the id tells them apart.
+        now = timezone.now()
+        self.ids = []
+        for i in range(7):
+            message = ChatMessage.objects.create(session=self.session, role='assistant', question=f'q{i}', answer=f'a{i}')
+            ChatMessage.objects.filter(id=message.id).update(created_at=now if i in (2, 3, 4) else now.replace(microsecond=i))
+            self.ids.append(message.id)
+
+    def pages(self, url):
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            yield [m['id'] for m in response.data['results']]
+            url = response.data['next']
+
+    def test_pages_cover_every_message_once_newest_first(self):
+        expected = sorted(self.ids, reverse=True)
+        pages = list(self.pages(f'/api/session/{self.session.id}/chat/?page_size=2'))
+        self.assertTrue(all(len(page) <= 2 for page in pages))
+        self.assertEqual([i for page in pages for i in page], expected)
+
+    def test_cursor_is_stable_when_newer_messages_arrive(self):
+        url = f'/api/session/{self.session.id}/chat/?page_size=2'
+        first = self.client.get(url).data
+        ChatMessage.objects.create(session=self.session, role='assistant', question='new', answer='new')
+        seen = [m['id'] for m in first['results']] + [i for page in self.pages(first['next']) for i in page]
+        self.assertEqual(sorted(seen), sorted(self.ids))
+
+
+class UploadJobMatchRetryTests(TestCase):
+    def setUp(self):
+        session = create_session('Python developer with Django.', 'Hiring a Python developer.')
+        self.job = UploadJob.objects.create(session=session, stage='match', status=UploadJob.STATUS_RUNNING, max_attempts=2,
+                                            progress={stage: {'status': 'pending'} for stage in jobs.STAGES})
+
+    def run_match(self):
+        with mock.patch.object(matching.gateway, 'chat', side_effect=openai.APIConnectionError(request=mock.Mock())):
+            jobs.run_job(self.job)
+        self.job.refresh_from_db()
+        self.job.session.refresh_from_db()
+
+    def test_llm_error_requeues_the_job_instead_of_saving_the_lexical_score(self):
+        with self.assertLogs('screening.jobs', 'ERROR'):
+            self.run_match()
+        self.assertEqual(self.job.status, UploadJob.STATUS_QUEUED)
+        self.assertEqual(self.job.attempts, 1)
+        self.assertIsNone(self.job.session.match_score)
+
+    def test_last_attempt_falls_back_to_the_lexical_score(self):
+        self.job.attempts = 1
+        self.job.save()
+        with self.assertLogs('screening.matching', 'WARNING'):
+            self.run_match()
+        self.assertEqual(self.job.status, UploadJob.STATUS_DONE)
+        self.assertEqual(self.job.session.analysis_mode, 'fast')
+
+
+class UploadEmbeddingFailureTests(TestCase):
+    def test_failed_embedding_returns_502_and_discards_the_session(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='embed-failure'))
+        files = {'resume': SimpleUploadedFile('resume.txt', b'Python developer with Django.'),
+                 'job_description': SimpleUploadedFile('jd.txt', b'Hiring a Python developer.')}
+        with mock.patch.object(rag.gateway, 'embed', side_effect=openai.APIConnectionError(request=mock.Mock())), \
+                self.assertLogs('screening.pipeline', 'ERROR'):
+            response = client.post('/api/upload/?mode=fast', files, format='multipart')
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(Session.objects.exists())
+
+
+class DocumentMigrationTests(TransactionTestCase):
+    """0014 moves session texts and chunks into content-addressed Documents."""
+    before = [('screening', '0013_chatmessage_source_refs')]
+    after = [('screening', '0014_document')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_sessions_sharing_a_resume_share_one_document(self):
+        apps = self.migrate(self.before)
+        OldSession = apps.get_model('screening', 'Session')
+        OldChunk = apps.get_model('screening', 'ResumeChunk')
+        first = OldSession.objects.create(resume_text='Same resume.', jd_text='First job.')
+        second = OldSession.objects.create(resume_text='Same resume.', jd_text='Second job.')
+        for session in (first, second):
+            for doc_type, count in (('resume', 2), ('job_description', 1)):
+                OldChunk.objects.bulk_create(OldChunk(session=session, doc_type=doc_type, index=i, text=f'{doc_type} {i}',
+                                                      embedding=b'\0' * 16) for i in range(count))
+
+        apps = self.migrate(self.after)
+        Document = apps.get_model('screening', 'Document')
+        Session = apps.get_model('screening', 'Session')
+        ResumeChunk = apps.get_model('screening', 'ResumeChunk')
+        first, second = Session.objects.get(id=first.id), Session.objects.get(id=second.id)
+        self.assertEqual(first.resume_document_id, second.resume_document_id)
+        self.assertNotEqual(first.jd_document_id, second.jd_document_id)
+        self.assertEqual(Document.objects.filter(doc_type='resume').count(), 1)
+        self.assertEqual(Document.objects.filter(doc_type='job_description').count(), 2)
+        resume = Document.objects.get(doc_type='resume')
+        self.assertEqual(resume.text, 'Same resume.')
+        # The shared resume keeps one copy of its chunks; the second session's copies are dropped.
+        self.assertEqual(resume.chunk_count, 2)
+        self.assertEqual(ResumeChunk.objects.filter(document=resume).count(), 2)
+        self.assertEqual(ResumeChunk.objects.count(), 4)
+        self.assertEqual(set(Document.objects.filter(doc_type='job_description').values_list('chunk_count', flat=True)), {1})
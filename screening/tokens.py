@@ -0,0 +1,25 @@
+from functools import lru_cache
+from typing import Optional
+import tiktoken
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: str) -> Optional['tiktoken.Encoding']:
+    """tiktoken encoding for a model, or None when the BPE files cannot be loaded (e.g. offline)."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    if not text:
+        return 0
+    enc = get_encoding(model)
+    if enc is None:
+        # ~4 chars per token is close enough for budgeting when tiktoken is unavailable.
+        return max(1, len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))
@@ -0,0 +1,388 @@
+"""Lightweight per-stage tracing and Prometheus-format metrics.
+
+``traced('stage')`` wraps a pipeline function (or generator) and records its duration, DB
+query count and failures; ``record_usage`` counts API tokens. Spans also collect into the
+current request's trace (see TracingMiddleware), which is logged, returned as a
+Server-Timing header and, for a sample of requests, accompanied by a cProfile dump.
+Metrics are per process, like the session caches. Coroutines and async generators can be
+traced too; their query counts only cover queries run on the awaiting thread.
+"""
+import bisect
+import contextvars
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'true').lower() == 'true'
+# Fraction of requests profiled with cProfile; dumps go to PROFILE_DIR (view with snakeviz/pstats).
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(Path(settings.BASE_DIR) / 'var' / 'profiles'))
+# Scrapers without a JWT send this in an X-Metrics-Token header; admins can always read.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _label_str(self, values: LabelValues, extra: str = '') -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+        if extra:
+            parts.append(extra)
+        return '{' + ','.join(parts) + '}' if parts else ''
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0.0) + amount
+
+    def value(self, *values: str) -> float:
+        with self._lock:
+            return self._values.get(values, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return super().render() + [f'{self.name}{self._label_str(v)} {n:g}' for v, n in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, List] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *values: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(values)
+            if entry is None:
+                entry = self._values[values] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((v, list(e)) for v, e in self._values.items())
+        lines = super().render()
+        for values, entry in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, entry):
+                cumulative += n
+                le = self._label_str(values, 'le="%g"' % bound)
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            le = self._label_str(values, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{le} {entry[-1]}')
+            lines.append(f'{self.name}_sum{self._label_str(values)} {entry[-2]:.6f}')
+            lines.append(f'{self.name}_count{self._label_str(values)} {entry[-1]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(line for m in self.metrics for line in m.render()) + '\n'
+
+
+registry = Registry()
+stage_seconds = registry.register(Histogram(
+    'talentrag_stage_duration_seconds', 'Time spent in a traced pipeline stage.', ['stage']))
+stage_queries = registry.register(Histogram(
+    'talentrag_stage_db_queries', 'Database queries issued by one call of a traced stage.', ['stage'], QUERY_BUCKETS))
+stage_errors = registry.register(Counter(
+    'talentrag_stage_errors_total', 'Traced stage calls that raised.', ['stage']))
+api_tokens = registry.register(Counter(
+    'talentrag_api_tokens_total', 'Tokens reported by OpenAI API responses.', ['api', 'model', 'kind']))
+api_requests = registry.register(Counter(
+    'talentrag_api_requests_total', 'OpenAI API requests made.', ['api', 'model']))
+request_seconds = registry.register(Histogram(
+    'talentrag_request_duration_seconds', 'Time until the response is returned (streams: until headers).',
+    ['route', 'method', 'status']))
+profiles_written = registry.register(Counter(
+    'talentrag_profiles_total', 'Sampled request profiles written to PROFILE_DIR.'))
+
+
+# --- DB query counting: every connection gets a wrapper bumping a per-thread counter.
+_queries = threading.local()
+
+
+def _count_query(execute, sql, params, many, context):
+    _queries.n = getattr(_queries, 'n', 0) + 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+connection_created.connect(_install_query_counter)
+
+
+def query_count() -> int:
+    return getattr(_queries, 'n', 0)
+
+
+# --- Spans and per-request traces.
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float, int]]]] = contextvars.ContextVar('trace', default=None)
+
+
+def _finish(stage: str, seconds: float, queries: int, failed: bool):
+    stage_seconds.observe(seconds, stage)
+    stage_queries.observe(queries, stage)
+    if failed:
+        stage_errors.inc(stage)
+    spans = _trace.get()
+    if spans is not None:
+        spans.append((stage, seconds, queries))
+
+
+@contextmanager
+def span(stage: str):
+    if not TRACING_ENABLED:
+        yield
+        return
+    start, q0, failed = time.perf_counter(), query_count(), False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _finish(stage, time.perf_counter() - start, query_count() - q0, failed)
+
+
+def traced(stage: str):
+    """Decorator recording ``stage`` for each call; generators are timed across all their steps."""
+    def decorate(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def agen_wrapper(*args, **kwargs):
+                gen = fn(*args, **kwargs)
+                seconds, failed = 0.0, False
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = await gen.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        except BaseException:
+                            failed = True
+                            raise
+                        finally:
+                            seconds += time.perf_counter() - start
+                        yield item
+                finally:
+                    await gen.aclose()
+                    if TRACING_ENABLED:
+                        _finish(stage, seconds, 0, failed)
+            return agen_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                if not TRACING_ENABLED:
+                    yield from fn(*args, **kwargs)
+                    return
+                gen = fn(*args, **kwargs)
+                seconds, queries, failed = 0.0, 0, False
+                try:
+                    while True:
+                        start, q0 = time.perf_counter(), query_count()
+                        try:
+                            item = next(gen)
+                        except StopIteration:
+                            return
+                        except BaseException:
+                            failed = True
+                            raise
+                        finally:
+                            seconds += time.perf_counter() - start
+                            queries += query_count() - q0
+                        yield item
+                finally:
+                    gen.close()
+                    _finish(stage, seconds, queries, failed)
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def in_context(fn):
+    """``fn`` bound to a copy of the caller's context, so pool threads add spans to the request trace."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def record_usage(api: str, model: str, usage) -> None:
+    """Count one API request and the tokens its response reports (``usage`` may be None)."""
+    api_requests.inc(api, model)
+    if usage is None:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        n = getattr(usage, kind, None)
+        if n:
+            api_tokens.inc(api, model, kind.replace('_tokens', ''), amount=n)
+
+
+# --- Request middleware.
+def _route(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+_profiling = threading.Lock()  # one sampled profile at a time per process
+
+
+class TracingMiddleware:
+    """Times each request, logs its spans, adds a Server-Timing header and samples profiles."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _sample(self) -> Optional[cProfile.Profile]:
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE and _profiling.acquire(blocking=False):
+            return cProfile.Profile()
+        return None
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not TRACING_ENABLED:
+            return self.get_response(request)
+        spans: List[Tuple[str, float, int]] = []
+        token = _trace.set(spans)
+        profiler = self._sample()
+        start, q0 = time.perf_counter(), query_count()
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        except BaseException:
+            if profiler is not None:
+                _profiling.release()
+            raise
+        finally:
+            _trace.reset(token)
+        return self._finish(request, response, spans, start, q0, profiler)
+
+    async def __acall__(self, request):
+        if not TRACING_ENABLED:
+            return await self.get_response(request)
+        spans: List[Tuple[str, float, int]] = []
+        token = _trace.set(spans)
+        # Under ASGI the profile also sees whatever else the event loop runs meanwhile.
+        profiler = self._sample()
+        start, q0 = time.perf_counter(), query_count()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        except BaseException:
+            if profiler is not None:
+                _profiling.release()
+            raise
+        finally:
+            _trace.reset(token)
+        return self._finish(request, response, spans, start, q0, profiler)
+
+    def _finish(self, request, response, spans: List[Tuple[str, float, int]], start: float, q0: int,
+                profiler: Optional[cProfile.Profile]):
+        elapsed = time.perf_counter() - start
+        route = _route(request)
+        request_seconds.observe(elapsed, route, request.method, str(response.status_code))
+        totals: Dict[str, List[float]] = {}
+        for stage, seconds, queries in spans:
+            total = totals.setdefault(stage, [0.0, 0])
+            total[0] += seconds
+            total[1] += queries
+        if totals:
+            response['Server-Timing'] = ', '.join(
+                f'{re.sub(r"[^A-Za-z0-9_-]", "_", stage)};dur={t[0] * 1000:.1f}' for stage, t in totals.items())
+            logger.info('%s %s %.1fms, %d queries: %s', request.method, request.path, elapsed * 1000,
+                        query_count() - q0, ', '.join(f'{s} {t[0] * 1000:.1f}ms/{t[1]}q' for s, t in totals.items()))
+        if profiler is not None:
+            try:
+                self._dump(profiler, request, route)
+            finally:
+                _profiling.release()
+        return response
+
+    def _dump(self, profiler: cProfile.Profile, request, route: str):
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = re.sub(r'[^A-Za-z0-9]+', '_', f'{request.method}_{route}').strip('_')
+            path = os.path.join(PROFILE_DIR, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{name}.prof')
+            profiler.dump_stats(path)
+            profiles_written.inc()
+        except OSError:
+            logger.exception('Could not write request profile')
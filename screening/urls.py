@@ -1,8 +1,19 @@
+from django.conf import settings
 from django.urls import path
-from .views import UploadView, AnalysisView, ChatView
+from .views import UploadView, AnalysisView, ChatView, ChatStreamView, CacheStatsView, JobView, BatchScreenView, CandidateSearchView, MetricsView
+
+if settings.ASYNC_VIEWS:
+    from .async_views import AsyncUploadView as UploadView, AsyncAnalysisView as AnalysisView  # noqa: F811
+    from .async_views import AsyncChatView as ChatView, AsyncChatStreamView as ChatStreamView  # noqa: F811
 
 urlpatterns = [
     path('upload/', UploadView.as_view()),
+    path('job/<uuid:job_id>/', JobView.as_view()),
+    path('batch/', BatchScreenView.as_view()),
+    path('search/', CandidateSearchView.as_view()),
     path('session/<uuid:session_id>/analysis/', AnalysisView.as_view()),
     path('session/<uuid:session_id>/chat/', ChatView.as_view()),
+    path('session/<uuid:session_id>/chat/stream/', ChatStreamView.as_view()),
+    path('cache/stats/', CacheStatsView.as_view()),
+    path('metrics/', MetricsView.as_view()),
 ]
@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+
+class StackedMatrix:
+    """Rows of several matrices (e.g. the memmap slices of a session's two documents) kept as
+    separate views: ``matrix @ q`` scores each part and joins only the score vectors, so the
+    mapped rows are never copied into the process."""
+
+    def __init__(self, parts: Sequence[np.ndarray]):
+        self.parts = list(parts)
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        return np.concatenate([part @ other for part in self.parts])
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self.parts)
+
+    def setflags(self, write: bool):
+        for part in self.parts:
+            part.setflags(write=write)
+
+
+SessionVectors = Tuple[Union[np.ndarray, StackedMatrix], np.ndarray, List[Tuple[int, str]]]
+
+SESSION_CACHE_MAX_BYTES = int(os.environ.get('SESSION_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+SESSION_LEXICAL_CACHE_MAX_BYTES = int(os.environ.get('SESSION_LEXICAL_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+
+def _entry_size(entry: SessionVectors) -> int:
+    matrix, doc_types, meta = entry
+    # Rough but stable: raw matrix bytes + text payload + per-row bookkeeping. Memory-mapped
+    # matrices live in the shared page cache, not in this process, so they don't count.
+    parts = matrix.parts if isinstance(matrix, StackedMatrix) else [matrix]
+    matrix_bytes = sum(0 if isinstance(part, np.memmap) else int(part.nbytes) for part in parts)
+    return matrix_bytes + sum(len(m[1]) + len(m[2]) for m in meta) + 64 * len(meta)
+
+
+class SessionVectorCache:
+    """Process-local LRU of session id -> (normalized matrix, doc_type array, chunk metadata).
+
+    A session's chunks are immutable once written, so entries only need to be dropped when
+    chunks for that session are written or deleted (see screening.signals). The cache is
+    per process: each gunicorn worker warms its own copy.
+    """
+
+    def __init__(self, max_bytes: int = SESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Tuple[SessionVectors, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[SessionVectors]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def _size(self, entry) -> int:
+        return _entry_size(entry)
+
+    def _prepare(self, entry) -> bool:
+        """Make a freshly loaded entry safe to share; False if it must not be cached."""
+        if not entry[2]:
+            # Never cache an empty session: its chunks may still be on the way.
+            return False
+        entry[0].setflags(write=False)
+        return True
+
+    def put(self, key: Hashable, entry: SessionVectors):
+        size = self._size(entry)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (entry, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], SessionVectors]) -> SessionVectors:
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        entry = loader()
+        if self._prepare(entry):
+            self.put(key, entry)
+        return entry
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class LexicalIndexCache(SessionVectorCache):
+    """Same LRU for per-session lexical.LexicalIndex objects, invalidated alongside session_vectors."""
+
+    def _size(self, entry) -> int:
+        return entry.nbytes
+
+    def _prepare(self, entry) -> bool:
+        return len(entry) > 0
+
+
+session_vectors = SessionVectorCache()
+session_lexical = LexicalIndexCache(SESSION_LEXICAL_CACHE_MAX_BYTES)
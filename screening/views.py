@@ -1,39 +1,174 @@
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+import zipfile
+import numpy as np
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework import status, permissions
-from .parsing import read_file_content, normalize_whitespace, split_sections, extract_skills, chunk_text
-from .matching import compute_match
-from .rag import store_chunks, answer_question
-from .models import Session
-from .serializers import SessionSerializer, ChatRequestSerializer, ChatMessageSerializer
+from .pipeline import ANALYSIS_MODES, EmbeddingFailed, build_chunks, match_and_embed
+from .documents import upload_documents
+from .rag import answer_question, stream_answer, embed_packed, resolve_sources
+from .jobs import enqueue_upload
+from .batch import (BATCH_DEFAULT_MODE, BATCH_LLM_TOP, BATCH_MAX_RESUMES, BATCH_MODES, BATCH_SYNC_LLM_MAX,
+                    collect_resumes, screen_batch)
+from .ann import ANN_NPROBE, search_candidates
+from .parsing import DocumentError, normalize_whitespace, iter_chunks
+from .models import Document, Session, UploadJob
+from .pagination import ChatHistoryPagination
+from .vector_cache import session_lexical, session_vectors
+from .answer_cache import answer_cache_stats
+from .tracing import METRICS_TOKEN, registry
+from .serializers import SessionSerializer, ChatRequestSerializer, ChatMessageSerializer, UploadJobSerializer, CandidateSearchSerializer
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ASYNC_DEFAULT = os.environ.get('UPLOAD_ASYNC_DEFAULT', 'false').lower() == 'true'
+
+def _flag(request, name: str, default: bool = False) -> bool:
+    value = request.query_params.get(name, request.data.get(name))
+    if value is None:
+        return default
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def upload_params(request):
+    """(error response or None, upload parameters); shared with the async UploadView."""
+    resume_file = request.FILES.get('resume')
+    jd_file = request.FILES.get('job_description')
+    if not resume_file or not jd_file:
+        return Response({'error': 'Both resume and job description files are required.'}, status=400), None
+    mode = request.query_params.get('mode', request.data.get('mode', 'llm'))
+    if mode not in ANALYSIS_MODES:
+        return Response({'error': f"mode must be one of {', '.join(ANALYSIS_MODES)}."}, status=400), None
+    return None, {'resume_file': resume_file, 'jd_file': jd_file, 'reanalyze': _flag(request, 'reanalyze'),
+                  'mode': mode, 'queue': _flag(request, 'async', UPLOAD_ASYNC_DEFAULT)}
+
+def upload_files(params):
+    """(resume name, resume bytes, JD name, JD bytes) of an upload."""
+    return params['resume_file'].name, params['resume_file'].read(), params['jd_file'].name, params['jd_file'].read()
+
+def read_upload(params):
+    """(resume Document, JD Document, warnings); files seen before are not parsed again."""
+    return upload_documents(*upload_files(params))
+
+def upload_response(session: Session, match_data, timings, warnings) -> Response:
+    analysis = SessionSerializer(session).data
+    if 'matched_terms' in match_data:
+        analysis.update(matched_terms=match_data['matched_terms'], missing_terms=match_data['missing_terms'])
+    return Response({
+        'session': str(session.id),
+        'analysis': analysis,
+        'timings': timings,
+        'warnings': warnings,
+    })
+
+def embedding_failed_response(error: EmbeddingFailed) -> Response:
+    return Response({'error': f'Embedding the documents failed, please retry the upload: {error}'},
+                    status=status.HTTP_502_BAD_GATEWAY)
 
 class UploadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request):
-        resume_file = request.FILES.get('resume')
+        error, params = upload_params(request)
+        if error:
+            return error
+        if params['queue']:
+            job = enqueue_upload(params['resume_file'], params['jd_file'], force_reanalyze=params['reanalyze'], mode=params['mode'])
+            return Response({'job': str(job.id), 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+        start = time.perf_counter()
+        try:
+            resume, jd, warnings = read_upload(params)
+        except DocumentError as e:
+            return Response({'error': str(e)}, status=400)
+        documents = build_chunks(resume.text, jd.text)
+        session = Session.objects.create(resume_document=resume, jd_document=jd)
+        prepare_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        try:
+            match_data, timings = match_and_embed(session, documents, force_match=params['reanalyze'], mode=params['mode'])
+        except EmbeddingFailed as e:
+            return embedding_failed_response(e)
+        timings['prepare_ms'] = prepare_ms
+        return upload_response(session, match_data, timings, warnings)
+
+class JobView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    def get(self, request, job_id):
+        try:
+            job = UploadJob.objects.get(id=job_id)
+        except UploadJob.DoesNotExist:
+            return Response({'error': 'Job not found'}, status=404)
+        return Response(UploadJobSerializer(job).data)
+
+class BatchScreenView(APIView):
+    """Screen one job description against many resumes (multiple 'resumes' files and/or 'resumes_zip')."""
+    permission_classes = [permissions.IsAuthenticated]
+    def post(self, request):
         jd_file = request.FILES.get('job_description')
-        if not resume_file or not jd_file:
-            return Response({'error': 'Both resume and job description files are required.'}, status=400)
-        resume_text = normalize_whitespace(read_file_content(resume_file))
-        jd_text = normalize_whitespace(read_file_content(jd_file))
-
-        sections = split_sections(resume_text)
-        resume_chunks = chunk_text(sections)
-        jd_chunks = chunk_text(split_sections(jd_text))
-        skills = extract_skills(resume_text)
-        match_data = compute_match(skills, jd_text, resume_text)
-
-        session = Session.objects.create(
-            resume_text=resume_text,
-            jd_text=jd_text,
-            match_score=match_data['match_score'],
-            strengths=match_data['strengths'],
-            gaps=match_data['gaps'],
-            insights=match_data['insights']
-        )
-        store_chunks(session, resume_chunks, doc_type='resume')
-        store_chunks(session, jd_chunks, doc_type='job_description')
-        return Response({'session': str(session.id), 'analysis': SessionSerializer(session).data})
+        if not jd_file:
+            return Response({'error': 'A job description file is required.'}, status=400)
+        try:
+            resumes = collect_resumes(request.FILES.getlist('resumes'), request.FILES.get('resumes_zip'))
+        except (ValueError, zipfile.BadZipFile) as e:
+            return Response({'error': f'Invalid resumes_zip: {e}'}, status=400)
+        if not resumes:
+            return Response({'error': 'At least one resume file is required.'}, status=400)
+        if len(resumes) > BATCH_MAX_RESUMES:
+            return Response({'error': f'At most {BATCH_MAX_RESUMES} resumes per batch.'}, status=400)
+        mode = request.query_params.get('mode', request.data.get('mode', BATCH_DEFAULT_MODE))
+        if mode not in BATCH_MODES:
+            return Response({'error': f"mode must be one of {', '.join(BATCH_MODES)}."}, status=400)
+        try:
+            llm_top = int(request.query_params.get('llm_top', request.data.get('llm_top', BATCH_LLM_TOP)))
+        except (TypeError, ValueError):
+            return Response({'error': 'llm_top must be an integer.'}, status=400)
+        llm_calls = {'llm': len(resumes), 'prescreen': min(llm_top, len(resumes))}.get(mode, 0)
+        if llm_calls > BATCH_SYNC_LLM_MAX:
+            return Response({'error': f'At most {BATCH_SYNC_LLM_MAX} resumes per batch get the LLM analysis; use '
+                                      f'mode=prescreen with llm_top <= {BATCH_SYNC_LLM_MAX}, or mode=fast.'}, status=400)
+        try:
+            result = screen_batch(jd_file.name, jd_file.read(), resumes, force=_flag(request, 'reanalyze'),
+                                  mode=mode, llm_top=llm_top)
+        except DocumentError as e:
+            return Response({'error': f'Job description: {e}'}, status=400)
+        return Response(result)
+
+class CandidateSearchView(APIView):
+    """Rank previously screened resumes (across all sessions) against a new job description."""
+    permission_classes = [permissions.IsAuthenticated]
+    def post(self, request):
+        serializer = CandidateSearchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        data = serializer.validated_data
+        jd_chunks = [c.text for c in iter_chunks(normalize_whitespace(data['job_description']))]
+        if not jd_chunks:
+            return Response({'candidates': []})
+        queries = np.frombuffer(b''.join(embed_packed(jd_chunks)), dtype='<f4').reshape(len(jd_chunks), -1)
+        # Over-fetch: rows of deleted documents stay in the index until it is rebuilt.
+        ranked = search_candidates(queries, top_n=data['top_k'] * 2, nprobe=data.get('nprobe', ANN_NPROBE))
+        documents = Document.objects.in_bulk([c['document'] for c in ranked])
+        # A resume screened several times is one candidate; link its latest session.
+        latest = {}
+        for row in Session.objects.filter(resume_document__in=documents.keys()).order_by('created_at').values('id', 'resume_document_id', 'created_at'):
+            latest[row['resume_document_id']] = row
+        candidates = []
+        for c in ranked:
+            doc_id = uuid.UUID(c['document'])
+            if doc_id not in documents or doc_id not in latest:
+                continue
+            session = latest[doc_id]
+            candidates.append({**c, 'session': str(session['id']), 'resume_preview': documents[doc_id].text[:300],
+                               'created_at': session['created_at']})
+            if len(candidates) >= data['top_k']:
+                break
+        return Response({'candidates': candidates})
 
 class AnalysisView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -55,7 +190,7 @@ class ChatView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=400)
         question = serializer.validated_data['question']
-        result = answer_question(session, question)
+        result = answer_question(session, question, retrieval=serializer.validated_data['retrieval'])
         return Response(result)
 
     def get(self, request, session_id):
@@ -63,5 +198,90 @@ class ChatView(APIView):
             session = Session.objects.get(id=session_id)
         except Session.DoesNotExist:
             return Response({'error': 'Session not found'}, status=404)
-        messages = session.messages.order_by('created_at')
-        return Response(ChatMessageSerializer(messages, many=True).data)
+        return chat_history_response(request, self, session)
+
+def chat_history_response(request, view, session: Session) -> Response:
+    """One cursor page of the session's messages, newest first; ``?expand=sources`` adds source text.
+
+    Shared with the async ChatView.
+    """
+    paginator = ChatHistoryPagination()
+    page = paginator.paginate_queryset(session.messages.all(), request, view=view)
+    context = {'chunks': resolve_sources(session, page)} if request.query_params.get('expand') == 'sources' else {}
+    return paginator.get_paginated_response(ChatMessageSerializer(page, many=True, context=context).data)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets EventSource clients (Accept: text/event-stream) pass content negotiation.
+
+    Only non-streamed responses (validation/404 errors) are rendered here, as an 'error' event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return _sse('error', data).encode(self.charset)
+
+class ChatStreamView(APIView):
+    """Server-Sent Events variant of ChatView.post: sources first, then answer tokens."""
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    def post(self, request, session_id):
+        try:
+            session = Session.objects.get(id=session_id)
+        except Session.DoesNotExist:
+            return Response({'error': 'Session not found'}, status=404)
+        serializer = ChatRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        question = serializer.validated_data['question']
+        retrieval = serializer.validated_data['retrieval']
+
+        def events():
+            try:
+                for event, data in stream_answer(session, question, retrieval=retrieval):
+                    yield _sse(event, data)
+            except Exception as e:
+                logger.exception('Chat stream failed for session %s', session.id)
+                yield _sse('error', {'error': str(e)})
+
+        return sse_response(events())
+
+def sse_response(events) -> StreamingHttpResponse:
+    """Unbuffered text/event-stream response over a (sync or async) iterator of _sse() strings."""
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+class CacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    def get(self, request):
+        return Response({'session_vectors': session_vectors.stats(), 'session_lexical': session_lexical.stats(), 'answers': answer_cache_stats.snapshot()})
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data.encode(self.charset) if isinstance(data, str) else json.dumps(data).encode(self.charset)
+
+class MetricsAccess(permissions.BasePermission):
+    """Admins, or a scraper presenting METRICS_TOKEN in an X-Metrics-Token header (never the URL, which
+    ends up in access logs)."""
+    def has_permission(self, request, view):
+        token = request.headers.get('X-Metrics-Token', '')
+        if METRICS_TOKEN and token and hmac.compare_digest(token, METRICS_TOKEN):
+            return True
+        return bool(request.user and request.user.is_staff)
+
+class MetricsView(APIView):
+    """Per-process stage timings, DB query counts and API token usage in Prometheus text format."""
+    permission_classes = [MetricsAccess]
+    renderer_classes = [PrometheusRenderer]
+    def get(self, request):
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')